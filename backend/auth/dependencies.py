@@ -8,12 +8,22 @@ from typing import Optional
 from database.mongodb import MongoDB, USERS_COLLECTION
 from models.user import UserInDB, UserRole, TokenData
 from auth.security import verify_token
+from database.ttl_store import TTLCache
 import logging
 
 logger = logging.getLogger(__name__)
 
 security = HTTPBearer(auto_error=False)
 
+# Authenticated users by id; writes through UserService invalidate entries and the
+# TTL bounds how long another process's changes can go unseen
+USER_CACHE_TTL_SECONDS = 60
+user_cache = TTLCache(ttl_seconds=USER_CACHE_TTL_SECONDS, max_size=10000)
+
+def invalidate_cached_user(user_id: str) -> None:
+    """Drop a user from the authenticated user cache"""
+    user_cache.delete(user_id)
+
 async def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> Optional[UserInDB]:
@@ -32,13 +42,19 @@ async def get_current_user(
     if not user_id:
         return None
 
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
     try:
         user_doc = await MongoDB.get_collection(USERS_COLLECTION).find_one({"_id": user_id})
         if not user_doc:
             return None
 
         user_doc["id"] = user_doc["_id"]
-        return UserInDB(**user_doc)
+        user = UserInDB(**user_doc)
+        user_cache.set(user_id, user)
+        return user
     except Exception as e:
         logger.error(f"Error getting current user: {e}")
         return None
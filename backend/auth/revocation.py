@@ -0,0 +1,151 @@
+from typing import Optional, Dict, Any, List
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING
+from database.mongodb import MongoDB, REVOKED_TOKENS_COLLECTION
+import hashlib
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Sized for the revocations live at once; entries expire with the tokens they cover
+REVOCATION_BLOOM_CAPACITY = 200000
+REVOCATION_BLOOM_ERROR_RATE = 0.001
+REVOCATION_SYNC_INTERVAL_SECONDS = 10
+REVOCATION_REBUILD_INTERVAL_SECONDS = 60 * 60
+# Longest access token lifetime (remember me); user-wide revocations outlive it
+MAX_ACCESS_TOKEN_DAYS = 30
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        """Bit positions for a key via double hashing"""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str) -> None:
+        """Add a key to the filter"""
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        """Check whether a key may have been added"""
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class _RevocationState:
+    """One consistent in-memory view of the revocation collection"""
+
+    def __init__(self):
+        self.bloom = BloomFilter(REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE)
+        self.revoked_jtis: Dict[str, datetime] = {}
+        self.users_revoked_before: Dict[str, float] = {}
+        self.synced_until: Optional[datetime] = None
+
+    def apply(self, doc: Dict[str, Any]) -> None:
+        """Add one revocation document to this view"""
+        if doc.get("kind") == "user":
+            cutoff = doc["revoked_before"].replace(tzinfo=timezone.utc).timestamp()
+            self.users_revoked_before[doc["user_id"]] = max(cutoff, self.users_revoked_before.get(doc["user_id"], 0))
+        else:
+            self.bloom.add(doc["_id"])
+            self.revoked_jtis[doc["_id"]] = doc["expires_at"]
+        if self.synced_until is None or doc["revoked_at"] > self.synced_until:
+            self.synced_until = doc["revoked_at"]
+
+class TokenRevocationList:
+    """Revoked token ids and user-wide cutoffs, mirrored in memory from a Mongo TTL collection"""
+
+    def __init__(self):
+        self._state = _RevocationState()
+        # Local revocations made while a rebuild is loading, replayed onto the new view
+        self._pending: Optional[List[Dict[str, Any]]] = None
+
+    def _apply(self, doc: Dict[str, Any]) -> None:
+        """Add one revocation document to the live view"""
+        self._state.apply(doc)
+        if self._pending is not None:
+            self._pending.append(doc)
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """Check a decoded token; the Bloom filter answers almost every lookup without touching the exact set"""
+        state = self._state
+        jti = payload.get("jti")
+        if jti and jti in state.bloom and jti in state.revoked_jtis:
+            return True
+
+        cutoff = state.users_revoked_before.get(payload.get("sub"))
+        return cutoff is not None and payload.get("iat", 0) < cutoff
+
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Create the TTL index that drops revocations once their tokens have expired"""
+        collection = MongoDB.get_collection(REVOKED_TOKENS_COLLECTION)
+        await collection.create_index("expires_at", expireAfterSeconds=0)
+        await collection.create_index([("revoked_at", ASCENDING)])
+
+    async def revoke_token(self, jti: str, user_id: str, expires_at: datetime) -> None:
+        """Revoke a single token until it would have expired anyway"""
+        doc = {"_id": jti, "kind": "token", "user_id": user_id, "revoked_at": datetime.utcnow(), "expires_at": expires_at}
+        await MongoDB.get_collection(REVOKED_TOKENS_COLLECTION).replace_one({"_id": jti}, doc, upsert=True)
+        self._apply(doc)
+
+    async def revoke_user(self, user_id: str) -> None:
+        """Revoke every token issued to a user up to now"""
+        now = datetime.utcnow()
+        # Mongo keeps milliseconds; round up so the stored cutoff still covers every earlier token
+        now += timedelta(microseconds=-now.microsecond % 1000)
+        doc = {
+            "_id": f"user:{user_id}",
+            "kind": "user",
+            "user_id": user_id,
+            "revoked_before": now,
+            "revoked_at": now,
+            "expires_at": now + timedelta(days=MAX_ACCESS_TOKEN_DAYS)
+        }
+        await MongoDB.get_collection(REVOKED_TOKENS_COLLECTION).replace_one({"_id": doc["_id"]}, doc, upsert=True)
+        self._apply(doc)
+
+    async def sync(self) -> int:
+        """Pull revocations written by other processes since the last sync"""
+        query = {}
+        synced_until = self._state.synced_until
+        if synced_until is not None:
+            # Small overlap covers writes that landed out of order
+            query["revoked_at"] = {"$gte": synced_until - timedelta(seconds=REVOCATION_SYNC_INTERVAL_SECONDS)}
+
+        count = 0
+        async for doc in MongoDB.get_collection(REVOKED_TOKENS_COLLECTION).find(query):
+            self._apply(doc)
+            count += 1
+        return count
+
+    async def rebuild(self) -> int:
+        """Reload all live revocations into a fresh view, dropping expired ones from memory"""
+        # The current view keeps answering until the new one is complete
+        state = _RevocationState()
+        self._pending = []
+        try:
+            now = datetime.utcnow()
+            count = 0
+            async for doc in MongoDB.get_collection(REVOKED_TOKENS_COLLECTION).find({"expires_at": {"$gt": now}}):
+                state.apply(doc)
+                count += 1
+
+            for doc in self._pending:
+                state.apply(doc)
+            self._state = state
+        finally:
+            self._pending = None
+
+        logger.info(f"Loaded {count} token revocations")
+        return count
+
+revocation_list = TokenRevocationList()
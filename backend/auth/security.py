@@ -2,15 +2,37 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
+import base64
+import hashlib
+import hmac
+import secrets
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from utils.config import settings
+from auth.revocation import revocation_list
 from fastapi import HTTPException, status
 
 # Password hashing
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
+# pbkdf2 releases the GIL, so hashing runs on a small thread pool; the semaphore caps
+# concurrent hashes and anything beyond it waits without holding a thread
+PASSWORD_HASH_WORKERS = min(4, os.cpu_count() or 1)
+_password_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_hash_semaphore = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+password_hash_metrics = {
+    "waiting": 0,
+    "in_flight": 0,
+    "completed": 0,
+    "total_wait_seconds": 0.0,
+    "max_wait_seconds": 0.0,
+    "total_run_seconds": 0.0
+}
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -21,13 +43,56 @@ def get_password_hash(password: str) -> str:
     safe_password = password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
     return pwd_context.hash(safe_password)
 
+async def _run_password_hashing(func, *args):
+    """Run a hashing call on the password pool, recording queue metrics"""
+    metrics = password_hash_metrics
+    metrics["waiting"] += 1
+    queued_at = time.perf_counter()
+    try:
+        await _password_hash_semaphore.acquire()
+    finally:
+        metrics["waiting"] -= 1
+
+    started_at = time.perf_counter()
+    waited = started_at - queued_at
+    metrics["in_flight"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_hash_executor, func, *args)
+    finally:
+        _password_hash_semaphore.release()
+        metrics["in_flight"] -= 1
+        metrics["completed"] += 1
+        metrics["total_wait_seconds"] += waited
+        metrics["max_wait_seconds"] = max(metrics["max_wait_seconds"], waited)
+        metrics["total_run_seconds"] += time.perf_counter() - started_at
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop"""
+    return await _run_password_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await _run_password_hashing(get_password_hash, password)
+
+def get_password_hash_stats() -> dict:
+    """Password hashing pool size, queue depth and latency"""
+    metrics = password_hash_metrics
+    completed = metrics["completed"]
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        **metrics,
+        "avg_wait_seconds": metrics["total_wait_seconds"] / completed if completed else 0.0,
+        "avg_run_seconds": metrics["total_run_seconds"] / completed if completed else 0.0
+    }
+
 def create_access_token(data: dict, remember_me: bool = False):
     to_encode = data.copy()
     if remember_me:
         expire = datetime.utcnow() + timedelta(days=30)  # 30 days for remember me
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
-    to_encode.update({"exp": expire})
+    # iat keeps sub-second precision so a token issued just after a user-wide revocation survives it
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": secrets.token_hex(16)})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
@@ -42,6 +107,8 @@ def verify_token(token: str):
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
+        if revocation_list.is_revoked(payload):
+            raise credentials_exception
         return payload
     except JWTError:
         raise credentials_exception
@@ -52,4 +119,23 @@ def decode_token(token: str) -> Optional[dict]:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm], options={"verify_exp": False})
         return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+def _sign_cart_id(cart_id: str) -> str:
+    """HMAC signature binding a guest cart id to this server"""
+    digest = hmac.new(settings.secret_key.encode(), f"guest-cart:{cart_id}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+def create_guest_cart_token() -> str:
+    """Create a signed token identifying a new guest cart"""
+    cart_id = secrets.token_urlsafe(16)
+    return f"{cart_id}.{_sign_cart_id(cart_id)}"
+
+def verify_guest_cart_token(token: Optional[str]) -> Optional[str]:
+    """Return the guest cart id if the token signature is valid"""
+    if not token or "." not in token:
+        return None
+    cart_id, signature = token.rsplit(".", 1)
+    if not hmac.compare_digest(signature, _sign_cart_id(cart_id)):
+        return None
+    return cart_id
@@ -58,4 +58,14 @@ REVIEWS_COLLECTION = "reviews"
 WISHLISTS_COLLECTION = "wishlists"
 SESSIONS_COLLECTION = "sessions"
 ANALYTICS_COLLECTION = "analytics"
-CARTS_COLLECTION = "carts"
\ No newline at end of file
+CARTS_COLLECTION = "carts"
+OUTBOX_COLLECTION = "outbox"
+OUTBOX_DEAD_LETTER_COLLECTION = "outbox_dead_letter"
+ORDERS_ARCHIVE_COLLECTION = "orders_archive"
+ORDER_ROLLUPS_COLLECTION = "order_rollups"
+PROMOTIONS_COLLECTION = "promotions"
+CARTS_ARCHIVE_COLLECTION = "carts_archive"
+REFRESH_TOKENS_COLLECTION = "refresh_tokens"
+REVOKED_TOKENS_COLLECTION = "revoked_tokens"
+USER_STATS_COLLECTION = "user_stats"
+SECURITY_SCANS_COLLECTION = "security_scans"
@@ -0,0 +1,200 @@
+from typing import Optional, Dict, Any, Tuple
+from collections import OrderedDict
+import json
+import math
+import time
+import logging
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """In-process LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, ttl_seconds: float, max_size: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        """Get a live entry, refreshing its LRU position"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Any, value: Any) -> None:
+        """Store an entry, evicting the least recently used one when full"""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Any) -> None:
+        """Drop an entry if present"""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+# Caps for the in-process store, per key namespace (the prefix before the first ':') so
+# one kind of entry can never push out another; least recently used entries go first
+MEMORY_TTL_STORE_DEFAULT_NAMESPACE_SIZE = 10000
+MEMORY_TTL_STORE_NAMESPACE_SIZES = {
+    "guest_cart": 100000,
+    "oauth_session": 10000
+}
+TTL_STORE_SWEEP_INTERVAL_SECONDS = 60
+
+def _namespace(key: str) -> str:
+    return key.split(":", 1)[0]
+
+class MemoryTTLStore:
+    """Per-process key/value store with per-key expiry, per-namespace LRU caps and a sweeper"""
+
+    def __init__(
+        self,
+        namespace_sizes: Optional[Dict[str, int]] = None,
+        default_namespace_size: int = MEMORY_TTL_STORE_DEFAULT_NAMESPACE_SIZE
+    ):
+        self.namespace_sizes = namespace_sizes if namespace_sizes is not None else MEMORY_TTL_STORE_NAMESPACE_SIZES
+        self.default_namespace_size = default_namespace_size
+        self._namespaces: Dict[str, "OrderedDict[str, Tuple[float, Any]]"] = {}
+        self.evictions = 0
+
+    def _live(self, key: str) -> Optional[Tuple[float, Any]]:
+        """Get an entry, dropping it if it has expired"""
+        entries = self._namespaces.get(_namespace(key))
+        entry = entries.get(key) if entries else None
+        if entry and entry[0] <= time.monotonic():
+            del entries[key]
+            return None
+        return entry
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get a value if it has not expired"""
+        entry = self._live(key)
+        if entry is None:
+            return None
+        self._namespaces[_namespace(key)].move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        """Store a value for ttl_seconds, evicting the namespace's least recently used entry when full"""
+        namespace = _namespace(key)
+        entries = self._namespaces.setdefault(namespace, OrderedDict())
+        entries[key] = (time.monotonic() + ttl_seconds, value)
+        entries.move_to_end(key)
+
+        max_size = self.namespace_sizes.get(namespace, self.default_namespace_size)
+        while len(entries) > max_size:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    async def pop(self, key: str) -> Optional[Any]:
+        """Atomically take a value out of the store"""
+        entry = self._live(key)
+        if entry is None:
+            return None
+        del self._namespaces[_namespace(key)][key]
+        return entry[1]
+
+    async def delete(self, key: str) -> None:
+        """Delete a value"""
+        entries = self._namespaces.get(_namespace(key))
+        if entries:
+            entries.pop(key, None)
+
+    async def sweep(self) -> int:
+        """Remove all expired entries"""
+        now = time.monotonic()
+        removed = 0
+        for entries in self._namespaces.values():
+            expired = [key for key, (expires_at, _) in entries.items() if expires_at <= now]
+            for key in expired:
+                del entries[key]
+            removed += len(expired)
+        return removed
+
+class RedisTTLStore:
+    """Key/value store shared across processes through Redis"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self.client = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get a value if it has not expired"""
+        raw = await self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        """Store a value for ttl_seconds"""
+        # Millisecond expiry so sub-second TTLs do not round down to "no expiry"
+        await self.client.set(key, json.dumps(value), px=max(1, math.ceil(ttl_seconds * 1000)))
+
+    async def pop(self, key: str) -> Optional[Any]:
+        """Atomically take a value out of the store"""
+        raw = await self.client.getdel(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def delete(self, key: str) -> None:
+        """Delete a value"""
+        await self.client.delete(key)
+
+    async def sweep(self) -> int:
+        """Redis expires keys itself"""
+        return 0
+
+_store = None
+
+def get_ttl_store():
+    """Shared TTL store: Redis when REDIS_URL is configured, otherwise in-process memory"""
+    global _store
+    if _store is None:
+        redis_url = getattr(settings, "redis_url", None) or os.getenv("REDIS_URL")
+        if redis_url:
+            try:
+                _store = RedisTTLStore(redis_url)
+                logger.info("Using Redis TTL store")
+            except ImportError:
+                logger.warning("redis is not installed; falling back to in-memory TTL store")
+        if _store is None:
+            # Entries (guest carts, OAuth sessions) then live in this process only: they are lost on
+            # restart and invisible to other workers, so multi-worker deployments must set REDIS_URL
+            logger.warning("Using the in-memory TTL store; it is per-process and not shared between workers, set REDIS_URL for multi-worker deployments")
+            _store = MemoryTTLStore()
+    return _store
+
+async def sweep_ttl_store() -> int:
+    """Evict expired entries from the shared TTL store"""
+    return await get_ttl_store().sweep()
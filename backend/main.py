@@ -25,7 +25,19 @@ from alembic import command
 from routers import auth, products, orders, admin, websocket, ai, addresses, payments, wishlist, notifications, security
 from middleware.logging import RequestLoggingMiddleware
 from middleware.security import SecurityMiddleware
-from services.user_service import UserService
+from services.user_service import UserService, USER_STATS_RECONCILE_INTERVAL_SECONDS
+from services.order_service import OrderService
+from services.outbox_service import OutboxService
+from services.archive_service import OrderArchiveService, ARCHIVE_INTERVAL_SECONDS, ARCHIVE_ROLLUP_RECONCILE_INTERVAL_SECONDS
+from services.abandoned_cart_service import AbandonedCartService, ABANDONED_CART_SCAN_INTERVAL_SECONDS
+from services.wishlist_service import WishlistService
+from services.notification_service import NotificationService
+from services.security_service import SecurityService
+from services.security_scan_service import SecurityScanService
+from services.job_scheduler import JobScheduler
+from database.ttl_store import sweep_ttl_store, TTL_STORE_SWEEP_INTERVAL_SECONDS
+from services.token_service import TokenService
+from auth.revocation import revocation_list, REVOCATION_SYNC_INTERVAL_SECONDS, REVOCATION_REBUILD_INTERVAL_SECONDS
 
 # Configure logging
 logging.basicConfig(
@@ -56,6 +68,38 @@ async def lifespan(app: FastAPI):
         # Create default admin user
         await UserService.create_admin_user()
 
+        # Ensure indexes and backfill denormalized order data
+        await UserService.ensure_indexes()
+        await UserService.backfill_search_fields()
+        await UserService.rebuild_user_stats()
+        await OrderService.ensure_indexes()
+        await OrderService.backfill_customer_snapshots()
+        await OutboxService.ensure_indexes()
+        await OrderArchiveService.ensure_indexes()
+        await OrderArchiveService.rebuild_rollup()
+        await AbandonedCartService.ensure_indexes()
+        await WishlistService().ensure_indexes()
+        await NotificationService().ensure_indexes()
+        await SecurityService().ensure_indexes()
+        await SecurityService().backfill_device_timestamps()
+        await SecurityScanService.ensure_indexes()
+        await SecurityScanService.fail_stale_scans()
+        await TokenService.ensure_indexes()
+        await revocation_list.ensure_indexes()
+        await revocation_list.rebuild()
+
+        # Start background side-effect workers
+        await OutboxService.start_workers()
+
+        # Schedule maintenance jobs
+        JobScheduler.schedule("order-archival", ARCHIVE_INTERVAL_SECONDS, OrderArchiveService.archive_orders)
+        JobScheduler.schedule("archive-rollup-reconcile", ARCHIVE_ROLLUP_RECONCILE_INTERVAL_SECONDS, OrderArchiveService.rebuild_rollup, initial_delay=ARCHIVE_ROLLUP_RECONCILE_INTERVAL_SECONDS)
+        JobScheduler.schedule("abandoned-carts", ABANDONED_CART_SCAN_INTERVAL_SECONDS, AbandonedCartService.scan)
+        JobScheduler.schedule("user-stats-reconcile", USER_STATS_RECONCILE_INTERVAL_SECONDS, UserService.rebuild_user_stats, initial_delay=USER_STATS_RECONCILE_INTERVAL_SECONDS)
+        JobScheduler.schedule("ttl-store-sweep", TTL_STORE_SWEEP_INTERVAL_SECONDS, sweep_ttl_store, initial_delay=TTL_STORE_SWEEP_INTERVAL_SECONDS)
+        JobScheduler.schedule("token-revocation-sync", REVOCATION_SYNC_INTERVAL_SECONDS, revocation_list.sync, initial_delay=REVOCATION_SYNC_INTERVAL_SECONDS)
+        JobScheduler.schedule("token-revocation-rebuild", REVOCATION_REBUILD_INTERVAL_SECONDS, revocation_list.rebuild, initial_delay=REVOCATION_REBUILD_INTERVAL_SECONDS)
+
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
@@ -64,6 +108,8 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     logger.info("Shutting down...")
+    await JobScheduler.stop_all()
+    await OutboxService.stop_workers()
     await MongoDB.close_mongo_connection()
 
 # Create FastAPI app
@@ -81,7 +127,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # Credentialed requests do not expand "*", so cursor headers are listed by name
+    expose_headers=["*", "X-Next-Cursor"],
 )
 
 app.add_middleware(
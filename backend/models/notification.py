@@ -12,6 +12,7 @@ class NotificationType(str, Enum):
     ACCOUNT_SECURITY = "account_security"
     PRODUCT_RESTOCK = "product_restock"
     PRICE_DROP = "price_drop"
+    ABANDONED_CART = "abandoned_cart"
     REVIEW_REMINDER = "review_reminder"
     SYSTEM = "system"
 
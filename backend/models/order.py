@@ -58,6 +58,11 @@ class OrderAddress(BaseModel):
     country: str
     phone: Optional[str] = None
 
+class OrderCustomer(BaseModel):
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+
 class OrderBase(BaseModel):
     user_id: str
     items: List[OrderItem]
@@ -67,7 +72,7 @@ class OrderBase(BaseModel):
     payment_method: str
 
 class OrderCreate(OrderBase):
-    pass
+    coupon_code: Optional[str] = None
 
 class OrderUpdate(BaseModel):
     status: Optional[OrderStatus] = None
@@ -85,8 +90,12 @@ class OrderInDB(OrderBase):
     shipping_cost: float
     discount_amount: float = 0.0
     total_amount: float
+    coupon_code: Optional[str] = None
     tracking_number: Optional[str] = None
     notes: Optional[str] = None
+    customer: Optional[OrderCustomer] = None
+    item_count: Optional[int] = None
+    thumbnail_ref: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     shipped_at: Optional[datetime] = None
@@ -97,6 +106,7 @@ class OrderResponse(BaseModel):
     order_number: str
     user_id: str
     user: Optional[UserResponse] = None
+    customer: Optional[OrderCustomer] = None
     items: List[OrderItem]
     shipping_address: OrderAddress
     billing_address: OrderAddress
@@ -109,6 +119,7 @@ class OrderResponse(BaseModel):
     shipping_cost: float
     discount_amount: float
     total_amount: float
+    coupon_code: Optional[str] = None
     tracking_number: Optional[str] = None
     notes: Optional[str] = None
     created_at: datetime
@@ -124,6 +135,24 @@ class OrderListResponse(BaseModel):
     has_next: bool
     has_prev: bool
 
+class OrderSummary(BaseModel):
+    id: str
+    order_number: str
+    status: OrderStatus
+    payment_status: PaymentStatus
+    total_amount: float
+    item_count: int
+    thumbnail_ref: Optional[str] = None
+    created_at: datetime
+
+class OrderSummaryListResponse(BaseModel):
+    orders: List[OrderSummary]
+    total: int
+    page: int
+    limit: int
+    has_next: bool
+    has_prev: bool
+
 class OrderStats(BaseModel):
     total_orders: int
     pending_orders: int
@@ -152,6 +181,8 @@ class CartResponse(BaseModel):
     user_id: str
     items: List[Dict[str, Any]]  # Items with product details
     subtotal: float
+    discount_amount: float = 0.0
+    coupon_code: Optional[str] = None
     tax_amount: float
     shipping_cost: float
     total_amount: float
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from .order import ShippingMethod
+
+class PriceQuote(BaseModel):
+    line_subtotals: List[float] = []
+    subtotal: float
+    discount_amount: float = 0.0
+    tax_amount: float
+    shipping_cost: float
+    total_amount: float
+
+class PricingQuoteItem(BaseModel):
+    product_id: str
+    quantity: int = Field(..., gt=0)
+
+class PricingQuoteCart(BaseModel):
+    cart_id: Optional[str] = None
+    items: List[PricingQuoteItem]
+    shipping_method: ShippingMethod = ShippingMethod.STANDARD
+    coupon_code: Optional[str] = None
+
+class PricingQuoteRequest(BaseModel):
+    carts: List[PricingQuoteCart]
+
+class PricingQuoteResponse(BaseModel):
+    quotes: List[PriceQuote]
+    missing_products: List[str] = []
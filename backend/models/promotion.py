@@ -0,0 +1,51 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+from enum import Enum
+
+class PromotionType(str, Enum):
+    PERCENT_OFF = "percent_off"  # percent off matching category/brand/sku lines
+    BOGO = "bogo"  # buy one, get one free on matching lines
+    THRESHOLD = "threshold"  # amount or percent off orders above a minimum subtotal
+
+class PromotionBase(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    type: PromotionType
+    percent_off: Optional[float] = Field(None, gt=0, le=100)
+    amount_off: Optional[float] = Field(None, gt=0)
+    min_subtotal: Optional[float] = Field(None, ge=0)
+    category: Optional[str] = None
+    brand: Optional[str] = None
+    sku: Optional[str] = None
+    coupon_code: Optional[str] = Field(None, min_length=1, max_length=50)
+    is_active: bool = True
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+
+class PromotionCreate(PromotionBase):
+    pass
+
+class PromotionUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    percent_off: Optional[float] = Field(None, gt=0, le=100)
+    amount_off: Optional[float] = Field(None, gt=0)
+    min_subtotal: Optional[float] = Field(None, ge=0)
+    category: Optional[str] = None
+    brand: Optional[str] = None
+    sku: Optional[str] = None
+    coupon_code: Optional[str] = Field(None, min_length=1, max_length=50)
+    is_active: Optional[bool] = None
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+
+class PromotionInDB(PromotionBase):
+    id: str
+    created_at: datetime
+    updated_at: datetime
+
+class PromotionResponse(PromotionInDB):
+    pass
+
+class PromotionListResponse(BaseModel):
+    promotions: List[PromotionResponse]
+    total: int
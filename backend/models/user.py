@@ -82,12 +82,20 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
     remember_me: Optional[bool] = False
+    guest_cart_token: Optional[str] = None
 
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
     user: Optional[UserResponse] = None
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 class TokenData(BaseModel):
     email: Optional[str] = None
     user_id: Optional[str] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List, Dict
 from datetime import datetime
 
 class WishlistItemBase(BaseModel):
@@ -51,4 +51,10 @@ class WishlistStats(BaseModel):
     total_items: int
     total_value: float
     in_stock_items: int
-    out_of_stock_items: int
\ No newline at end of file
+    out_of_stock_items: int
+
+class WishlistContainsRequest(BaseModel):
+    product_ids: List[str] = Field(..., max_length=500)
+
+class WishlistContainsResponse(BaseModel):
+    contains: Dict[str, bool]
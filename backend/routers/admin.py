@@ -1,14 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from typing import Optional, List
 from models.user import UserResponse, UserUpdate, UserStats, UserCreate
 from models.product import ProductStats, ProductListResponse, ProductSearchFilters, ProductResponse, ProductStatus
 from models.order import OrderStats, OrderListResponse, OrderResponse, OrderUpdate, OrderStatus, PaymentStatus
-from models.security import SecurityStats, LoginHistory, SecurityEvent, DeviceInfo
+from models.security import SecurityStats, LoginHistory, SecurityEvent, DeviceInfo, LoginAttemptStatus
+from models.pricing import PricingQuoteRequest, PricingQuoteResponse
+from models.promotion import PromotionCreate, PromotionUpdate, PromotionResponse, PromotionListResponse
 from services.user_service import UserService
 from services.product_service import ProductService
 from services.order_service import OrderService
 from services.security_service import SecurityService
+from services.outbox_service import OutboxService
+from services.archive_service import OrderArchiveService
+from services.pricing_engine import PricingEngine
+from services.promotion_service import PromotionService
+from services.security_scan_service import SecurityScanService
 from auth.dependencies import get_current_admin_user
+from database.mongodb import MongoDB, ORDERS_COLLECTION, ORDERS_ARCHIVE_COLLECTION
 from models.user import UserInDB, UserRole, UserStatus
 import logging
 from datetime import datetime
@@ -27,8 +35,8 @@ async def create_user(
         user = await UserService.create_user(user_data)
 
         # Broadcast user creation via WebSocket
-        from routers.websocket import broadcast_user_activity
-        await broadcast_user_activity(user.id, "user_created", {
+        await OutboxService.enqueue_broadcast("admin-dashboard", "user_created", {
+            "user_id": user.id,
             "action": "create",
             "user": {
                 "id": user.id,
@@ -56,20 +64,26 @@ async def create_user(
 
 @router.get("/users", response_model=List[UserResponse])
 async def list_users(
+    response: Response,
     role: Optional[UserRole] = None,
     user_status: Optional[UserStatus] = None,
-    skip: int = Query(0, ge=0),
+    search: Optional[str] = Query(None, max_length=100),
+    after: Optional[str] = None,
     limit: int = Query(50, ge=1, le=100),
     current_user: UserInDB = Depends(get_current_admin_user)
 ):
     """List all users (Admin only)"""
     try:
         users = await UserService.list_users(
-            skip=skip,
             limit=limit,
             role=role,
-            status=user_status
+            status=user_status,
+            search=search,
+            after=after
         )
+        # A full page means there may be more; pass the last id back as ?after=
+        if len(users) == limit:
+            response.headers["X-Next-Cursor"] = users[-1].id
         return users
     except Exception as e:
         logger.error(f"List users error: {e}")
@@ -117,8 +131,8 @@ async def update_user(
             )
 
         # Broadcast user update via WebSocket
-        from routers.websocket import broadcast_user_activity
-        await broadcast_user_activity(user_id, "user_updated", {
+        await OutboxService.enqueue_broadcast("admin-dashboard", "user_updated", {
+            "user_id": user_id,
             "action": "update",
             "user": {
                 "id": user.id,
@@ -156,10 +170,9 @@ async def delete_user(
             )
 
         # Broadcast user deletion via WebSocket
-        from routers.websocket import broadcast_user_activity
-        await broadcast_user_activity(user_id, "user_deleted", {
-            "action": "delete",
-            "user_id": user_id
+        await OutboxService.enqueue_broadcast("admin-dashboard", "user_deleted", {
+            "user_id": user_id,
+            "action": "delete"
         })
 
         return {"message": "User deleted successfully"}
@@ -250,32 +263,39 @@ async def get_dashboard_stats(current_user: UserInDB = Depends(get_current_admin
             detail="Failed to get dashboard statistics"
         )
 
-@router.get("/security/stats", response_model=SecurityStats)
-async def get_admin_security_stats(current_user: UserInDB = Depends(get_current_admin_user)):
-    """Get global security statistics (Admin only)"""
+@router.get("/system/queue")
+async def get_outbox_queue_stats(current_user: UserInDB = Depends(get_current_admin_user)):
+    """Get side-effect queue depth and dead-letter count (Admin only)"""
     try:
-        security_service = SecurityService()
-        # Get stats for all users (admin view)
-        all_users = await UserService.list_users(limit=1000)  # Get all users
-        total_stats = SecurityStats(
-            total_login_attempts=0,
-            successful_logins=0,
-            failed_logins=0,
-            suspicious_activities=0,
-            active_sessions=0,
-            trusted_devices=0
+        return await OutboxService.get_queue_stats()
+    except Exception as e:
+        logger.error(f"Get queue stats error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get queue statistics"
         )
 
-        for user in all_users:
-            user_stats = await security_service.get_security_stats(user.id)
-            total_stats.total_login_attempts += user_stats.total_login_attempts
-            total_stats.successful_logins += user_stats.successful_logins
-            total_stats.failed_logins += user_stats.failed_logins
-            total_stats.suspicious_activities += user_stats.suspicious_activities
-            total_stats.active_sessions += user_stats.active_sessions
-            total_stats.trusted_devices += user_stats.trusted_devices
+@router.get("/system/caches")
+async def get_cache_stats(current_user: UserInDB = Depends(get_current_admin_user)):
+    """Get hit rates and sizes of in-process caches (Admin only)"""
+    from auth.dependencies import user_cache
+    from services.wishlist_service import wishlist_membership_cache
+    return {
+        "users": user_cache.stats(),
+        "wishlist_membership": wishlist_membership_cache.stats()
+    }
+
+@router.get("/system/password-hashing")
+async def get_password_hashing_stats(current_user: UserInDB = Depends(get_current_admin_user)):
+    """Get password hashing pool queue depth and latency (Admin only)"""
+    from auth.security import get_password_hash_stats
+    return get_password_hash_stats()
 
-        return total_stats
+@router.get("/security/stats", response_model=SecurityStats)
+async def get_admin_security_stats(current_user: UserInDB = Depends(get_current_admin_user)):
+    """Get global security statistics (Admin only)"""
+    try:
+        return await SecurityService().get_global_security_stats()
     except Exception as e:
         logger.error(f"Get admin security stats error: {e}")
         raise HTTPException(
@@ -285,27 +305,31 @@ async def get_admin_security_stats(current_user: UserInDB = Depends(get_current_
 
 @router.get("/security/login-history", response_model=List[LoginHistory])
 async def get_admin_login_history(
+    response: Response,
     user_id: Optional[str] = None,
+    login_status: Optional[LoginAttemptStatus] = Query(None, alias="status"),
+    ip_address: Optional[str] = None,
+    cursor: Optional[str] = None,
     limit: int = Query(100, ge=1, le=1000),
     current_user: UserInDB = Depends(get_current_admin_user)
 ):
-    """Get login history for all users or specific user (Admin only)"""
+    """Get login history for all users or specific user, newest first (Admin only)"""
     try:
-        security_service = SecurityService()
-        if user_id:
-            # Get history for specific user
-            return await security_service.get_login_history(user_id, limit)
-        else:
-            # Get history for all users (aggregate)
-            all_users = await UserService.list_users(limit=1000)
-            all_history = []
-            for user in all_users:
-                user_history = await security_service.get_login_history(user.id, min(limit // len(all_users) + 1, 50))
-                all_history.extend(user_history)
-
-            # Sort by timestamp descending and limit
-            all_history.sort(key=lambda x: x.timestamp, reverse=True)
-            return all_history[:limit]
+        history, next_cursor = await SecurityService().query_login_history(
+            limit=limit,
+            user_id=user_id,
+            status=login_status,
+            ip_address=ip_address,
+            cursor=cursor
+        )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return history
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Get admin login history error: {e}")
         raise HTTPException(
@@ -360,22 +384,56 @@ async def get_admin_security_events(
 
 @router.get("/security/devices", response_model=List[DeviceInfo])
 async def get_admin_connected_devices(
+    response: Response,
     user_id: Optional[str] = None,
+    trusted: Optional[bool] = None,
+    last_used_from: Optional[datetime] = None,
+    last_used_to: Optional[datetime] = None,
+    sort_by: str = "last_used",
+    sort_order: str = Query("-1", regex="^(1|-1)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    stream: bool = False,
     current_user: UserInDB = Depends(get_current_admin_user)
 ):
-    """Get connected devices for all users or specific user (Admin only)"""
+    """Get connected devices for all users or specific user; stream=true sends every match as NDJSON (Admin only)"""
     try:
         security_service = SecurityService()
-        if user_id:
-            return await security_service.get_connected_devices(user_id)
-        else:
-            # Get devices for all users
-            all_users = await UserService.list_users(limit=1000)
-            all_devices = []
-            for user in all_users:
-                user_devices = await security_service.get_connected_devices(user.id)
-                all_devices.extend(user_devices)
-            return all_devices
+        filters = dict(
+            user_id=user_id,
+            trusted=trusted,
+            last_used_from=last_used_from,
+            last_used_to=last_used_to,
+            sort_by=sort_by,
+            sort_order=sort_order
+        )
+
+        if stream:
+            import json
+            from fastapi.responses import StreamingResponse
+            from fastapi.encoders import jsonable_encoder
+
+            devices = security_service.stream_devices(**filters)
+
+            async def generate():
+                try:
+                    async for device in devices:
+                        yield json.dumps(jsonable_encoder(device)) + "\n"
+                except Exception as e:
+                    # Headers are already sent; a truncated stream is all we can signal
+                    logger.error(f"Stream admin devices error: {e}")
+
+            return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+        devices, next_cursor = await security_service.query_devices(limit=limit, cursor=cursor, **filters)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return devices
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Get admin connected devices error: {e}")
         raise HTTPException(
@@ -383,67 +441,59 @@ async def get_admin_connected_devices(
             detail="Failed to get connected devices"
         )
 
-@router.post("/security/scan")
+@router.post("/security/scan", status_code=status.HTTP_202_ACCEPTED)
 async def run_security_scan(current_user: UserInDB = Depends(get_current_admin_user)):
-    """Run a comprehensive security scan (Admin only)"""
+    """Start a background security scan; poll /security/scan/{scan_id} for results (Admin only)"""
     try:
-        security_service = SecurityService()
-        user_service = UserService()
-
-        # Get all users
-        all_users = await UserService.list_users(limit=1000)
-
-        scan_results = {
-            "total_users": len(all_users),
-            "users_with_2fa": 0,
-            "users_without_password": 0,
-            "failed_login_attempts": 0,
-            "suspicious_activities": 0,
-            "untrusted_devices": 0,
-            "weak_passwords": 0,  # Would need password strength checking
-            "inactive_accounts": 0,
-            "scan_timestamp": datetime.utcnow().isoformat()
-        }
-
-        for user in all_users:
-            # Get security settings
-            try:
-                settings = await security_service.get_security_settings(user.id)
-                if settings.two_factor_enabled:
-                    scan_results["users_with_2fa"] += 1
-
-                if not user.hashed_password:
-                    scan_results["users_without_password"] += 1
-
-                if settings.failed_login_attempts > 0:
-                    scan_results["failed_login_attempts"] += settings.failed_login_attempts
-
-                if user.status == "inactive":
-                    scan_results["inactive_accounts"] += 1
-            except:
-                pass
-
-            # Get security stats
-            try:
-                stats = await security_service.get_security_stats(user.id)
-                scan_results["suspicious_activities"] += stats.suspicious_activities
-
-                # Get devices
-                devices = await security_service.get_connected_devices(user.id)
-                untrusted_count = sum(1 for d in devices if not d.is_trusted)
-                scan_results["untrusted_devices"] += untrusted_count
-            except:
-                pass
-
+        scan = await SecurityScanService.start_scan(current_user.id)
         return {
-            "message": "Security scan completed",
-            "results": scan_results
+            "message": "Security scan started",
+            "scan_id": scan["id"],
+            "status": scan["status"]
         }
     except Exception as e:
         logger.error(f"Run security scan error: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to run security scan"
+            detail="Failed to start security scan"
+        )
+
+@router.get("/security/scans")
+async def list_security_scans(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: UserInDB = Depends(get_current_admin_user)
+):
+    """List recent security scans (Admin only)"""
+    try:
+        return await SecurityScanService.list_scans(limit)
+    except Exception as e:
+        logger.error(f"List security scans error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to list security scans"
+        )
+
+@router.get("/security/scan/{scan_id}")
+async def get_security_scan(
+    scan_id: str,
+    current_user: UserInDB = Depends(get_current_admin_user)
+):
+    """Get security scan progress and results (Admin only)"""
+    try:
+        scan = await SecurityScanService.get_scan(scan_id)
+        if not scan:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Security scan not found"
+            )
+        return scan
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get security scan error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get security scan"
         )
 
 @router.get("/inventory/alerts")
@@ -602,14 +652,17 @@ async def get_customer_satisfaction(current_user: UserInDB = Depends(get_current
 async def get_customer_stats(current_user: UserInDB = Depends(get_current_admin_user)):
     """Get customer statistics including total orders and total spent (Admin only)"""
     try:
-        # Get all customers
-        customers = await UserService.list_users(role="customer", limit=1000)
-
         customer_stats = []
-        for customer in customers:
-            # Get order stats for this customer
+        # One order aggregation per page of customers instead of one per customer
+        async for customers in UserService.iter_user_batches(role=UserRole.CUSTOMER, projection={"_id": 1}):
+            customer_ids = [customer["id"] for customer in customers]
+            # Archived orders still count towards a customer's history
             pipeline = [
-                {"$match": {"user_id": customer.id}},
+                {"$match": {"user_id": {"$in": customer_ids}}},
+                {"$unionWith": {
+                    "coll": ORDERS_ARCHIVE_COLLECTION,
+                    "pipeline": [{"$match": {"user_id": {"$in": customer_ids}}}]
+                }},
                 {
                     "$group": {
                         "_id": "$user_id",
@@ -619,21 +672,18 @@ async def get_customer_stats(current_user: UserInDB = Depends(get_current_admin_
                 }
             ]
 
-            result = await MongoDB.get_collection(ORDERS_COLLECTION).aggregate(pipeline).to_list(1)
+            order_stats = {
+                row["_id"]: row
+                async for row in MongoDB.get_collection(ORDERS_COLLECTION).aggregate(pipeline)
+            }
 
-            if result:
-                stats = result[0]
+            for customer_id in customer_ids:
+                stats = order_stats.get(customer_id, {})
                 customer_stats.append({
-                    "id": customer.id,
+                    "id": customer_id,
                     "total_orders": stats.get("total_orders", 0),
                     "total_spent": stats.get("total_spent", 0.0)
                 })
-            else:
-                customer_stats.append({
-                    "id": customer.id,
-                    "total_orders": 0,
-                    "total_spent": 0.0
-                })
 
         return customer_stats
     except Exception as e:
@@ -821,6 +871,7 @@ async def list_orders_admin(
     limit: int = Query(50, ge=1, le=1000),
     sort_by: str = "created_at",
     sort_order: str = Query("-1", regex="^(1|-1)$"),
+    include_archive: bool = Query(False, description="Continue into archived orders after the active ones"),
     current_user: UserInDB = Depends(get_current_admin_user)
 ):
     """List all orders for admin management (Admin only)"""
@@ -835,7 +886,8 @@ async def list_orders_admin(
             skip=skip,
             limit=limit,
             sort_by=sort_by,
-            sort_order=sort_order
+            sort_order=sort_order,
+            include_archive=include_archive
         )
         return result
     except Exception as e:
@@ -920,15 +972,13 @@ async def bulk_update_orders_admin(
                 detail=f"Invalid status. Must be one of: {[s.value for s in OrderStatus]}"
             )
 
-        updated_orders = []
-        for order_id in order_ids:
-            order = await OrderService.update_order(order_id, OrderUpdate(status=OrderStatus(status_value)))
-            if order:
-                updated_orders.append(OrderResponse(**order.dict()))
+        result = await OrderService.bulk_update_order_status(order_ids, OrderStatus(status_value))
+        updated_orders = [OrderResponse(**order.dict()) for order in result["updated_orders"]]
 
         return {
             "message": f"Updated {len(updated_orders)} orders successfully",
-            "updated_orders": updated_orders
+            "updated_orders": updated_orders,
+            "results": result["outcomes"]
         }
     except HTTPException:
         raise
@@ -939,6 +989,129 @@ async def bulk_update_orders_admin(
             detail="Failed to bulk update orders"
         )
 
+@router.post("/orders/archive")
+async def archive_orders_admin(
+    older_than_days: int = Query(365, ge=30),
+    current_user: UserInDB = Depends(get_current_admin_user)
+):
+    """Move old delivered/cancelled/refunded orders to the archive (Admin only)"""
+    try:
+        archived = await OrderArchiveService.archive_orders(older_than_days=older_than_days)
+        return {
+            "message": f"Archived {archived} orders successfully",
+            "archived_count": archived
+        }
+    except Exception as e:
+        logger.error(f"Archive orders admin error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to archive orders"
+        )
+
+@router.post("/pricing/quote", response_model=PricingQuoteResponse)
+async def quote_carts_admin(
+    quote_request: PricingQuoteRequest,
+    current_user: UserInDB = Depends(get_current_admin_user)
+):
+    """Price a batch of carts at current product prices (Admin only)"""
+    try:
+        quotes, missing_products = await PricingEngine.quote_carts(quote_request.carts)
+        return PricingQuoteResponse(quotes=quotes, missing_products=missing_products)
+    except Exception as e:
+        logger.error(f"Pricing quote admin error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to quote carts"
+        )
+
+@router.get("/promotions", response_model=PromotionListResponse)
+async def list_promotions_admin(
+    active_only: bool = False,
+    current_user: UserInDB = Depends(get_current_admin_user)
+):
+    """List promotions (Admin only)"""
+    try:
+        return await PromotionService.list_promotions(active_only=active_only)
+    except Exception as e:
+        logger.error(f"List promotions admin error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to list promotions"
+        )
+
+@router.post("/promotions", response_model=PromotionResponse)
+async def create_promotion_admin(
+    promotion_data: PromotionCreate,
+    current_user: UserInDB = Depends(get_current_admin_user)
+):
+    """Create a promotion (Admin only)"""
+    try:
+        promotion = await PromotionService.create_promotion(promotion_data)
+        return PromotionResponse(**promotion.dict())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Create promotion admin error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create promotion"
+        )
+
+@router.put("/promotions/{promotion_id}", response_model=PromotionResponse)
+async def update_promotion_admin(
+    promotion_id: str,
+    promotion_data: PromotionUpdate,
+    current_user: UserInDB = Depends(get_current_admin_user)
+):
+    """Update a promotion (Admin only)"""
+    try:
+        promotion = await PromotionService.update_promotion(promotion_id, promotion_data)
+        if not promotion:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Promotion not found"
+            )
+        return PromotionResponse(**promotion.dict())
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Update promotion admin error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update promotion"
+        )
+
+@router.delete("/promotions/{promotion_id}")
+async def delete_promotion_admin(
+    promotion_id: str,
+    current_user: UserInDB = Depends(get_current_admin_user)
+):
+    """Delete a promotion (Admin only)"""
+    try:
+        deleted = await PromotionService.delete_promotion(promotion_id)
+        if not deleted:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Promotion not found"
+            )
+        return {"message": "Promotion deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Delete promotion admin error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to delete promotion"
+        )
+
 @router.get("/orders/export")
 async def export_orders_admin(
     user_id: Optional[str] = None,
@@ -947,6 +1120,7 @@ async def export_orders_admin(
     search: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    include_archive: bool = Query(False, description="Include archived orders after the active ones"),
     current_user: UserInDB = Depends(get_current_admin_user)
 ):
     """Export orders to CSV (Admin only)"""
@@ -958,7 +1132,8 @@ async def export_orders_admin(
             search=search,
             start_date=start_date,
             end_date=end_date,
-            limit=10000  # Large limit for export
+            limit=10000,  # Large limit for export
+            include_archive=include_archive
         )
 
         # Generate CSV content
@@ -977,8 +1152,8 @@ async def export_orders_admin(
 
         # Write data
         for order in orders.orders:
-            customer_name = f"{order.user.first_name} {order.user.last_name}" if order.user else "N/A"
-            customer_email = order.user.email if order.user else "N/A"
+            customer_name = f"{order.customer.first_name} {order.customer.last_name}" if order.customer else "N/A"
+            customer_email = order.customer.email if order.customer else "N/A"
             items_count = len(order.items)
             shipping_address = f"{order.shipping_address.city}, {order.shipping_address.state}"
 
@@ -3,18 +3,28 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from models.user import UserCreate, UserResponse, Token, UserLogin, UserUpdate
+from models.user import UserCreate, UserResponse, Token, UserLogin, UserUpdate, RefreshTokenRequest, LogoutRequest
 from services.user_service import UserService
-from auth.security import create_access_token
-from auth.dependencies import get_current_active_user
+from services.outbox_service import OutboxService
+from services.guest_cart_service import GuestCartService
+from auth.security import create_access_token, verify_guest_cart_token, verify_token
+from services.token_service import TokenService
+from auth.dependencies import get_current_active_user, security
+from fastapi.security import HTTPAuthorizationCredentials
 from models.user import UserInDB
 from utils.config import settings
+from database.ttl_store import get_ttl_store
+from fastapi.encoders import jsonable_encoder
 import logging
 import httpx
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+# Google OAuth handoff sessions live this long in the TTL store
+OAUTH_SESSION_TTL_SECONDS = 300
+OAUTH_SESSION_PREFIX = "oauth_session:"
+
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 @router.post("/register", response_model=UserResponse)
@@ -24,8 +34,7 @@ async def register(user_data: UserCreate):
         user = await UserService.create_user(user_data)
 
         # Broadcast user registration via WebSocket for real-time admin dashboard updates
-        from routers.websocket import broadcast_dashboard_update
-        await broadcast_dashboard_update("user_update", {
+        await OutboxService.enqueue_broadcast("admin-dashboard", "user_update", {
             "action": "create",
             "user": {
                 "id": user.id,
@@ -71,8 +80,17 @@ async def login(login_data: UserLogin):
                 detail="Account is not active"
             )
 
+        # Carry over anything added to the cart before signing in
+        guest_cart_id = verify_guest_cart_token(login_data.guest_cart_token)
+        if guest_cart_id:
+            try:
+                await GuestCartService.merge_into_user_cart(guest_cart_id, user.id)
+            except Exception as e:
+                logger.error(f"Guest cart merge on login failed for user {user.id}: {e}")
+
         access_token = create_access_token(data={"sub": user.id, "role": user.role}, remember_me=login_data.remember_me)
-        return Token(access_token=access_token, user=UserResponse(**user.dict()))
+        refresh_token = await TokenService.issue_refresh_token(user.id)
+        return Token(access_token=access_token, refresh_token=refresh_token, user=UserResponse(**user.dict()))
     except HTTPException:
         raise
     except Exception as e:
@@ -101,6 +119,62 @@ async def refresh_access_token(current_user: UserInDB = Depends(get_current_acti
             detail="Token refresh failed"
         )
 
+@router.post("/refresh", response_model=Token)
+async def refresh_with_refresh_token(refresh_request: RefreshTokenRequest):
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    try:
+        user_id, refresh_token = await TokenService.rotate_refresh_token(refresh_request.refresh_token)
+
+        user = await UserService.get_user_by_id(user_id)
+        if not user or user.status != "active":
+            await TokenService.revoke_refresh_token(refresh_token)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Account is not active"
+            )
+
+        access_token = create_access_token(data={"sub": user.id, "role": user.role})
+        return Token(access_token=access_token, refresh_token=refresh_token, user=UserResponse(**user.dict()))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Refresh token error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Token refresh failed"
+        )
+
+@router.post("/logout")
+async def logout(
+    logout_request: Optional[LogoutRequest] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+):
+    """Revoke the current access token and, if given, its refresh token family"""
+    if not credentials:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    payload = verify_token(credentials.credentials)
+    try:
+        await TokenService.revoke_access_token(payload)
+        if logout_request and logout_request.refresh_token:
+            await TokenService.revoke_refresh_token(logout_request.refresh_token)
+        return {"message": "Logged out successfully"}
+    except Exception as e:
+        logger.error(f"Logout error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Logout failed"
+        )
+
 @router.put("/me", response_model=UserResponse)
 async def update_current_user(
     update_data: UserUpdate,
@@ -181,8 +255,7 @@ async def google_callback_get(code: str):
 
         # Broadcast user registration via WebSocket for real-time admin dashboard updates (only for new users)
         if user.created_at == user.updated_at:  # Assuming this indicates a new user
-            from routers.websocket import broadcast_dashboard_update
-            await broadcast_dashboard_update("user_update", {
+            await OutboxService.enqueue_broadcast("admin-dashboard", "user_update", {
                 "action": "create",
                 "user": {
                     "id": user.id,
@@ -206,17 +279,12 @@ async def google_callback_get(code: str):
         import uuid
         session_id = str(uuid.uuid4())
 
-        # Store auth data temporarily (in a real app, use Redis/session store)
-        # For now, we'll use a simple in-memory dict (not production ready)
-        if not hasattr(google_callback_get, 'auth_sessions'):
-            google_callback_get.auth_sessions = {}
-
-        google_callback_get.auth_sessions[session_id] = {
-            'user': user_response_data,
+        # Hand the token to the frontend through a short-lived, single-use session
+        await get_ttl_store().set(f"{OAUTH_SESSION_PREFIX}{session_id}", {
+            'user': jsonable_encoder(user_response_data),
             'token': access_token,
-            'role': user.role.value,
-            'expires': datetime.utcnow().timestamp() + 300  # 5 minutes
-        }
+            'role': user.role.value
+        }, OAUTH_SESSION_TTL_SECONDS)
 
         # Redirect to frontend with session ID
         redirect_url = f"http://localhost:5173/auth/google/callback?session_id={session_id}"
@@ -239,22 +307,11 @@ async def google_callback_get(code: str):
 async def get_google_auth_session(session_id: str):
     """Get authentication data for a session"""
     try:
-        # Check if session exists and hasn't expired
-        if not hasattr(google_callback_get, 'auth_sessions'):
-            raise HTTPException(status_code=404, detail="Session not found")
-
-        session_data = google_callback_get.auth_sessions.get(session_id)
+        # Sessions are single use; expired ones are already gone from the store
+        session_data = await get_ttl_store().pop(f"{OAUTH_SESSION_PREFIX}{session_id}")
         if not session_data:
             raise HTTPException(status_code=404, detail="Session not found")
 
-        # Check if session has expired
-        if datetime.utcnow().timestamp() > session_data['expires']:
-            del google_callback_get.auth_sessions[session_id]
-            raise HTTPException(status_code=404, detail="Session expired")
-
-        # Clean up session after use
-        del google_callback_get.auth_sessions[session_id]
-
         return {
             "access_token": session_data['token'],
             "token_type": "bearer",
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
 from typing import Optional, List
 from models.order import (
     OrderCreate, OrderUpdate, OrderResponse, OrderListResponse,
-    OrderStats, CartResponse, ReturnRequestCreate, ReturnRequestUpdate,
+    OrderSummaryListResponse, OrderStats, CartResponse, ReturnRequestCreate, ReturnRequestUpdate,
     ReturnRequestResponse, ReturnRequestListResponse, ReturnStats
 )
 from models.user import UserInDB
 from services.order_service import OrderService
+from services.guest_cart_service import GuestCartService
+from auth.security import create_guest_cart_token, verify_guest_cart_token
 from auth.dependencies import get_current_active_user, get_current_editor_user
 import logging
 
@@ -134,6 +136,7 @@ async def list_orders(
     status: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    include_archive: bool = Query(True, description="Continue into archived orders after the active ones"),
     current_user: UserInDB = Depends(get_current_active_user)
 ):
     """List orders with filters"""
@@ -146,7 +149,8 @@ async def list_orders(
             user_id=user_id,
             status=status,
             skip=skip,
-            limit=limit
+            limit=limit,
+            include_archive=include_archive
         )
         return result
     except Exception as e:
@@ -156,6 +160,31 @@ async def list_orders(
             detail="Failed to list orders"
         )
 
+@router.get("/summary/", response_model=OrderSummaryListResponse)
+async def list_order_summaries(
+    order_status: Optional[str] = Query(None, alias="status"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    include_archive: bool = Query(True, description="Continue into archived orders after the active ones"),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """List the current user's order history as lightweight summaries"""
+    try:
+        result = await OrderService.list_order_summaries(
+            user_id=current_user.id,
+            status=order_status,
+            skip=skip,
+            limit=limit,
+            include_archive=include_archive
+        )
+        return result
+    except Exception as e:
+        logger.error(f"List order summaries error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to list orders"
+        )
+
 @router.get("/stats/", response_model=OrderStats)
 async def get_order_stats(current_user: UserInDB = Depends(get_current_editor_user)):
     """Get order statistics (Editor/Admin only)"""
@@ -171,10 +200,13 @@ async def get_order_stats(current_user: UserInDB = Depends(get_current_editor_us
 
 # Cart endpoints
 @router.get("/cart/", response_model=CartResponse)
-async def get_cart(current_user: UserInDB = Depends(get_current_active_user)):
-    """Get user's cart"""
+async def get_cart(
+    coupon_code: Optional[str] = None,
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """Get user's cart, priced with an optional coupon code"""
     try:
-        cart = await OrderService.get_user_cart(current_user.id)
+        cart = await OrderService.get_user_cart(current_user.id, coupon_code)
         return cart
     except Exception as e:
         logger.error(f"Get cart error: {e}")
@@ -255,6 +287,128 @@ async def remove_from_cart(
             detail="Failed to remove item from cart"
         )
 
+@router.post("/cart/merge/", response_model=CartResponse)
+async def merge_guest_cart(
+    cart_token: Optional[str] = Header(None, alias="X-Cart-Token"),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """Merge a guest cart into the current user's cart"""
+    cart_id = verify_guest_cart_token(cart_token)
+    if not cart_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cart token"
+        )
+
+    try:
+        return await GuestCartService.merge_into_user_cart(cart_id, current_user.id)
+    except Exception as e:
+        logger.error(f"Merge guest cart error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to merge guest cart"
+        )
+
+# Guest cart endpoints
+@router.get("/guest-cart/", response_model=CartResponse)
+async def get_guest_cart(cart_token: Optional[str] = Header(None, alias="X-Cart-Token")):
+    """Get a guest cart"""
+    try:
+        return await GuestCartService.get_cart(verify_guest_cart_token(cart_token))
+    except Exception as e:
+        logger.error(f"Get guest cart error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get cart"
+        )
+
+@router.post("/guest-cart/add/")
+async def add_to_guest_cart(
+    response: Response,
+    product_id: str = Query(..., description="Product ID"),
+    quantity: int = Query(1, ge=1, description="Quantity to add"),
+    size: Optional[str] = Query(None, description="Product size"),
+    color: Optional[str] = Query(None, description="Product color"),
+    cart_token: Optional[str] = Header(None, alias="X-Cart-Token")
+):
+    """Add item to a guest cart, issuing a cart token if the request has none"""
+    try:
+        cart_id = verify_guest_cart_token(cart_token)
+        if not cart_id:
+            cart_token = create_guest_cart_token()
+            cart_id = verify_guest_cart_token(cart_token)
+
+        cart = await GuestCartService.add_to_cart(cart_id, product_id, quantity, size, color)
+        response.headers["X-Cart-Token"] = cart_token
+        return {"message": "Item added to cart", "cart": cart, "cart_token": cart_token}
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Add to guest cart error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to add item to cart"
+        )
+
+@router.put("/guest-cart/update/")
+async def update_guest_cart_quantity(
+    product_id: str = Query(..., description="Product ID"),
+    quantity: int = Query(..., ge=1, description="New quantity"),
+    size: Optional[str] = Query(None, description="Product size"),
+    color: Optional[str] = Query(None, description="Product color"),
+    cart_token: Optional[str] = Header(None, alias="X-Cart-Token")
+):
+    """Update guest cart item quantity with stock validation"""
+    cart_id = verify_guest_cart_token(cart_token)
+    if not cart_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cart token"
+        )
+
+    try:
+        cart = await GuestCartService.update_cart_quantity(cart_id, product_id, quantity, size, color)
+        return {"message": "Cart updated", "cart": cart}
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Update guest cart quantity error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update cart"
+        )
+
+@router.delete("/guest-cart/remove/")
+async def remove_from_guest_cart(
+    product_id: str = Query(..., description="Product ID"),
+    size: Optional[str] = Query(None, description="Product size"),
+    color: Optional[str] = Query(None, description="Product color"),
+    cart_token: Optional[str] = Header(None, alias="X-Cart-Token")
+):
+    """Remove item from a guest cart"""
+    cart_id = verify_guest_cart_token(cart_token)
+    if not cart_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cart token"
+        )
+
+    try:
+        cart = await GuestCartService.remove_from_cart(cart_id, product_id, size, color)
+        return {"message": "Item removed from cart", "cart": cart}
+    except Exception as e:
+        logger.error(f"Remove from guest cart error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to remove item from cart"
+        )
+
 # Return/Refund endpoints
 @router.post("/returns/", response_model=ReturnRequestResponse)
 async def create_return_request(
@@ -302,7 +456,7 @@ async def get_return_request(
 
 @router.get("/returns/", response_model=ReturnRequestListResponse)
 async def list_return_requests(
-    status: Optional[str] = None,
+    order_status: Optional[str] = Query(None, alias="status"),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     current_user: UserInDB = Depends(get_current_active_user)
@@ -311,7 +465,7 @@ async def list_return_requests(
     try:
         result = await OrderService.list_return_requests(
             user_id=current_user.id,
-            status=status,
+            status=order_status,
             skip=skip,
             limit=limit
         )
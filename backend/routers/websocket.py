@@ -1,4 +1,5 @@
 from fastapi import WebSocket, WebSocketDisconnect, APIRouter, Depends, Query
+from fastapi.encoders import jsonable_encoder
 from typing import Dict, List
 import json
 import logging
@@ -56,6 +57,111 @@ class WebSocketManager:
 # Global WebSocket manager
 ws_manager = WebSocketManager()
 
+# Cart updates arriving within this window are merged into one message
+CART_BROADCAST_DEBOUNCE_SECONDS = 0.25
+CART_TOTAL_FIELDS = ("subtotal", "discount_amount", "tax_amount", "shipping_cost", "total_amount", "item_count")
+
+class CartBroadcaster:
+    """Coalesces per-user cart updates into versioned diffs"""
+
+    def __init__(self, manager: WebSocketManager):
+        self.manager = manager
+        self.states: Dict[str, dict] = {}
+
+    @staticmethod
+    def line_key(item: dict) -> str:
+        """Key a cart line by product, size and color"""
+        return f"{item['product_id']}|{item.get('size') or ''}|{item.get('color') or ''}"
+
+    def _state(self, user_id: str) -> dict:
+        """Get or create a user's broadcast state"""
+        if user_id not in self.states:
+            self.states[user_id] = {"version": 0, "lines": {}, "totals": {}, "pending": None, "timer": None}
+        return self.states[user_id]
+
+    def _remember(self, state: dict, cart: dict) -> None:
+        """Record the cart the clients now hold"""
+        state["lines"] = {self.line_key(item): item for item in cart.get("items", [])}
+        state["totals"] = {field: cart.get(field) for field in CART_TOTAL_FIELDS}
+
+    def schedule(self, user_id: str, cart: dict) -> None:
+        """Queue the latest cart; only the newest one in the debounce window is sent"""
+        channel = f"cart_{user_id}"
+        if not self.manager.active_connections.get(channel):
+            self.states.pop(user_id, None)
+            return
+
+        state = self._state(user_id)
+        state["pending"] = cart
+        if state["timer"] is None:
+            state["timer"] = asyncio.create_task(self._flush_later(user_id))
+
+    async def _flush_later(self, user_id: str) -> None:
+        """Send the diff between the last sent cart and the newest pending one"""
+        await asyncio.sleep(CART_BROADCAST_DEBOUNCE_SECONDS)
+        state = self.states.get(user_id)
+        if not state:
+            return
+        cart, state["pending"], state["timer"] = state["pending"], None, None
+        if cart is None:
+            return
+
+        channel = f"cart_{user_id}"
+        if not self.manager.active_connections.get(channel):
+            self.states.pop(user_id, None)
+            return
+
+        lines = {self.line_key(item): item for item in cart.get("items", [])}
+        upserts = []
+        for key, item in lines.items():
+            previous = state["lines"].get(key)
+            if previous is None:
+                upserts.append({"key": key, **item})
+            elif any(item.get(field) != previous.get(field) for field in ("quantity", "price", "subtotal")):
+                upserts.append({
+                    "key": key,
+                    "quantity": item.get("quantity"),
+                    "price": item.get("price"),
+                    "subtotal": item.get("subtotal")
+                })
+        removed = [key for key in state["lines"] if key not in lines]
+        totals = {field: cart.get(field) for field in CART_TOTAL_FIELDS}
+
+        if not upserts and not removed and totals == state["totals"]:
+            return
+
+        state["version"] += 1
+        self._remember(state, cart)
+        await self.manager.broadcast(channel, {
+            "type": "CART_DIFF",
+            "data": {
+                "version": state["version"],
+                "upserts": upserts,
+                "removed": removed,
+                "totals": totals
+            }
+        })
+
+    async def snapshot(self, user_id: str, cart: dict) -> dict:
+        """Full cart message for a resync, which also resets the diff baseline"""
+        state = self._state(user_id)
+        self._remember(state, cart)
+        return {
+            "type": "CART_SNAPSHOT",
+            "data": {"version": state["version"], "cart": cart},
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    def evict(self, user_id: str) -> None:
+        """Drop a user's state once their cart channel has no sockets"""
+        if self.manager.active_connections.get(f"cart_{user_id}"):
+            return
+        state = self.states.pop(user_id, None)
+        if state and state["timer"]:
+            state["timer"].cancel()
+
+cart_broadcaster = CartBroadcaster(ws_manager)
+
 async def authenticate_websocket(token: str) -> bool:
     """Authenticate WebSocket connection using JWT token"""
     try:
@@ -218,10 +324,43 @@ async def orders_websocket(websocket: WebSocket):
         logger.error(f"Orders WebSocket error: {e}")
         ws_manager.disconnect(websocket, "orders")
 
+async def _authenticate_cart_socket(websocket: WebSocket, user_id: str) -> bool:
+    """Require an auth message whose access token belongs to the cart's user"""
+    try:
+        data = await asyncio.wait_for(websocket.receive_text(), timeout=10.0)
+        message = json.loads(data)
+        if message.get("type") != "auth" or not message.get("token"):
+            raise ValueError("Authentication required")
+        payload = verify_token(message["token"])
+        if payload.get("sub") != user_id:
+            raise ValueError("Token does not match cart owner")
+    except Exception as e:
+        logger.warning(f"Cart WebSocket authentication failed for user {user_id}: {e}")
+        try:
+            await websocket.send_json({
+                "type": "auth_failed",
+                "message": "Authentication failed",
+                "timestamp": datetime.utcnow().isoformat()
+            })
+            await websocket.close(code=1008)
+        except Exception:
+            pass
+        return False
+
+    await websocket.send_json({
+        "type": "auth_success",
+        "message": "Authentication successful",
+        "timestamp": datetime.utcnow().isoformat()
+    })
+    return True
+
 @router.websocket("/cart/{user_id}")
 async def cart_websocket(websocket: WebSocket, user_id: str):
-    """WebSocket for real-time cart updates per user"""
+    """WebSocket for real-time cart updates per user; the first message must authenticate as that user"""
     await websocket.accept()
+    if not await _authenticate_cart_socket(websocket, user_id):
+        return
+
     channel = f"cart_{user_id}"
     await ws_manager.connect(websocket, channel)
     logger.info(f"User {user_id} connected to cart WebSocket")
@@ -229,13 +368,25 @@ async def cart_websocket(websocket: WebSocket, user_id: str):
     try:
         while True:
             data = await websocket.receive_text()
-            await websocket.send_json({"type": "pong", "timestamp": datetime.utcnow().isoformat()})
+            try:
+                message = json.loads(data)
+            except json.JSONDecodeError:
+                message = {}
+
+            if message.get("type") == "resync":
+                from services.order_service import OrderService
+                cart = await OrderService.get_user_cart(user_id)
+                await websocket.send_json(await cart_broadcaster.snapshot(user_id, jsonable_encoder(cart)))
+            else:
+                await websocket.send_json({"type": "pong", "timestamp": datetime.utcnow().isoformat()})
     except WebSocketDisconnect:
         ws_manager.disconnect(websocket, channel)
         logger.info(f"User {user_id} disconnected from cart WebSocket")
     except Exception as e:
         logger.error(f"Cart WebSocket error for user {user_id}: {e}")
         ws_manager.disconnect(websocket, channel)
+    finally:
+        cart_broadcaster.evict(user_id)
 
 # Clean broadcast functions
 async def broadcast_to_channel(channel: str, message_type: str, data: dict):
@@ -264,11 +415,8 @@ async def broadcast_order_update(order_id: str, update_type: str, data: dict):
     })
 
 async def broadcast_cart_update(user_id: str, cart_data: dict):
-    """Broadcast cart update to user's WebSocket channel"""
-    channel = f"cart_{user_id}"
-    await broadcast_to_channel(channel, "CART_UPDATED", {
-        "cart": cart_data
-    })
+    """Queue a debounced cart diff for the user's WebSocket channel"""
+    cart_broadcaster.schedule(user_id, cart_data)
 
 # Admin dashboard broadcast functions
 async def broadcast_inventory_update(message_type: str, data: dict):
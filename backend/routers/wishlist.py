@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import Optional
 from models.wishlist import (
     WishlistItemCreate, WishlistItemUpdate, WishlistItemResponse,
-    WishlistResponse, WishlistStats, WishlistItemBase
+    WishlistResponse, WishlistStats, WishlistItemBase,
+    WishlistContainsRequest, WishlistContainsResponse
 )
 from models.user import UserInDB
 from services.wishlist_service import WishlistService
@@ -156,6 +157,23 @@ async def check_in_wishlist(
             detail="Failed to check wishlist status"
         )
 
+@router.post("/contains", response_model=WishlistContainsResponse)
+async def wishlist_contains(
+    contains_request: WishlistContainsRequest,
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """Check which of many products are in user's wishlist"""
+    try:
+        wishlist_service = get_wishlist_service()
+        contains = await wishlist_service.contains_products(current_user.id, contains_request.product_ids)
+        return WishlistContainsResponse(contains=contains)
+    except Exception as e:
+        logger.error(f"Wishlist contains error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to check wishlist status"
+        )
+
 @router.get("/stats/", response_model=WishlistStats)
 async def get_wishlist_stats(current_user: UserInDB = Depends(get_current_active_user)):
     """Get wishlist statistics for current user"""
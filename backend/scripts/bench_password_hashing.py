@@ -0,0 +1,65 @@
+"""Benchmark password hashing on the bounded pool against hashing inline on the event loop.
+
+While a burst of logins hashes passwords, a ticker coroutine wakes every --tick-ms and records
+how late it runs; that lag is what every other request on the worker waits through.
+
+Run from backend/: python scripts/bench_password_hashing.py [--logins N] [--tick-ms MS]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.security import (
+    PASSWORD_HASH_WORKERS, verify_password, verify_password_async, get_password_hash
+)
+
+async def inline_login(password: str, hashed: str) -> bool:
+    """The pre-pool login path: verify directly inside the coroutine"""
+    return verify_password(password, hashed)
+
+async def measure(login, logins: int, password: str, hashed: str, tick_seconds: float):
+    """Run a burst of logins; returns (seconds, max loop lag, p99 loop lag)"""
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + tick_seconds
+            await asyncio.sleep(tick_seconds)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(tick_seconds)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login(password, hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick_task
+
+    assert all(results)
+    lags.sort()
+    return elapsed, lags[-1], lags[int(len(lags) * 0.99)]
+
+async def main_async(args) -> None:
+    password = "correct horse battery staple"
+    hashed = get_password_hash(password)
+
+    for label, login in (("inline", inline_login), ("pool", verify_password_async)):
+        elapsed, max_lag, p99_lag = await measure(login, args.logins, password, hashed, args.tick_ms / 1000)
+        print(f"{label:7} {args.logins / elapsed:7.1f} logins/s   loop lag p99 {p99_lag * 1000:8.1f} ms   max {max_lag * 1000:8.1f} ms")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{args.logins} concurrent logins, {PASSWORD_HASH_WORKERS} hash workers, {os.cpu_count()} cpus")
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
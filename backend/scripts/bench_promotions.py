@@ -0,0 +1,91 @@
+"""Benchmark PromotionIndex.evaluate against a linear scan over every promotion.
+
+Run from backend/: python scripts/bench_promotions.py [--promotions N] [--lines N]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.promotion_service import PromotionIndex, CompiledPromotion
+from models.promotion import PromotionType
+
+def build_promotions(count: int, rng: random.Random):
+    """Line and order rules spread over skus, brands and categories, a few behind coupons"""
+    docs = []
+    for i in range(count):
+        promotion_type = rng.choice([PromotionType.PERCENT_OFF, PromotionType.PERCENT_OFF, PromotionType.BOGO, PromotionType.THRESHOLD])
+        doc = {"_id": str(i), "type": promotion_type, "percent_off": rng.choice([5, 10, 15, 20])}
+        if promotion_type == PromotionType.THRESHOLD:
+            doc["min_subtotal"] = rng.choice([50, 100, 200])
+        else:
+            target = rng.choice(["sku", "brand", "category"])
+            doc[target] = f"{target}-{rng.randrange(count // 4 or 1)}"
+        if rng.random() < 0.05:
+            doc["coupon_code"] = f"SAVE{i}"
+        docs.append(doc)
+    return docs
+
+def build_cart(line_count: int, promotion_count: int, rng: random.Random):
+    spread = promotion_count // 4 or 1
+    return [
+        (rng.randrange(500, 20000), rng.randrange(1, 4), f"category-{rng.randrange(spread)}", f"brand-{rng.randrange(spread)}", f"sku-{rng.randrange(spread)}")
+        for _ in range(line_count)
+    ]
+
+def linear_evaluate(rules, coupon_rules, lines, now):
+    """Reference implementation: every line checks every promotion"""
+    subtotal = 0
+    line_total = 0
+    for unit_cents, quantity, category, brand, sku in lines:
+        subtotal += unit_cents * quantity
+        best = 0
+        for rule, coupon in rules:
+            if rule.type == PromotionType.THRESHOLD or (coupon and rule not in coupon_rules):
+                continue
+            if not rule.matches(category, brand, sku) or not rule.is_live(now):
+                continue
+            best = max(best, rule.line_discount(unit_cents, quantity))
+        line_total += best
+
+    order_total = 0
+    for rule, coupon in rules:
+        if rule.type != PromotionType.THRESHOLD or (coupon and rule not in coupon_rules) or not rule.is_live(now):
+            continue
+        order_total = max(order_total, rule.order_discount(subtotal - line_total))
+    return min(subtotal, line_total + order_total)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--promotions", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--carts", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    docs = build_promotions(args.promotions, rng)
+    carts = [build_cart(args.lines, args.promotions, rng) for _ in range(args.carts)]
+
+    index = PromotionIndex(docs)
+    rules = [(CompiledPromotion(doc), bool(doc.get("coupon_code"))) for doc in docs]
+
+    # Both paths must agree before their timings mean anything
+    for lines in carts:
+        assert index.evaluate(lines, now=now) == linear_evaluate(rules, (), lines, now)
+
+    indexed = min(timeit.repeat(lambda: [index.evaluate(lines, now=now) for lines in carts], number=5, repeat=3))
+    linear = min(timeit.repeat(lambda: [linear_evaluate(rules, (), lines, now) for lines in carts], number=5, repeat=3))
+    evaluations = args.carts * 5
+
+    print(f"{args.promotions} promotions, {args.lines} lines per cart, {args.carts} carts")
+    print(f"indexed: {indexed / evaluations * 1e6:9.1f} us/cart")
+    print(f"linear:  {linear / evaluations * 1e6:9.1f} us/cart")
+    print(f"speedup: {linear / indexed:9.1f}x")
+
+if __name__ == "__main__":
+    main()
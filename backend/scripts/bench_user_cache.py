@@ -0,0 +1,98 @@
+"""Benchmark get_current_user with the authenticated user cache against a lookup on every request.
+
+The users collection is replaced by an in-memory stand-in that sleeps for --db-latency-ms
+per find_one, so the numbers show the round trips the cache saves rather than Mongo itself.
+
+Run from backend/: python scripts/bench_user_cache.py [--users N] [--requests N] [--concurrency N] [--db-latency-ms MS]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.security import HTTPAuthorizationCredentials
+from database.mongodb import MongoDB
+from auth.security import create_access_token
+from auth.dependencies import get_current_user, user_cache
+
+class SlowUsersCollection:
+    """Users keyed by id, answering find_one after a fixed delay"""
+
+    def __init__(self, docs, latency_seconds: float):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.latency_seconds = latency_seconds
+        self.lookups = 0
+
+    async def find_one(self, query):
+        self.lookups += 1
+        await asyncio.sleep(self.latency_seconds)
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc else None
+
+def build_users(count: int):
+    now = datetime.utcnow()
+    return [
+        {"_id": f"user-{i}", "email": f"user{i}@example.com", "first_name": "Bench", "last_name": str(i),
+         "role": "customer", "status": "active", "hashed_password": "x", "created_at": now, "updated_at": now}
+        for i in range(count)
+    ]
+
+async def run(credentials, concurrency: int, use_cache: bool):
+    """Resolve every credential, at most `concurrency` at a time; returns (seconds, per-request latencies)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def resolve(credential):
+        async with semaphore:
+            if not use_cache:
+                user_cache.clear()
+            started = time.perf_counter()
+            user = await get_current_user(credential)
+            latencies.append(time.perf_counter() - started)
+            assert user is not None
+
+    started = time.perf_counter()
+    await asyncio.gather(*(resolve(credential) for credential in credentials))
+    return time.perf_counter() - started, sorted(latencies)
+
+def report(label: str, elapsed: float, latencies, lookups: int) -> None:
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{label:9} {len(latencies) / elapsed:9.0f} req/s   p50 {p50:6.2f} ms   p99 {p99:6.2f} ms   db lookups {lookups}")
+
+async def main_async(args) -> None:
+    users = build_users(args.users)
+    collection = SlowUsersCollection(users, args.db_latency_ms / 1000)
+    MongoDB.get_collection = staticmethod(lambda name: collection)
+
+    rng = random.Random(42)
+    tokens = [create_access_token({"sub": user["_id"]}) for user in users]
+    credentials = [HTTPAuthorizationCredentials(scheme="Bearer", credentials=rng.choice(tokens)) for _ in range(args.requests)]
+
+    user_cache.clear()
+    elapsed, latencies = await run(credentials, args.concurrency, use_cache=False)
+    report("uncached", elapsed, latencies, collection.lookups)
+
+    collection.lookups = 0
+    user_cache.clear()
+    elapsed, latencies = await run(credentials, args.concurrency, use_cache=True)
+    report("cached", elapsed, latencies, collection.lookups)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--db-latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    print(f"{args.users} users, {args.requests} requests, concurrency {args.concurrency}, {args.db_latency_ms} ms per lookup")
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
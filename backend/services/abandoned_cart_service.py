@@ -0,0 +1,119 @@
+from typing import List, Dict, Any
+from datetime import datetime, timedelta
+from pymongo import ASCENDING
+from database.mongodb import MongoDB, CARTS_COLLECTION, CARTS_ARCHIVE_COLLECTION
+from models.notification import NotificationCreate, NotificationType
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Reminder stages as (stage, hours idle); a cart gets at most one reminder per stage
+ABANDONED_CART_STAGES = [(1, 1), (2, 24), (3, 72)]
+ABANDONED_CART_MESSAGES = {
+    1: "You left some items in your cart.",
+    2: "Your cart is still waiting for you.",
+    3: "Last chance: items in your cart may sell out soon."
+}
+# Carts idle longer than this are moved to the archive collection
+CART_EXPIRY_DAYS = 30
+ABANDONED_CART_BATCH_SIZE = 500
+ABANDONED_CART_SCAN_INTERVAL_SECONDS = 15 * 60
+
+class AbandonedCartService:
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Create indexes used by the abandoned cart scan"""
+        await MongoDB.get_collection(CARTS_COLLECTION).create_index([("updated_at", ASCENDING)])
+        await MongoDB.get_collection(CARTS_ARCHIVE_COLLECTION).create_index("user_id")
+
+    @staticmethod
+    async def scan() -> Dict[str, Any]:
+        """Send due abandoned-cart reminders, then archive expired carts"""
+        reminders = {}
+        # Highest stage first so a long-idle cart only gets its latest reminder
+        for stage, hours in reversed(ABANDONED_CART_STAGES):
+            reminders[stage] = await AbandonedCartService._remind_stage(stage, hours)
+
+        return {
+            "reminders": reminders,
+            "archived": await AbandonedCartService.archive_expired_carts()
+        }
+
+    @staticmethod
+    async def _remind_stage(stage: int, hours: int) -> int:
+        """Emit reminders for carts idle past a stage threshold in bulk batches"""
+        from services.notification_service import NotificationService
+
+        carts = MongoDB.get_collection(CARTS_COLLECTION)
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        expiry_cutoff = datetime.utcnow() - timedelta(days=CART_EXPIRY_DAYS)
+        criteria = {
+            "updated_at": {"$lt": cutoff, "$gte": expiry_cutoff},
+            "items.0": {"$exists": True},
+            "abandoned_stage": {"$not": {"$gte": stage}}
+        }
+        notification_service = NotificationService()
+        notified = 0
+
+        while True:
+            batch = await carts.find(criteria, {"user_id": 1, "items.product_id": 1}).limit(ABANDONED_CART_BATCH_SIZE).to_list(ABANDONED_CART_BATCH_SIZE)
+            if not batch:
+                break
+
+            opted_out = await AbandonedCartService._opted_out_users(
+                notification_service, [cart["user_id"] for cart in batch]
+            )
+            notifications = [
+                NotificationCreate(
+                    user_id=cart["user_id"],
+                    type=NotificationType.ABANDONED_CART,
+                    title="Items in your cart",
+                    message=ABANDONED_CART_MESSAGES.get(stage, ABANDONED_CART_MESSAGES[1]),
+                    data={
+                        "stage": stage,
+                        "item_count": len(cart["items"]),
+                        "product_ids": [item["product_id"] for item in cart["items"]]
+                    }
+                )
+                for cart in batch
+                if cart["user_id"] not in opted_out
+            ]
+            if notifications:
+                notified += await notification_service.create_notifications_bulk(notifications)
+
+            # Carts edited since the read keep their stage reset
+            await carts.update_many(
+                {"_id": {"$in": [cart["_id"] for cart in batch]}, "updated_at": {"$lt": cutoff}},
+                {"$set": {"abandoned_stage": stage}}
+            )
+
+            if len(batch) < ABANDONED_CART_BATCH_SIZE:
+                break
+
+        return notified
+
+    @staticmethod
+    async def _opted_out_users(notification_service, user_ids: List[str]) -> set:
+        """Users who turned off promotional messages"""
+        cursor = notification_service.preferences_collection.find(
+            {"user_id": {"$in": user_ids}, "promotional_emails": False},
+            {"user_id": 1}
+        )
+        return {doc["user_id"] async for doc in cursor}
+
+    @staticmethod
+    async def archive_expired_carts(older_than_days: int = CART_EXPIRY_DAYS) -> int:
+        """Copy expired carts into the archive server-side, then drop them from the working set"""
+        carts = MongoDB.get_collection(CARTS_COLLECTION)
+        criteria = {"updated_at": {"$lt": datetime.utcnow() - timedelta(days=older_than_days)}}
+
+        await carts.aggregate([
+            {"$match": criteria},
+            {"$addFields": {"archived_at": "$$NOW"}},
+            {"$merge": {"into": CARTS_ARCHIVE_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]).to_list(None)
+
+        result = await carts.delete_many(criteria)
+        if result.deleted_count:
+            logger.info(f"Archived {result.deleted_count} carts idle for over {older_than_days} days")
+        return result.deleted_count
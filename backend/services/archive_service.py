@@ -0,0 +1,140 @@
+from typing import Optional, List, Dict, Any
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+from database.mongodb import MongoDB, ORDERS_COLLECTION, ORDERS_ARCHIVE_COLLECTION, ORDER_ROLLUPS_COLLECTION
+from models.order import OrderStatus
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Orders in a terminal status older than this move to the archive
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_INTERVAL_SECONDS = 24 * 60 * 60
+# The rollup is kept by increments after each archive batch; a nightly rebuild restores any
+# batch lost to a crash between the delete and the increment
+ARCHIVE_ROLLUP_RECONCILE_INTERVAL_SECONDS = 24 * 60 * 60
+ARCHIVE_STATUSES = [OrderStatus.DELIVERED, OrderStatus.CANCELLED, OrderStatus.REFUNDED]
+
+ARCHIVE_ROLLUP_ID = "orders_archive"
+
+class OrderArchiveService:
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Create indexes used by archive lookups"""
+        collection = MongoDB.get_collection(ORDERS_ARCHIVE_COLLECTION)
+        await collection.create_index("order_number")
+        await collection.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+        # Order history and admin lists read the archive alongside the hot collection
+        await collection.create_index([("created_at", DESCENDING)])
+        await collection.create_index([("status", ASCENDING), ("created_at", DESCENDING)])
+        await collection.create_index("customer_search_keys")
+
+    @staticmethod
+    async def archive_orders(
+        older_than_days: int = ARCHIVE_AFTER_DAYS,
+        batch_size: int = ARCHIVE_BATCH_SIZE
+    ) -> int:
+        """Move old terminal orders out of the hot collection, keeping rollups intact"""
+        orders = MongoDB.get_collection(ORDERS_COLLECTION)
+        archive = MongoDB.get_collection(ORDERS_ARCHIVE_COLLECTION)
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        criteria = {"status": {"$in": ARCHIVE_STATUSES}, "created_at": {"$lt": cutoff}}
+        archived = 0
+
+        while True:
+            batch = await orders.find(criteria).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+
+            now = datetime.utcnow()
+            # Upserts keep a rerun after a partial failure idempotent
+            await archive.bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, {**doc, "archived_at": now}, upsert=True) for doc in batch],
+                ordered=False
+            )
+
+            batch_ids = [doc["_id"] for doc in batch]
+            result = await orders.delete_many({"_id": {"$in": batch_ids}, **criteria})
+
+            # Only roll up orders that actually left the hot collection
+            moved = batch
+            if result.deleted_count < len(batch):
+                remaining = {
+                    doc["_id"] async for doc in orders.find({"_id": {"$in": batch_ids}}, {"_id": 1})
+                }
+                moved = [doc for doc in batch if doc["_id"] not in remaining]
+                await archive.delete_many({"_id": {"$in": list(remaining)}})
+
+            await OrderArchiveService._add_to_rollup(moved)
+            archived += len(moved)
+
+            if len(batch) < batch_size:
+                break
+
+        if archived:
+            logger.info(f"Archived {archived} orders older than {older_than_days} days")
+        return archived
+
+    @staticmethod
+    async def _add_to_rollup(docs: List[Dict[str, Any]]) -> None:
+        """Fold archived orders into the archive rollup counters"""
+        if not docs:
+            return
+
+        increments: Dict[str, Any] = {
+            "total_orders": len(docs),
+            "total_revenue": sum(doc.get("total_amount", 0.0) for doc in docs)
+        }
+        for doc in docs:
+            key = f"status_counts.{doc.get('status')}"
+            increments[key] = increments.get(key, 0) + 1
+
+        await MongoDB.get_collection(ORDER_ROLLUPS_COLLECTION).update_one(
+            {"_id": ARCHIVE_ROLLUP_ID},
+            {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    @staticmethod
+    async def rebuild_rollup() -> Dict[str, Any]:
+        """Recompute the archive rollup from the archive collection"""
+        pipeline = [
+            {"$group": {
+                "_id": "$status",
+                "count": {"$sum": 1},
+                "revenue": {"$sum": "$total_amount"}
+            }}
+        ]
+
+        status_counts = {}
+        total_orders = 0
+        total_revenue = 0.0
+        async for row in MongoDB.get_collection(ORDERS_ARCHIVE_COLLECTION).aggregate(pipeline):
+            status_counts[row["_id"]] = row["count"]
+            total_orders += row["count"]
+            total_revenue += row["revenue"]
+
+        rollup = {
+            "total_orders": total_orders,
+            "total_revenue": total_revenue,
+            "status_counts": status_counts,
+            "updated_at": datetime.utcnow()
+        }
+        await MongoDB.get_collection(ORDER_ROLLUPS_COLLECTION).replace_one(
+            {"_id": ARCHIVE_ROLLUP_ID},
+            rollup,
+            upsert=True
+        )
+        return rollup
+
+    @staticmethod
+    async def get_rollup() -> Dict[str, Any]:
+        """Get totals for all archived orders"""
+        rollup = await MongoDB.get_collection(ORDER_ROLLUPS_COLLECTION).find_one({"_id": ARCHIVE_ROLLUP_ID})
+        return rollup or {"total_orders": 0, "total_revenue": 0.0, "status_counts": {}}
+
+    @staticmethod
+    async def find_order(query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Look up a single order document in the archive"""
+        return await MongoDB.get_collection(ORDERS_ARCHIVE_COLLECTION).find_one(query, {"archived_at": 0})
@@ -0,0 +1,107 @@
+from typing import Optional, List, Dict, Any
+from database.ttl_store import get_ttl_store
+from models.order import CartResponse
+from services.order_service import OrderService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Each write slides the expiry; untouched guest carts are evicted after this
+GUEST_CART_TTL_SECONDS = 7 * 24 * 60 * 60
+
+class GuestCartService:
+    """Carts for anonymous sessions, held in the TTL store under a signed cart token
+
+    The store is only shared between workers when REDIS_URL is set; without it each
+    process keeps its own carts, so run a single worker or configure Redis.
+    """
+
+    @staticmethod
+    def _key(cart_id: str) -> str:
+        """TTL store key for a guest cart"""
+        return f"guest_cart:{cart_id}"
+
+    @staticmethod
+    async def _get_items(cart_id: str) -> List[Dict[str, Any]]:
+        """Read the stored guest cart lines"""
+        cart = await get_ttl_store().get(GuestCartService._key(cart_id))
+        return cart.get("items", []) if cart else []
+
+    @staticmethod
+    async def _save_items(cart_id: str, items: List[Dict[str, Any]]) -> CartResponse:
+        """Store guest cart lines and return the hydrated cart"""
+        await get_ttl_store().set(GuestCartService._key(cart_id), {"items": items}, GUEST_CART_TTL_SECONDS)
+        return await OrderService.hydrate_cart(f"guest:{cart_id}", items)
+
+    @staticmethod
+    def _matches(item: Dict[str, Any], product_id: str, size: Optional[str], color: Optional[str]) -> bool:
+        """Check whether a stored line is the given product, size and color"""
+        return item["product_id"] == product_id and item.get("size") == size and item.get("color") == color
+
+    @staticmethod
+    async def get_cart(cart_id: Optional[str]) -> CartResponse:
+        """Get a guest cart"""
+        if not cart_id:
+            return OrderService.empty_cart("guest")
+        return await OrderService.hydrate_cart(f"guest:{cart_id}", await GuestCartService._get_items(cart_id))
+
+    @staticmethod
+    async def add_to_cart(cart_id: str, product_id: str, quantity: int = 1, size: Optional[str] = None, color: Optional[str] = None) -> CartResponse:
+        """Add item to a guest cart with stock validation"""
+        available_stock = await OrderService.get_available_stock(product_id)
+        items = await GuestCartService._get_items(cart_id)
+
+        existing_item = next((item for item in items if GuestCartService._matches(item, product_id, size, color)), None)
+        new_quantity = quantity + (existing_item["quantity"] if existing_item else 0)
+        if available_stock < new_quantity:
+            raise ValueError(f"Insufficient stock. Available: {available_stock}, requested: {new_quantity}")
+
+        if existing_item:
+            existing_item["quantity"] = new_quantity
+        else:
+            items.append({**OrderService.cart_line_key(product_id, size, color), "quantity": quantity})
+
+        return await GuestCartService._save_items(cart_id, items)
+
+    @staticmethod
+    async def update_cart_quantity(cart_id: str, product_id: str, quantity: int, size: Optional[str] = None, color: Optional[str] = None) -> CartResponse:
+        """Update guest cart item quantity with stock validation"""
+        if quantity <= 0:
+            return await GuestCartService.remove_from_cart(cart_id, product_id, size, color)
+
+        available_stock = await OrderService.get_available_stock(product_id)
+        if available_stock < quantity:
+            raise ValueError(f"Insufficient stock. Available: {available_stock}, requested: {quantity}")
+
+        items = await GuestCartService._get_items(cart_id)
+        for item in items:
+            if GuestCartService._matches(item, product_id, size, color):
+                item["quantity"] = quantity
+                break
+
+        return await GuestCartService._save_items(cart_id, items)
+
+    @staticmethod
+    async def remove_from_cart(cart_id: str, product_id: str, size: Optional[str] = None, color: Optional[str] = None) -> CartResponse:
+        """Remove item from a guest cart"""
+        items = [
+            item for item in await GuestCartService._get_items(cart_id)
+            if not GuestCartService._matches(item, product_id, size, color)
+        ]
+        return await GuestCartService._save_items(cart_id, items)
+
+    @staticmethod
+    async def merge_into_user_cart(cart_id: str, user_id: str) -> CartResponse:
+        """Move a guest cart into the user's cart; the guest cart is taken so it can only merge once"""
+        store = get_ttl_store()
+        cart = await store.pop(GuestCartService._key(cart_id))
+        items = cart.get("items", []) if cart else []
+        if not items:
+            return await OrderService.get_user_cart(user_id)
+
+        try:
+            return await OrderService.merge_cart_items(user_id, items)
+        except Exception:
+            # Put the guest cart back so the client can retry the merge
+            await store.set(GuestCartService._key(cart_id), cart, GUEST_CART_TTL_SECONDS)
+            raise
@@ -0,0 +1,49 @@
+from typing import Dict, Callable, Awaitable, Any
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class JobScheduler:
+    """Runs periodic maintenance jobs as background tasks"""
+
+    _tasks: Dict[str, asyncio.Task] = {}
+
+    @classmethod
+    def schedule(
+        cls,
+        name: str,
+        interval_seconds: float,
+        job: Callable[[], Awaitable[Any]],
+        initial_delay: float = 60.0
+    ) -> None:
+        """Run a job every interval_seconds until the scheduler stops"""
+        if name in cls._tasks:
+            return
+
+        cls._tasks[name] = asyncio.create_task(
+            cls._run(name, interval_seconds, job, initial_delay)
+        )
+        logger.info(f"Scheduled job {name} every {interval_seconds}s")
+
+    @staticmethod
+    async def _run(name: str, interval_seconds: float, job: Callable[[], Awaitable[Any]], initial_delay: float) -> None:
+        """Job loop; a failing run is logged and retried on the next tick"""
+        await asyncio.sleep(initial_delay)
+        while True:
+            try:
+                result = await job()
+                logger.info(f"Job {name} completed: {result}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {name} failed: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    @classmethod
+    async def stop_all(cls) -> None:
+        """Cancel all scheduled jobs"""
+        for task in cls._tasks.values():
+            task.cancel()
+        await asyncio.gather(*cls._tasks.values(), return_exceptions=True)
+        cls._tasks = {}
@@ -6,16 +6,28 @@ from models.notification import (
     NotificationPreferencesUpdate, NotificationStats
 )
 from database.mongodb import MongoDB
+from pymongo import UpdateOne
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Notifications written per insert_many call in bulk fan-outs
+NOTIFICATION_BULK_CHUNK_SIZE = 1000
+
 class NotificationService:
     def __init__(self):
         self.db = MongoDB.get_database()
         self.collection = self.db.notifications
         self.preferences_collection = self.db.notification_preferences
 
+    async def ensure_indexes(self) -> None:
+        """Create the dedupe index that makes retried fan-outs idempotent"""
+        await self.collection.create_index(
+            "dedupe_key",
+            unique=True,
+            partialFilterExpression={"dedupe_key": {"$type": "string"}}
+        )
+
     async def create_notification(self, notification_data: NotificationCreate) -> NotificationResponse:
         """Create a new notification"""
         try:
@@ -34,6 +46,36 @@ class NotificationService:
             logger.error(f"Create notification error: {e}")
             raise
 
+    async def create_notifications_bulk(
+        self,
+        notifications: List[NotificationCreate],
+        dedupe_keys: Optional[List[str]] = None
+    ) -> int:
+        """Create many notifications in chunks; with dedupe_keys, ones already created are skipped"""
+        try:
+            now = datetime.utcnow()
+            created = 0
+            for start in range(0, len(notifications), NOTIFICATION_BULK_CHUNK_SIZE):
+                chunk = [
+                    {**notification.dict(), "status": "pending", "created_at": now, "updated_at": now}
+                    for notification in notifications[start:start + NOTIFICATION_BULK_CHUNK_SIZE]
+                ]
+                if dedupe_keys is None:
+                    result = await self.collection.insert_many(chunk, ordered=False)
+                    created += len(result.inserted_ids)
+                    continue
+
+                keys = dedupe_keys[start:start + NOTIFICATION_BULK_CHUNK_SIZE]
+                result = await self.collection.bulk_write([
+                    UpdateOne({"dedupe_key": key}, {"$setOnInsert": {**doc, "dedupe_key": key}}, upsert=True)
+                    for doc, key in zip(chunk, keys)
+                ], ordered=False)
+                created += result.upserted_count
+            return created
+        except Exception as e:
+            logger.error(f"Bulk create notifications error: {e}")
+            raise
+
     async def get_user_notifications(self, user_id: str, skip: int = 0, limit: int = 50) -> NotificationListResponse:
         """Get notifications for a user"""
         try:
@@ -1,22 +1,174 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 from bson import ObjectId
+import asyncio
+import re
 import string
 import random
-from database.mongodb import MongoDB, ORDERS_COLLECTION, PRODUCTS_COLLECTION, CARTS_COLLECTION
+from pymongo import ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from database.mongodb import MongoDB, ORDERS_COLLECTION, ORDERS_ARCHIVE_COLLECTION, PRODUCTS_COLLECTION, CARTS_COLLECTION, USERS_COLLECTION
 from models.order import (
     OrderCreate, OrderUpdate, OrderInDB, OrderResponse,
-    OrderListResponse, OrderStats, Cart, CartResponse, OrderStatus, PaymentStatus,
+    OrderListResponse, OrderSummary, OrderSummaryListResponse, OrderStats, Cart, CartResponse, OrderStatus, PaymentStatus,
     ReturnRequestCreate, ReturnRequestUpdate, ReturnRequestInDB, ReturnRequestResponse,
     ReturnRequestListResponse, ReturnStats, ReturnStatus, RefundMethod
 )
 from models.product import ProductInDB
-from routers.websocket import broadcast_cart_update
+from services.outbox_service import OutboxService
+from services.archive_service import OrderArchiveService
+from services.pricing_engine import PricingEngine
+from services.promotion_service import PromotionService
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Optimistic retries when a cart merge races another cart write
+CART_MERGE_ATTEMPTS = 3
+# Merge-then-build passes for the unique carts.user_id index before startup gives up
+CART_INDEX_BUILD_ATTEMPTS = 2
+
+# Product fields needed to price and display cart lines
+CART_PRODUCT_PROJECTION = {
+    "name": 1,
+    "price": 1,
+    "sale_price": 1,
+    "inventory_quantity": 1,
+    "images": {"$slice": 1},
+    "sku": 1,
+    "brand": 1,
+    "category": 1
+}
+
 class OrderService:
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Create indexes used by order lookups, admin listing and carts"""
+        collection = MongoDB.get_collection(ORDERS_COLLECTION)
+        await collection.create_index("order_number")
+        await collection.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+        await collection.create_index([("status", ASCENDING), ("created_at", DESCENDING)])
+        await collection.create_index([("payment_status", ASCENDING), ("created_at", DESCENDING)])
+        await collection.create_index([("created_at", DESCENDING)])
+        await collection.create_index("customer_search_keys")
+        # One cart per user. add_to_cart's upsert is only correct with this index in place, so
+        # startup fails without it; legacy duplicates are merged first, and merged again if a
+        # duplicate raced in before the build
+        for attempt in range(CART_INDEX_BUILD_ATTEMPTS):
+            await OrderService.merge_duplicate_carts()
+            try:
+                await MongoDB.get_collection(CARTS_COLLECTION).create_index("user_id", unique=True)
+                break
+            except (DuplicateKeyError, OperationFailure) as e:
+                logger.error(f"Could not create unique carts.user_id index: {e}")
+                if attempt == CART_INDEX_BUILD_ATTEMPTS - 1:
+                    raise RuntimeError("Unique carts.user_id index is required") from e
+
+    @staticmethod
+    async def merge_duplicate_carts() -> int:
+        """Fold each user's duplicate cart documents into their most recently updated one"""
+        carts = MongoDB.get_collection(CARTS_COLLECTION)
+        pipeline = [
+            {"$group": {"_id": "$user_id", "cart_ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+
+        merged_users = 0
+        async for group in carts.aggregate(pipeline, allowDiskUse=True):
+            cart_docs = await carts.find({"_id": {"$in": group["cart_ids"]}}).sort("updated_at", DESCENDING).to_list(None)
+            keeper = cart_docs[0]
+
+            lines: Dict[tuple, Dict[str, Any]] = {}
+            for cart_doc in cart_docs:
+                for line in cart_doc.get("items", []):
+                    key = (line["product_id"], line.get("size"), line.get("color"))
+                    if key in lines:
+                        lines[key]["quantity"] += line.get("quantity", 0)
+                    else:
+                        lines[key] = dict(line)
+
+            await carts.update_one({"_id": keeper["_id"]}, {"$set": {"items": list(lines.values())}})
+            await carts.delete_many({"_id": {"$in": [cart_doc["_id"] for cart_doc in cart_docs[1:]]}})
+            merged_users += 1
+
+        if merged_users:
+            logger.info(f"Merged duplicate carts for {merged_users} users")
+        return merged_users
+
+    @staticmethod
+    def build_customer_snapshot(user_doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the denormalized customer fields stored on each order"""
+        if not user_doc:
+            return {"customer": None, "customer_search_keys": []}
+
+        first_name = user_doc.get("first_name") or ""
+        last_name = user_doc.get("last_name") or ""
+        email = user_doc.get("email") or ""
+
+        # Lowercase prefixes searchable by name, surname, full name and email
+        search_keys = {
+            value.strip().lower()
+            for value in (first_name, last_name, f"{first_name} {last_name}", email)
+            if value and value.strip()
+        }
+
+        return {
+            "customer": {
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": email
+            },
+            "customer_search_keys": sorted(search_keys)
+        }
+
+    @staticmethod
+    async def refresh_customer_snapshot(user_id: str, user_doc: Dict[str, Any]) -> int:
+        """Propagate a user's name/email change to the snapshot on their orders"""
+        result = await MongoDB.get_collection(ORDERS_COLLECTION).update_many(
+            {"user_id": user_id},
+            {"$set": OrderService.build_customer_snapshot(user_doc)}
+        )
+        return result.modified_count
+
+    @staticmethod
+    async def backfill_customer_snapshots() -> None:
+        """Populate the customer snapshot on orders created before it existed"""
+        pipeline = [
+            {"$match": {"customer": {"$exists": False}}},
+            {
+                "$lookup": {
+                    "from": USERS_COLLECTION,
+                    "localField": "user_id",
+                    "foreignField": "_id",
+                    "as": "snapshot_user"
+                }
+            },
+            {"$unwind": "$snapshot_user"},
+            {
+                "$project": {
+                    "customer": {
+                        "first_name": {"$ifNull": ["$snapshot_user.first_name", ""]},
+                        "last_name": {"$ifNull": ["$snapshot_user.last_name", ""]},
+                        "email": {"$ifNull": ["$snapshot_user.email", ""]}
+                    }
+                }
+            }
+        ]
+
+        collection = MongoDB.get_collection(ORDERS_COLLECTION)
+        operations = []
+        async for doc in collection.aggregate(pipeline):
+            operations.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": OrderService.build_customer_snapshot(doc["customer"])}
+            ))
+            if len(operations) >= 500:
+                await collection.bulk_write(operations, ordered=False)
+                operations = []
+
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+
     @staticmethod
     def generate_order_number() -> str:
         """Generate unique order number"""
@@ -36,7 +188,7 @@ class OrderService:
         """Create a new order"""
         # Validate and calculate order totals
         items_with_details = []
-        subtotal = 0.0
+        promotion_lines = []
 
         for item in order_data.items:
             # Get product details
@@ -53,43 +205,54 @@ class OrderService:
             if product.inventory_quantity < item.quantity:
                 raise ValueError(f"Insufficient inventory for product {product.name}")
 
-            # Calculate item subtotal
             price = product.sale_price if product.sale_price else product.price
-            item_subtotal = price * item.quantity
-            subtotal += item_subtotal
+            promotion_lines.append((price, item.quantity, product_doc))
 
             items_with_details.append({
                 **item.dict(),
                 "product": product,
                 "price": price,
-                "subtotal": item_subtotal,
+                "subtotal": price * item.quantity,
                 "name": product.name,
                 "image": product.images[0] if product.images else None,
                 "sku": product.sku,
                 "brand": product.brand
             })
 
+        if order_data.coupon_code:
+            promotion_index = await PromotionService.get_index()
+            if not promotion_index.has_coupon(order_data.coupon_code):
+                raise ValueError("Invalid or expired coupon code")
+
         # Calculate totals
-        tax_rate = 0.08  # 8% tax
-        shipping_cost = 9.99 if subtotal < 100 else 0.0  # Free shipping over $100
-        tax_amount = subtotal * tax_rate
-        discount_amount = 0.0  # Could be calculated based on coupons
-        total_amount = subtotal + tax_amount + shipping_cost - discount_amount
+        quote = PricingEngine.quote(
+            [(item["price"], item["quantity"]) for item in items_with_details],
+            order_data.shipping_method,
+            await PromotionService.cart_discount(promotion_lines, order_data.coupon_code)
+        )
+
+        user_doc = await MongoDB.get_collection(USERS_COLLECTION).find_one(
+            {"_id": order_data.user_id},
+            {"first_name": 1, "last_name": 1, "email": 1}
+        )
 
         now = datetime.utcnow()
         order_doc = {
             "_id": str(ObjectId()),
             **order_data.dict(),
+            **OrderService.build_customer_snapshot(user_doc),
             "order_number": OrderService.generate_order_number(),
             "status": OrderStatus.PENDING,
             "payment_status": PaymentStatus.PENDING,
-            "subtotal": subtotal,
-            "tax_amount": tax_amount,
-            "shipping_cost": shipping_cost,
-            "discount_amount": discount_amount,
-            "total_amount": total_amount,
+            "subtotal": quote.subtotal,
+            "tax_amount": quote.tax_amount,
+            "shipping_cost": quote.shipping_cost,
+            "discount_amount": quote.discount_amount,
+            "total_amount": quote.total_amount,
             "tracking_number": None,
             "notes": None,
+            "item_count": len(order_data.items),
+            "thumbnail_ref": order_data.items[0].product_id if order_data.items else None,
             "created_at": now,
             "updated_at": now,
             "shipped_at": None,
@@ -106,8 +269,8 @@ class OrderService:
                 {"$inc": {"inventory_quantity": -item.quantity}}
             )
 
-        # Clear user's cart after successful order
-        await OrderService.clear_user_cart(order_data.user_id)
+        # Take the ordered lines out of the cart; anything added since checkout began stays
+        await OrderService.remove_ordered_items(order_data.user_id, order_data.items)
 
         order_doc["id"] = order_doc["_id"]
         return OrderInDB(**order_doc)
@@ -119,6 +282,10 @@ class OrderService:
             {"_id": order_id}
         )
 
+        if not order_doc:
+            # Fall back to the cold archive for historical orders
+            order_doc = await OrderArchiveService.find_order({"_id": order_id})
+
         if not order_doc:
             return None
 
@@ -132,6 +299,10 @@ class OrderService:
             {"order_number": order_number}
         )
 
+        if not order_doc:
+            # Fall back to the cold archive for historical orders
+            order_doc = await OrderArchiveService.find_order({"order_number": order_number})
+
         if not order_doc:
             return None
 
@@ -170,12 +341,71 @@ class OrderService:
 
         return await OrderService.get_order_by_id(order_id)
 
+    @staticmethod
+    async def bulk_update_order_status(order_ids: List[str], status: OrderStatus) -> Dict[str, Any]:
+        """Apply one status transition to many orders with set-based writes"""
+        collection = MongoDB.get_collection(ORDERS_COLLECTION)
+        order_ids = list(dict.fromkeys(order_ids))
+
+        # Resolve which orders exist and which already have the target status
+        current = {}
+        async for doc in collection.find({"_id": {"$in": order_ids}}, {"status": 1}):
+            current[doc["_id"]] = doc.get("status")
+
+        outcomes = {}
+        to_update = []
+        for order_id in order_ids:
+            if order_id not in current:
+                outcomes[order_id] = "not_found"
+            elif current[order_id] == status:
+                outcomes[order_id] = "unchanged"
+            else:
+                to_update.append(order_id)
+
+        updated_orders = []
+        if to_update:
+            # Pipeline update so timestamps are stamped by the server per transition
+            stage = {"status": status, "updated_at": "$$NOW"}
+            if status == OrderStatus.SHIPPED:
+                stage["shipped_at"] = {"$ifNull": ["$shipped_at", "$$NOW"]}
+            elif status == OrderStatus.DELIVERED:
+                stage["delivered_at"] = {"$ifNull": ["$delivered_at", "$$NOW"]}
+
+            await collection.update_many(
+                {"_id": {"$in": to_update}, "status": {"$ne": status}},
+                [{"$set": stage}]
+            )
+
+            async for order_doc in collection.find({"_id": {"$in": to_update}}):
+                order_doc["id"] = order_doc["_id"]
+                order = OrderInDB(**order_doc)
+                outcomes[order.id] = "updated" if order.status == status else "failed"
+                if order.status == status:
+                    updated_orders.append(order)
+
+            for order_id in to_update:
+                outcomes.setdefault(order_id, "not_found")
+
+        if updated_orders:
+            bulk_update = {
+                "status": status,
+                "order_ids": [order.id for order in updated_orders]
+            }
+            await OutboxService.enqueue_broadcast("orders", "orders_bulk_updated", bulk_update)
+            await OutboxService.enqueue_broadcast("admin-dashboard", "orders_bulk_updated", bulk_update)
+
+        return {
+            "updated_orders": updated_orders,
+            "outcomes": outcomes
+        }
+
     @staticmethod
     async def list_orders(
         user_id: Optional[str] = None,
         status: Optional[OrderStatus] = None,
         skip: int = 0,
-        limit: int = 50
+        limit: int = 50,
+        include_archive: bool = False
     ) -> OrderListResponse:
         """List orders with filters"""
         query = {}
@@ -185,17 +415,12 @@ class OrderService:
         if status:
             query["status"] = status
 
-        # Get total count
-        total = await MongoDB.get_collection(ORDERS_COLLECTION).count_documents(query)
-
-        # Get orders
-        cursor = MongoDB.get_collection(ORDERS_COLLECTION).find(query)\
-            .sort("created_at", -1)\
-            .skip(skip)\
-            .limit(limit)
+        order_docs, total = await OrderService._list_with_archive(
+            query, {"customer_search_keys": 0, "archived_at": 0}, "created_at", -1, skip, limit, include_archive
+        )
 
         orders = []
-        async for order_doc in cursor:
+        for order_doc in order_docs:
             order_doc["id"] = order_doc["_id"]
             order = OrderInDB(**order_doc)
             orders.append(OrderResponse(**order.dict()))
@@ -209,6 +434,51 @@ class OrderService:
             has_prev=skip > 0
         )
 
+    @staticmethod
+    async def list_order_summaries(
+        user_id: Optional[str] = None,
+        status: Optional[OrderStatus] = None,
+        skip: int = 0,
+        limit: int = 50,
+        include_archive: bool = False
+    ) -> OrderSummaryListResponse:
+        """List lightweight order summaries for order history pages"""
+        query = {}
+
+        if user_id:
+            query["user_id"] = user_id
+        if status:
+            query["status"] = status
+
+        # Orders created before item_count/thumbnail_ref existed derive them server-side
+        projection = {
+            "order_number": 1,
+            "status": 1,
+            "payment_status": 1,
+            "total_amount": 1,
+            "created_at": 1,
+            "item_count": {"$ifNull": ["$item_count", {"$size": "$items"}]},
+            "thumbnail_ref": {"$ifNull": ["$thumbnail_ref", {"$arrayElemAt": ["$items.product_id", 0]}]}
+        }
+
+        order_docs, total = await OrderService._list_with_archive(
+            query, projection, "created_at", -1, skip, limit, include_archive
+        )
+
+        orders = []
+        for order_doc in order_docs:
+            order_doc["id"] = order_doc["_id"]
+            orders.append(OrderSummary(**order_doc))
+
+        return OrderSummaryListResponse(
+            orders=orders,
+            total=total,
+            page=(skip // limit) + 1,
+            limit=limit,
+            has_next=(skip + limit) < total,
+            has_prev=skip > 0
+        )
+
     @staticmethod
     async def list_orders_admin(
         user_id: Optional[str] = None,
@@ -220,7 +490,8 @@ class OrderService:
         skip: int = 0,
         limit: int = 50,
         sort_by: str = "created_at",
-        sort_order: str = "-1"
+        sort_order: str = "-1",
+        include_archive: bool = False
     ) -> OrderListResponse:
         """List orders for admin with advanced filters"""
         query = {}
@@ -243,19 +514,14 @@ class OrderService:
                 date_query["$lte"] = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
             query["created_at"] = date_query
 
-        # Search filter (order number, customer name, email)
-        if search:
-            search_regex = {"$regex": search, "$options": "i"}
+        # Search filter (order number, customer name, email) as indexed prefix matches
+        if search and search.strip():
+            term = re.escape(search.strip())
             query["$or"] = [
-                {"order_number": search_regex},
-                {"user.first_name": search_regex},
-                {"user.last_name": search_regex},
-                {"user.email": search_regex}
+                {"order_number": {"$regex": f"^{term.upper()}"}},
+                {"customer_search_keys": {"$regex": f"^{term.lower()}"}}
             ]
 
-        # Get total count
-        total = await MongoDB.get_collection(ORDERS_COLLECTION).count_documents(query)
-
         # Build sort
         sort_direction = -1 if sort_order == "-1" else 1
         sort_field = sort_by
@@ -270,32 +536,14 @@ class OrderService:
         elif sort_by == "status":
             sort_field = "status"
 
-        # Get orders with user information
-        pipeline = [
-            {"$match": query},
-            {
-                "$lookup": {
-                    "from": "users",
-                    "localField": "user_id",
-                    "foreignField": "_id",
-                    "as": "user"
-                }
-            },
-            {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
-            {"$sort": {sort_field: sort_direction}},
-            {"$skip": skip},
-            {"$limit": limit}
-        ]
-
-        cursor = MongoDB.get_collection(ORDERS_COLLECTION).aggregate(pipeline)
+        # Customer details come from the snapshot stored on each order
+        order_docs, total = await OrderService._list_with_archive(
+            query, {"customer_search_keys": 0, "archived_at": 0}, sort_field, sort_direction, skip, limit, include_archive
+        )
 
         orders = []
-        async for order_doc in cursor:
+        for order_doc in order_docs:
             order_doc["id"] = order_doc["_id"]
-            # Convert ObjectId to string for user
-            if order_doc.get("user"):
-                order_doc["user"]["id"] = str(order_doc["user"]["_id"])
-                del order_doc["user"]["_id"]
             order = OrderInDB(**order_doc)
             orders.append(OrderResponse(**order.dict()))
 
@@ -308,10 +556,43 @@ class OrderService:
             has_prev=skip > 0
         )
 
+    @staticmethod
+    async def _list_with_archive(
+        query: Dict[str, Any],
+        projection: Dict[str, Any],
+        sort_field: str,
+        sort_direction: int,
+        skip: int,
+        limit: int,
+        include_archive: bool = False
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """One page of orders from the hot collection, continuing into the archive only when asked to"""
+        # Archived orders are listed after every hot order, so the archive is only read once a page
+        # runs past the end of the hot set; each read is an indexed sort and limit on one collection
+        sort = [(sort_field, sort_direction), ("_id", sort_direction)]
+        orders = MongoDB.get_collection(ORDERS_COLLECTION)
+        archive = MongoDB.get_collection(ORDERS_ARCHIVE_COLLECTION)
+
+        hot_docs, hot_total = await asyncio.gather(
+            orders.find(query, projection).sort(sort).skip(skip).limit(limit).to_list(limit),
+            orders.count_documents(query)
+        )
+        if not include_archive:
+            return hot_docs, hot_total
+
+        archived_total = await (
+            archive.count_documents(query) if query else archive.estimated_document_count()
+        )
+        remaining = limit - len(hot_docs)
+        if remaining > 0 and archived_total:
+            archive_skip = max(0, skip - hot_total)
+            hot_docs += await archive.find(query, projection).sort(sort).skip(archive_skip).limit(remaining).to_list(remaining)
+        return hot_docs, hot_total + archived_total
 
     @staticmethod
     async def get_order_stats() -> OrderStats:
         """Get order statistics"""
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
         pipeline = [
             {
                 "$group": {
@@ -333,28 +614,12 @@ class OrderService:
                         "$sum": {"$cond": [{"$eq": ["$status", OrderStatus.CANCELLED]}, 1, 0]}
                     },
                     "total_revenue": {"$sum": "$total_amount"},
-                    "order_values": {"$push": "$total_amount"}
-                }
-            },
-            {
-                "$addFields": {
+                    # Today's figures are summed in the same pass instead of collecting every order value
                     "orders_today": {
-                        "$size": {
-                            "$filter": {
-                                "input": "$order_values",
-                                "cond": {
-                                    "$gte": ["$$this", datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)]
-                                }
-                            }
-                        }
+                        "$sum": {"$cond": [{"$gte": ["$created_at", today]}, 1, 0]}
                     },
                     "revenue_today": {
-                        "$sum": {
-                            "$cond": [
-                                {"$gte": ["$created_at", datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)]},
-                                "$total_amount", 0
-                            ]
-                        }
+                        "$sum": {"$cond": [{"$gte": ["$created_at", today]}, "$total_amount", 0]}
                     }
                 }
             }
@@ -362,90 +627,126 @@ class OrderService:
 
         result = await MongoDB.get_collection(ORDERS_COLLECTION).aggregate(pipeline).to_list(1)
 
-        if not result:
-            return OrderStats(
-                total_orders=0,
-                pending_orders=0,
-                processing_orders=0,
-                shipped_orders=0,
-                delivered_orders=0,
-                cancelled_orders=0,
-                total_revenue=0.0,
-                average_order_value=0.0,
-                orders_today=0,
-                revenue_today=0.0
-            )
+        stats = result[0] if result else {}
 
-        stats = result[0]
-        order_values = stats.get("order_values", [])
-        average_order_value = sum(order_values) / len(order_values) if order_values else 0.0
+        # Archived orders only contribute through their rollup
+        archived = await OrderArchiveService.get_rollup()
+        archived_statuses = archived.get("status_counts", {})
+
+        total_orders = stats.get("total_orders", 0) + archived.get("total_orders", 0)
+        total_revenue = stats.get("total_revenue", 0.0) + archived.get("total_revenue", 0.0)
+        average_order_value = total_revenue / total_orders if total_orders else 0.0
 
         return OrderStats(
-            total_orders=stats["total_orders"],
-            pending_orders=stats["pending_orders"],
-            processing_orders=stats["processing_orders"],
-            shipped_orders=stats["shipped_orders"],
-            delivered_orders=stats["delivered_orders"],
-            cancelled_orders=stats["cancelled_orders"],
-            total_revenue=stats["total_revenue"],
+            total_orders=total_orders,
+            pending_orders=stats.get("pending_orders", 0),
+            processing_orders=stats.get("processing_orders", 0),
+            shipped_orders=stats.get("shipped_orders", 0),
+            delivered_orders=stats.get("delivered_orders", 0) + archived_statuses.get(OrderStatus.DELIVERED.value, 0),
+            cancelled_orders=stats.get("cancelled_orders", 0) + archived_statuses.get(OrderStatus.CANCELLED.value, 0),
+            total_revenue=total_revenue,
             average_order_value=round(average_order_value, 2),
             orders_today=stats.get("orders_today", 0),
             revenue_today=stats.get("revenue_today", 0.0)
         )
 
     @staticmethod
-    async def get_user_cart(user_id: str) -> CartResponse:
+    async def get_user_cart(user_id: str, coupon_code: Optional[str] = None) -> CartResponse:
         """Get user's cart"""
-        cart_doc = await MongoDB.get_collection(CARTS_COLLECTION).find_one({"user_id": user_id})
+        cart_doc = await MongoDB.get_collection(CARTS_COLLECTION).find_one(
+            {"user_id": user_id},
+            {"items": 1}
+        )
 
         if not cart_doc:
-            return CartResponse(
-                user_id=user_id,
-                items=[],
-                subtotal=0.0,
-                tax_amount=0.0,
-                shipping_cost=0.0,
-                total_amount=0.0,
-                item_count=0
-            )
-
-        # Get product details for cart items
-        items_with_details = []
-        subtotal = 0.0
+            return OrderService.empty_cart(user_id)
 
-        for item in cart_doc.get("items", []):
-            product_doc = await MongoDB.get_collection(PRODUCTS_COLLECTION).find_one(
-                {"_id": item["product_id"]}
-            )
-            if product_doc:
-                product_doc["id"] = product_doc["_id"]
-                product = ProductInDB(**product_doc)
+        return await OrderService.hydrate_cart(user_id, cart_doc.get("items", []), coupon_code)
 
-                price = product.sale_price if product.sale_price else product.price
-                item_subtotal = price * item["quantity"]
-                subtotal += item_subtotal
+    @staticmethod
+    def empty_cart(user_id: str) -> CartResponse:
+        """Build an empty cart response"""
+        return CartResponse(
+            user_id=user_id,
+            items=[],
+            subtotal=0.0,
+            tax_amount=0.0,
+            shipping_cost=0.0,
+            total_amount=0.0,
+            item_count=0
+        )
 
-                items_with_details.append({
-                    **item,
-                    "product": product,
-                    "price": price,
-                    "subtotal": item_subtotal
-                })
+    @staticmethod
+    async def hydrate_cart(user_id: str, items: List[Dict[str, Any]], coupon_code: Optional[str] = None) -> CartResponse:
+        """Attach product details and totals to cart lines with one batched product query"""
+        if not items:
+            return OrderService.empty_cart(user_id)
+
+        product_ids = list({item["product_id"] for item in items})
+        products = {}
+        cursor = MongoDB.get_collection(PRODUCTS_COLLECTION).find(
+            {"_id": {"$in": product_ids}},
+            CART_PRODUCT_PROJECTION
+        )
+        async for product_doc in cursor:
+            product_doc["id"] = product_doc.pop("_id")
+            products[product_doc["id"]] = product_doc
+
+        lines = [
+            (item, products[item["product_id"]])
+            for item in items
+            if item["product_id"] in products
+        ]
+        price_lines = [(PricingEngine.unit_price(product), item["quantity"]) for item, product in lines]
+        discount_cents = await PromotionService.cart_discount(
+            [(price, quantity, product) for (price, quantity), (_, product) in zip(price_lines, lines)],
+            coupon_code
+        )
+        quote = PricingEngine.quote(price_lines, discount_cents=discount_cents)
 
-        tax_amount = subtotal * 0.08
-        shipping_cost = 9.99 if subtotal < 100 else 0.0
-        total_amount = subtotal + tax_amount + shipping_cost
+        items_with_details = [
+            {
+                **item,
+                "product": product,
+                "price": PricingEngine.unit_price(product),
+                "subtotal": line_subtotal
+            }
+            for (item, product), line_subtotal in zip(lines, quote.line_subtotals)
+        ]
 
         return CartResponse(
             user_id=user_id,
             items=items_with_details,
-            subtotal=subtotal,
-            tax_amount=tax_amount,
-            shipping_cost=shipping_cost,
-            total_amount=total_amount,
+            subtotal=quote.subtotal,
+            discount_amount=quote.discount_amount,
+            coupon_code=coupon_code if discount_cents else None,
+            tax_amount=quote.tax_amount,
+            shipping_cost=quote.shipping_cost,
+            total_amount=quote.total_amount,
             item_count=len(items_with_details)
         )
 
+    @staticmethod
+    def cart_line_key(product_id: str, size: Optional[str], color: Optional[str]) -> Dict[str, Any]:
+        """Fields identifying a cart line"""
+        return {"product_id": product_id, "size": size, "color": color}
+
+    @staticmethod
+    async def get_available_stock(product_id: str) -> int:
+        """Get a product's inventory, raising if the product does not exist"""
+        product_doc = await MongoDB.get_collection(PRODUCTS_COLLECTION).find_one(
+            {"_id": product_id},
+            {"inventory_quantity": 1}
+        )
+        if not product_doc:
+            raise ValueError(f"Product {product_id} not found")
+
+        # Ensure inventory_quantity is a number
+        try:
+            return int(product_doc.get("inventory_quantity", 0))
+        except (ValueError, TypeError):
+            return 0
+
     @staticmethod
     async def update_cart(user_id: str, items: List[Dict[str, Any]]) -> CartResponse:
         """Update user's cart"""
@@ -471,59 +772,58 @@ class OrderService:
             upsert=True
         )
 
-        return await OrderService.get_user_cart(user_id)
+        # Hydrate from the lines just written instead of re-reading the cart
+        return await OrderService.hydrate_cart(user_id, basic_items)
 
     @staticmethod
     async def add_to_cart(user_id: str, product_id: str, quantity: int = 1, size: Optional[str] = None, color: Optional[str] = None) -> CartResponse:
         """Add item to cart with stock validation"""
         # Check product exists and has sufficient stock
-        product_doc = await MongoDB.get_collection(PRODUCTS_COLLECTION).find_one(
-            {"_id": product_id}
-        )
-        if not product_doc:
-            raise ValueError(f"Product {product_id} not found")
-
-        product_doc["id"] = product_doc["_id"]
-        product = ProductInDB(**product_doc)
-
-        # Get current cart
-        cart = await OrderService.get_user_cart(user_id)
+        available_stock = await OrderService.get_available_stock(product_id)
+        if available_stock < quantity:
+            raise ValueError(f"Insufficient stock. Available: {available_stock}, requested: {quantity}")
 
-        # Check if item already exists
-        existing_item = None
-        for item in cart.items:
-            if (item["product_id"] == product_id and
-                item.get("size") == size and
-                item.get("color") == color):
-                existing_item = item
-                break
+        carts = MongoDB.get_collection(CARTS_COLLECTION)
+        line_key = OrderService.cart_line_key(product_id, size, color)
+        now = datetime.utcnow()
 
-        new_quantity = quantity
-        if existing_item:
-            new_quantity = existing_item["quantity"] + quantity
+        # Bump an existing line only while the new quantity still fits in stock
+        cart_doc = await carts.find_one_and_update(
+            {
+                "user_id": user_id,
+                "items": {"$elemMatch": {**line_key, "quantity": {"$lte": available_stock - quantity}}}
+            },
+            {"$inc": {"items.$.quantity": quantity}, "$set": {"updated_at": now}, "$unset": {"abandoned_stage": ""}},
+            projection={"items": 1},
+            return_document=ReturnDocument.AFTER
+        )
 
-        # Validate stock - ensure inventory_quantity is a number
-        try:
-            available_stock = int(product.inventory_quantity)
-        except (ValueError, TypeError):
-            available_stock = 0
-
-        if available_stock < new_quantity:
-            raise ValueError(f"Insufficient stock. Available: {available_stock}, requested: {new_quantity}")
-
-        if existing_item:
-            existing_item["quantity"] = new_quantity
-        else:
-            cart.items.append({
-                "product_id": product_id,
-                "quantity": quantity,
-                "size": size,
-                "color": color
-            })
+        if not cart_doc:
+            # Otherwise append the line; upserting on a cart that already holds the line collides
+            # with the unique user_id index (required at startup), meaning stock ran out
+            try:
+                cart_doc = await carts.find_one_and_update(
+                    {"user_id": user_id, "items": {"$not": {"$elemMatch": line_key}}},
+                    {
+                        "$push": {"items": {**line_key, "quantity": quantity}},
+                        "$set": {"updated_at": now},
+                        "$unset": {"abandoned_stage": ""}
+                    },
+                    projection={"items": 1},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                existing = await carts.find_one(
+                    {"user_id": user_id, "items": {"$elemMatch": line_key}},
+                    {"items.$": 1}
+                )
+                in_cart = existing["items"][0]["quantity"] if existing else 0
+                raise ValueError(f"Insufficient stock. Available: {available_stock}, requested: {in_cart + quantity}")
 
         # Broadcast cart update
-        updated_cart = await OrderService.update_cart(user_id, cart.items)
-        await broadcast_cart_update(user_id, updated_cart.dict())
+        updated_cart = await OrderService.hydrate_cart(user_id, cart_doc.get("items", []))
+        await OutboxService.enqueue_cart_broadcast(user_id, updated_cart.dict())
         return updated_cart
 
     @staticmethod
@@ -533,61 +833,131 @@ class OrderService:
             return await OrderService.remove_from_cart(user_id, product_id, size, color)
 
         # Check product stock
-        product_doc = await MongoDB.get_collection(PRODUCTS_COLLECTION).find_one(
-            {"_id": product_id}
-        )
-        if not product_doc:
-            raise ValueError(f"Product {product_id} not found")
-
-        product_doc["id"] = product_doc["_id"]
-        product = ProductInDB(**product_doc)
-
-        # Validate stock - ensure inventory_quantity is a number
-        try:
-            available_stock = int(product.inventory_quantity)
-        except (ValueError, TypeError):
-            available_stock = 0
+        available_stock = await OrderService.get_available_stock(product_id)
 
         if available_stock < quantity:
             raise ValueError(f"Insufficient stock. Available: {available_stock}, requested: {quantity}")
 
-        # Get current cart
-        cart = await OrderService.get_user_cart(user_id)
+        cart_doc = await MongoDB.get_collection(CARTS_COLLECTION).find_one_and_update(
+            {
+                "user_id": user_id,
+                "items": {"$elemMatch": OrderService.cart_line_key(product_id, size, color)}
+            },
+            {"$set": {"items.$.quantity": quantity, "updated_at": datetime.utcnow()}, "$unset": {"abandoned_stage": ""}},
+            projection={"items": 1},
+            return_document=ReturnDocument.AFTER
+        )
 
-        # Find and update item
-        for item in cart.items:
-            if (item["product_id"] == product_id and
-                item.get("size") == size and
-                item.get("color") == color):
-                item["quantity"] = quantity
-                break
+        if not cart_doc:
+            # Line is not in the cart; nothing to change
+            return await OrderService.get_user_cart(user_id)
 
         # Broadcast cart update
-        updated_cart = await OrderService.update_cart(user_id, cart.items)
-        await broadcast_cart_update(user_id, updated_cart.dict())
+        updated_cart = await OrderService.hydrate_cart(user_id, cart_doc.get("items", []))
+        await OutboxService.enqueue_cart_broadcast(user_id, updated_cart.dict())
         return updated_cart
 
     @staticmethod
     async def remove_from_cart(user_id: str, product_id: str, size: Optional[str] = None, color: Optional[str] = None) -> CartResponse:
         """Remove item from cart"""
-        cart = await OrderService.get_user_cart(user_id)
-
-        cart.items = [
-            item for item in cart.items
-            if not (item["product_id"] == product_id and
-                    item.get("size") == size and
-                    item.get("color") == color)
-        ]
+        cart_doc = await MongoDB.get_collection(CARTS_COLLECTION).find_one_and_update(
+            {"user_id": user_id},
+            {
+                "$pull": {"items": OrderService.cart_line_key(product_id, size, color)},
+                "$set": {"updated_at": datetime.utcnow()},
+                "$unset": {"abandoned_stage": ""}
+            },
+            projection={"items": 1},
+            return_document=ReturnDocument.AFTER
+        )
 
         # Broadcast cart update
-        updated_cart = await OrderService.update_cart(user_id, cart.items)
-        await broadcast_cart_update(user_id, updated_cart.dict())
+        updated_cart = await OrderService.hydrate_cart(user_id, cart_doc.get("items", []) if cart_doc else [])
+        await OutboxService.enqueue_cart_broadcast(user_id, updated_cart.dict())
         return updated_cart
 
     @staticmethod
-    async def clear_user_cart(user_id: str) -> None:
-        """Clear user's cart after successful order"""
-        await MongoDB.get_collection(CARTS_COLLECTION).delete_one({"user_id": user_id})
+    async def merge_cart_items(user_id: str, items: List[Dict[str, Any]]) -> CartResponse:
+        """Merge cart lines (e.g. a guest cart) into the user's cart, capping merged quantities at stock"""
+        carts = MongoDB.get_collection(CARTS_COLLECTION)
+        product_ids = list({item["product_id"] for item in items})
+        stock = {}
+        async for product_doc in MongoDB.get_collection(PRODUCTS_COLLECTION).find(
+            {"_id": {"$in": product_ids}},
+            {"inventory_quantity": 1}
+        ):
+            try:
+                stock[product_doc["_id"]] = int(product_doc.get("inventory_quantity", 0))
+            except (ValueError, TypeError):
+                stock[product_doc["_id"]] = 0
+
+        for _ in range(CART_MERGE_ATTEMPTS):
+            cart_doc = await carts.find_one({"user_id": user_id}, {"items": 1, "updated_at": 1})
+
+            merged = {}
+            for line in (cart_doc or {}).get("items", []):
+                merged[(line["product_id"], line.get("size"), line.get("color"))] = line
+            for item in items:
+                if item["product_id"] not in stock:
+                    continue
+                key = (item["product_id"], item.get("size"), item.get("color"))
+                in_cart = merged[key]["quantity"] if key in merged else 0
+                quantity = max(in_cart, min(in_cart + item["quantity"], stock[item["product_id"]]))
+                if quantity > 0:
+                    merged[key] = {**OrderService.cart_line_key(*key), "quantity": quantity}
+
+            now = datetime.utcnow()
+            if cart_doc:
+                # Only write if nobody touched the cart since it was read
+                cart_doc = await carts.find_one_and_update(
+                    {"_id": cart_doc["_id"], "updated_at": cart_doc.get("updated_at")},
+                    {"$set": {"items": list(merged.values()), "updated_at": now}, "$unset": {"abandoned_stage": ""}},
+                    projection={"items": 1},
+                    return_document=ReturnDocument.AFTER
+                )
+            else:
+                cart_doc = {"user_id": user_id, "items": list(merged.values()), "updated_at": now}
+                try:
+                    await carts.insert_one(cart_doc)
+                except DuplicateKeyError:
+                    cart_doc = None
+
+            if cart_doc:
+                updated_cart = await OrderService.hydrate_cart(user_id, cart_doc.get("items", []))
+                await OutboxService.enqueue_cart_broadcast(user_id, updated_cart.dict())
+                return updated_cart
+
+        raise RuntimeError(f"Cart for user {user_id} kept changing during merge")
+
+    @staticmethod
+    async def remove_ordered_items(user_id: str, items: List[Any]) -> None:
+        """Subtract ordered quantities from the user's cart in one round trip, dropping emptied lines"""
+        if not items:
+            return
+
+        operations = [
+            UpdateOne(
+                {"user_id": user_id},
+                {"$inc": {"items.$[line].quantity": -item.quantity}},
+                array_filters=[{
+                    f"line.{field}": value
+                    for field, value in OrderService.cart_line_key(item.product_id, item.size, item.color).items()
+                }]
+            )
+            for item in items
+        ]
+        operations.append(UpdateOne(
+            {"user_id": user_id},
+            {
+                "$pull": {"items": {"quantity": {"$lte": 0}}},
+                "$set": {"updated_at": datetime.utcnow()},
+                "$unset": {"abandoned_stage": ""}
+            }
+        ))
+        await MongoDB.get_collection(CARTS_COLLECTION).bulk_write(operations, ordered=True)
+
+        cart = await OrderService.get_user_cart(user_id)
+        await OutboxService.enqueue_cart_broadcast(user_id, cart.dict())
 
     # Return/Refund methods
     @staticmethod
@@ -0,0 +1,247 @@
+from typing import Optional, List, Dict, Any, Callable, Awaitable
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from fastapi.encoders import jsonable_encoder
+from database.mongodb import MongoDB, OUTBOX_COLLECTION, OUTBOX_DEAD_LETTER_COLLECTION
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Worker pool tuning
+OUTBOX_WORKERS = 4
+OUTBOX_POLL_INTERVAL = 1.0  # seconds between polls when the queue is idle
+OUTBOX_LOCK_SECONDS = 60  # a claimed task is retried if its worker dies
+OUTBOX_HEARTBEAT_SECONDS = 20  # running handlers renew their lock this often
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE_SECONDS = 2
+
+TaskHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+class OutboxService:
+    """Durable in-process queue for post-commit side effects"""
+
+    handlers: Dict[str, TaskHandler] = {}
+    _workers: List[asyncio.Task] = []
+    _wakeup: Optional[asyncio.Event] = None
+
+    @classmethod
+    def register(cls, task_type: str):
+        """Register a coroutine as the handler for a task type"""
+        def decorator(handler: TaskHandler) -> TaskHandler:
+            cls.handlers[task_type] = handler
+            return handler
+        return decorator
+
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Create indexes used to claim tasks"""
+        collection = MongoDB.get_collection(OUTBOX_COLLECTION)
+        await collection.create_index([("status", ASCENDING), ("run_after", ASCENDING)])
+        await collection.create_index([("status", ASCENDING), ("locked_until", ASCENDING)])
+        await MongoDB.get_collection(OUTBOX_DEAD_LETTER_COLLECTION).create_index("failed_at")
+
+    @classmethod
+    async def enqueue(cls, task_type: str, payload: Dict[str, Any], delay_seconds: float = 0) -> str:
+        """Persist a side-effect task for the worker pool"""
+        now = datetime.utcnow()
+        task_doc = {
+            "_id": str(ObjectId()),
+            "type": task_type,
+            "payload": jsonable_encoder(payload),
+            "status": "pending",
+            "attempts": 0,
+            "last_error": None,
+            "run_after": now + timedelta(seconds=delay_seconds),
+            "locked_until": None,
+            "created_at": now,
+            "updated_at": now
+        }
+
+        await MongoDB.get_collection(OUTBOX_COLLECTION).insert_one(task_doc)
+
+        if cls._wakeup is not None:
+            cls._wakeup.set()
+
+        return task_doc["_id"]
+
+    @classmethod
+    async def enqueue_broadcast(cls, channel: str, message_type: str, data: Dict[str, Any]) -> str:
+        """Queue a WebSocket fan-out to a channel"""
+        return await cls.enqueue("ws.broadcast", {
+            "channel": channel,
+            "message_type": message_type,
+            "data": data
+        })
+
+    @classmethod
+    async def enqueue_cart_broadcast(cls, user_id: str, cart: Dict[str, Any]) -> str:
+        """Queue a cart update for the user's cart channel"""
+        return await cls.enqueue("cart.broadcast", {"user_id": user_id, "cart": cart})
+
+    @staticmethod
+    async def _claim() -> Optional[Dict[str, Any]]:
+        """Atomically claim the next due task, including ones abandoned by dead workers"""
+        now = datetime.utcnow()
+        return await MongoDB.get_collection(OUTBOX_COLLECTION).find_one_and_update(
+            {
+                "$or": [
+                    {"status": "pending", "run_after": {"$lte": now}},
+                    {"status": "processing", "locked_until": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": "processing",
+                    "locked_until": now + timedelta(seconds=OUTBOX_LOCK_SECONDS),
+                    # Identifies this claim, so a worker whose lock lapsed cannot touch a newer claim
+                    "lock_token": str(ObjectId()),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("run_after", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    async def _heartbeat(task: Dict[str, Any]) -> None:
+        """Keep extending a claimed task's lock while its handler runs"""
+        collection = MongoDB.get_collection(OUTBOX_COLLECTION)
+        while True:
+            await asyncio.sleep(OUTBOX_HEARTBEAT_SECONDS)
+            try:
+                await collection.update_one(
+                    {"_id": task["_id"], "lock_token": task["lock_token"]},
+                    {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=OUTBOX_LOCK_SECONDS)}}
+                )
+            except Exception as e:
+                logger.error(f"Outbox heartbeat for task {task['_id']} failed: {e}")
+
+    @classmethod
+    async def _process(cls, task: Dict[str, Any]) -> None:
+        """Run one claimed task and record its outcome"""
+        collection = MongoDB.get_collection(OUTBOX_COLLECTION)
+        handler = cls.handlers.get(task["type"])
+        claim = {"_id": task["_id"], "lock_token": task["lock_token"]}
+
+        heartbeat = asyncio.create_task(cls._heartbeat(task))
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for task type {task['type']}")
+            await handler(task["payload"])
+        except Exception as e:
+            logger.error(f"Outbox task {task['_id']} ({task['type']}) failed: {e}")
+
+            if handler is None or task["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                # Upsert so a worker that died between these two writes can redo them
+                await MongoDB.get_collection(OUTBOX_DEAD_LETTER_COLLECTION).replace_one(
+                    {"_id": task["_id"]},
+                    {
+                        **task,
+                        "status": "dead",
+                        "last_error": str(e),
+                        "failed_at": datetime.utcnow()
+                    },
+                    upsert=True
+                )
+                await collection.delete_one(claim)
+                return
+
+            retry_in = OUTBOX_RETRY_BASE_SECONDS ** task["attempts"]
+            await collection.update_one(
+                claim,
+                {"$set": {
+                    "status": "pending",
+                    "last_error": str(e),
+                    "locked_until": None,
+                    "run_after": datetime.utcnow() + timedelta(seconds=retry_in),
+                    "updated_at": datetime.utcnow()
+                }}
+            )
+            return
+        finally:
+            heartbeat.cancel()
+
+        await collection.delete_one(claim)
+
+    @classmethod
+    async def _worker_loop(cls, worker_id: int) -> None:
+        """Claim and run tasks until cancelled"""
+        while True:
+            try:
+                task = await cls._claim()
+                if task:
+                    await cls._process(task)
+                    continue
+
+                cls._wakeup.clear()
+                try:
+                    await asyncio.wait_for(cls._wakeup.wait(), timeout=OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker {worker_id} error: {e}")
+                await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+    @classmethod
+    async def start_workers(cls, count: int = OUTBOX_WORKERS) -> None:
+        """Start the background worker pool"""
+        if cls._workers:
+            return
+
+        cls._wakeup = asyncio.Event()
+        cls._workers = [
+            asyncio.create_task(cls._worker_loop(worker_id))
+            for worker_id in range(count)
+        ]
+        logger.info(f"Started {count} outbox workers")
+
+    @classmethod
+    async def stop_workers(cls) -> None:
+        """Stop the worker pool; unfinished tasks stay in the outbox"""
+        for worker in cls._workers:
+            worker.cancel()
+        await asyncio.gather(*cls._workers, return_exceptions=True)
+        cls._workers = []
+        cls._wakeup = None
+        logger.info("Stopped outbox workers")
+
+    @staticmethod
+    async def get_queue_stats() -> Dict[str, int]:
+        """Count queued, in-flight and dead-lettered tasks"""
+        collection = MongoDB.get_collection(OUTBOX_COLLECTION)
+        return {
+            "pending": await collection.count_documents({"status": "pending"}),
+            "processing": await collection.count_documents({"status": "processing"}),
+            "dead": await MongoDB.get_collection(OUTBOX_DEAD_LETTER_COLLECTION).estimated_document_count()
+        }
+
+# Task handlers
+@OutboxService.register("ws.broadcast")
+async def handle_ws_broadcast(payload: Dict[str, Any]) -> None:
+    """Fan a message out to a WebSocket channel"""
+    from routers.websocket import broadcast_to_channel
+    await broadcast_to_channel(payload["channel"], payload["message_type"], payload["data"])
+
+@OutboxService.register("cart.broadcast")
+async def handle_cart_broadcast(payload: Dict[str, Any]) -> None:
+    """Hand a cart update to the debounced per-user cart broadcaster"""
+    from routers.websocket import broadcast_cart_update
+    await broadcast_cart_update(payload["user_id"], payload["cart"])
+
+@OutboxService.register("notification.create")
+async def handle_notification_create(payload: Dict[str, Any]) -> None:
+    """Create an in-app notification"""
+    from services.notification_service import NotificationService
+    from models.notification import NotificationCreate
+    await NotificationService().create_notification(NotificationCreate(**payload))
+
+@OutboxService.register("wishlist.fanout")
+async def handle_wishlist_fanout(payload: Dict[str, Any]) -> None:
+    """Notify a product's wishlisters about a restock or price drop"""
+    from services.wishlist_service import WishlistService
+    await WishlistService().notify_wishlisters(**payload)
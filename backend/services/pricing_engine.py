@@ -0,0 +1,138 @@
+from typing import Optional, List, Dict, Any, Tuple, Sequence
+from decimal import Decimal, ROUND_HALF_UP
+from database.mongodb import MongoDB, PRODUCTS_COLLECTION
+from models.order import ShippingMethod
+from models.pricing import PriceQuote, PricingQuoteCart
+import logging
+
+logger = logging.getLogger(__name__)
+
+# All amounts below are integer cents; rates are basis points (1/100 of a percent)
+TAX_RATE_BPS = 800
+
+# (minimum subtotal, shipping cost) per method; the highest matching threshold wins
+SHIPPING_RULES: Dict[ShippingMethod, List[Tuple[int, int]]] = {
+    ShippingMethod.STANDARD: [(0, 999), (10000, 0)],
+    ShippingMethod.EXPRESS: [(0, 999), (10000, 0)],
+    ShippingMethod.OVERNIGHT: [(0, 999), (10000, 0)],
+}
+
+# (minimum subtotal, percent off in basis points) order-level discount tiers
+DISCOUNT_TIERS: List[Tuple[int, int]] = []
+
+PriceLine = Tuple[float, int]  # (unit price, quantity)
+
+def to_cents(amount: float) -> int:
+    """Convert a currency amount to integer cents without float drift"""
+    return int(Decimal(str(amount)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_cents(cents: int) -> float:
+    """Convert integer cents back to a currency amount"""
+    return float(Decimal(cents).scaleb(-2))
+
+def apply_bps(cents: int, bps: int) -> int:
+    """Apply a basis-point rate to an amount, rounding half up"""
+    return (cents * bps + 5000) // 10000
+
+def _tiered(rules: Sequence[Tuple[int, int]], subtotal: int) -> Optional[int]:
+    """Value of the highest rule whose threshold the subtotal reaches"""
+    value = None
+    for threshold, rule_value in rules:
+        if subtotal >= threshold:
+            value = rule_value
+    return value
+
+class PricingEngine:
+    """Single source of cart and checkout totals"""
+
+    @staticmethod
+    def quote(
+        lines: Sequence[PriceLine],
+        shipping_method: ShippingMethod = ShippingMethod.STANDARD,
+        discount_cents: int = 0
+    ) -> PriceQuote:
+        """Price one set of lines"""
+        return PricingEngine.quote_batch([lines], [shipping_method], [discount_cents])[0]
+
+    @staticmethod
+    def quote_batch(
+        carts: Sequence[Sequence[PriceLine]],
+        shipping_methods: Optional[Sequence[ShippingMethod]] = None,
+        discounts_cents: Optional[Sequence[int]] = None
+    ) -> List[PriceQuote]:
+        """Price many carts in one pass; unit prices are converted to cents once per distinct price"""
+        cents_by_price: Dict[float, int] = {}
+        quotes = []
+
+        for index, lines in enumerate(carts):
+            line_cents = []
+            for price, quantity in lines:
+                unit_cents = cents_by_price.get(price)
+                if unit_cents is None:
+                    unit_cents = cents_by_price[price] = to_cents(price)
+                line_cents.append(unit_cents * quantity)
+            subtotal = sum(line_cents)
+
+            method = shipping_methods[index] if shipping_methods else ShippingMethod.STANDARD
+            discount = discounts_cents[index] if discounts_cents else 0
+            tier_bps = _tiered(DISCOUNT_TIERS, subtotal)
+            if tier_bps:
+                discount += apply_bps(subtotal, tier_bps)
+            discount = min(discount, subtotal)
+
+            taxable = subtotal - discount
+            tax = apply_bps(taxable, TAX_RATE_BPS)
+            shipping = (_tiered(SHIPPING_RULES[method], taxable) or 0) if subtotal else 0
+
+            quotes.append(PriceQuote(
+                line_subtotals=[from_cents(cents) for cents in line_cents],
+                subtotal=from_cents(subtotal),
+                discount_amount=from_cents(discount),
+                tax_amount=from_cents(tax),
+                shipping_cost=from_cents(shipping),
+                total_amount=from_cents(taxable + tax + shipping)
+            ))
+
+        return quotes
+
+    @staticmethod
+    def unit_price(product: Dict[str, Any]) -> float:
+        """Effective unit price of a product document"""
+        return product.get("sale_price") or product["price"]
+
+    @staticmethod
+    async def quote_carts(carts: List[PricingQuoteCart]) -> Tuple[List[PriceQuote], List[str]]:
+        """Price submitted carts against current product prices and promotions using one product query"""
+        from services.promotion_service import PromotionService
+
+        product_ids = list({item.product_id for cart in carts for item in cart.items})
+        products = {}
+        cursor = MongoDB.get_collection(PRODUCTS_COLLECTION).find(
+            {"_id": {"$in": product_ids}},
+            {"price": 1, "sale_price": 1, "category": 1, "brand": 1, "sku": 1}
+        )
+        async for product_doc in cursor:
+            product_doc["unit_cents"] = to_cents(PricingEngine.unit_price(product_doc))
+            products[product_doc["_id"]] = product_doc
+
+        missing = [product_id for product_id in product_ids if product_id not in products]
+        index = await PromotionService.get_index()
+
+        cart_lines = []
+        discounts = []
+        for cart in carts:
+            lines = [
+                (products[item.product_id], item.quantity)
+                for item in cart.items if item.product_id in products
+            ]
+            cart_lines.append([(PricingEngine.unit_price(product), quantity) for product, quantity in lines])
+            discounts.append(index.evaluate(
+                [
+                    (product["unit_cents"], quantity, product.get("category"), product.get("brand"), product.get("sku"))
+                    for product, quantity in lines
+                ],
+                cart.coupon_code
+            ))
+
+        quotes = PricingEngine.quote_batch(cart_lines, [cart.shipping_method for cart in carts], discounts)
+        return quotes, missing
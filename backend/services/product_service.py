@@ -1,6 +1,7 @@
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 from database.mongodb import MongoDB, PRODUCTS_COLLECTION
 from models.product import (
     ProductCreate, ProductUpdate, ProductInDB, ProductResponse,
@@ -63,15 +64,41 @@ class ProductService:
             if value is not None:
                 update_dict[field] = value
 
-        result = await MongoDB.get_collection(PRODUCTS_COLLECTION).update_one(
+        before = await MongoDB.get_collection(PRODUCTS_COLLECTION).find_one_and_update(
             {"_id": product_id},
-            {"$set": update_dict}
+            {"$set": update_dict},
+            return_document=ReturnDocument.BEFORE
         )
 
-        if result.modified_count == 0:
+        if not before:
             return None
 
-        return await ProductService.get_product_by_id(product_id)
+        after = {**before, **update_dict}
+        await ProductService._enqueue_wishlist_alerts(before, after)
+
+        after["id"] = after["_id"]
+        return ProductInDB(**after)
+
+    @staticmethod
+    async def _enqueue_wishlist_alerts(before: Dict[str, Any], after: Dict[str, Any]) -> None:
+        """Queue wishlist notifications when a product comes back in stock or gets cheaper"""
+        from services.outbox_service import OutboxService
+
+        old_price = before.get("sale_price") or before.get("price")
+        new_price = after.get("sale_price") or after.get("price")
+        # Retries of a fan-out reuse its alert_id, which dedupes the notifications it writes
+        alert_id = str(ObjectId())
+        base_payload = {
+            "product_id": after["_id"],
+            "product_name": after.get("name"),
+            "old_price": old_price,
+            "new_price": new_price
+        }
+
+        if before.get("inventory_quantity", 0) <= 0 < after.get("inventory_quantity", 0):
+            await OutboxService.enqueue("wishlist.fanout", {**base_payload, "event": "restock", "alert_id": f"{alert_id}:restock"})
+        if old_price is not None and new_price is not None and new_price < old_price:
+            await OutboxService.enqueue("wishlist.fanout", {**base_payload, "event": "price_drop", "alert_id": f"{alert_id}:price_drop"})
 
     @staticmethod
     async def delete_product(product_id: str) -> bool:
@@ -0,0 +1,244 @@
+from typing import Optional, List, Dict, Any, Tuple, Sequence
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+from database.mongodb import MongoDB, PROMOTIONS_COLLECTION
+from services.pricing_engine import to_cents, apply_bps
+from models.promotion import (
+    PromotionType, PromotionCreate, PromotionUpdate, PromotionInDB, PromotionListResponse
+)
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Other processes pick up promotion changes within this window
+PROMOTION_CACHE_SECONDS = 60
+
+# (unit price in cents, quantity, category, brand, sku)
+PromotionLine = Tuple[int, int, Optional[str], Optional[str], Optional[str]]
+
+class CompiledPromotion:
+    """A promotion reduced to the integer fields needed at evaluation time"""
+
+    __slots__ = ("id", "type", "bps", "amount_cents", "min_cents", "category", "brand", "sku", "starts_at", "ends_at")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.id = doc["_id"]
+        self.type = doc["type"]
+        self.bps = round(doc["percent_off"] * 100) if doc.get("percent_off") else 0
+        self.amount_cents = to_cents(doc["amount_off"]) if doc.get("amount_off") else 0
+        self.min_cents = to_cents(doc["min_subtotal"]) if doc.get("min_subtotal") else 0
+        self.category = doc.get("category")
+        self.brand = doc.get("brand")
+        self.sku = doc.get("sku")
+        self.starts_at = doc.get("starts_at")
+        self.ends_at = doc.get("ends_at")
+
+    def is_live(self, now: datetime) -> bool:
+        """Check the promotion's schedule window"""
+        return (self.starts_at is None or self.starts_at <= now) and (self.ends_at is None or now < self.ends_at)
+
+    def matches(self, category: Optional[str], brand: Optional[str], sku: Optional[str]) -> bool:
+        """Check every target the promotion sets against a line"""
+        return (
+            (self.category is None or self.category == category) and
+            (self.brand is None or self.brand == brand) and
+            (self.sku is None or self.sku == sku)
+        )
+
+    def line_discount(self, unit_cents: int, quantity: int) -> int:
+        """Discount on one cart line"""
+        if self.type == PromotionType.BOGO:
+            return (quantity // 2) * unit_cents
+        return apply_bps(unit_cents * quantity, self.bps)
+
+    def order_discount(self, subtotal_cents: int) -> int:
+        """Discount on the whole order once its subtotal reaches the threshold"""
+        if subtotal_cents < self.min_cents:
+            return 0
+        if self.amount_cents:
+            return self.amount_cents
+        return apply_bps(subtotal_cents, self.bps)
+
+class PromotionIndex:
+    """Active promotions bucketed by sku, brand and category so a cart line only sees the rules that can apply to it"""
+
+    def __init__(self, docs: Sequence[Dict[str, Any]]):
+        self.by_sku: Dict[str, List[CompiledPromotion]] = {}
+        self.by_brand: Dict[str, List[CompiledPromotion]] = {}
+        self.by_category: Dict[str, List[CompiledPromotion]] = {}
+        self.sitewide: List[CompiledPromotion] = []
+        self.order_rules: List[CompiledPromotion] = []
+        self.coupons: Dict[str, List[CompiledPromotion]] = {}
+
+        for doc in docs:
+            rule = CompiledPromotion(doc)
+            if doc.get("coupon_code"):
+                self.coupons.setdefault(doc["coupon_code"].upper(), []).append(rule)
+            elif rule.type == PromotionType.THRESHOLD:
+                self.order_rules.append(rule)
+            elif rule.sku:
+                self.by_sku.setdefault(rule.sku, []).append(rule)
+            elif rule.brand:
+                self.by_brand.setdefault(rule.brand, []).append(rule)
+            elif rule.category:
+                self.by_category.setdefault(rule.category, []).append(rule)
+            else:
+                self.sitewide.append(rule)
+
+    def has_coupon(self, coupon_code: str, now: Optional[datetime] = None) -> bool:
+        """Check that a coupon code exists and has a live promotion"""
+        now = now or datetime.utcnow()
+        return any(rule.is_live(now) for rule in self.coupons.get(coupon_code.strip().upper(), ()))
+
+    def evaluate(self, lines: Sequence[PromotionLine], coupon_code: Optional[str] = None, now: Optional[datetime] = None) -> int:
+        """Total discount in cents; each line gets its best line rule, then the best order rule applies"""
+        now = now or datetime.utcnow()
+        coupon_rules = self.coupons.get(coupon_code.strip().upper(), ()) if coupon_code else ()
+        subtotal = 0
+        line_total = 0
+
+        for unit_cents, quantity, category, brand, sku in lines:
+            subtotal += unit_cents * quantity
+            best = 0
+            for rules in (self.by_sku.get(sku), self.by_brand.get(brand), self.by_category.get(category), self.sitewide, coupon_rules):
+                if not rules:
+                    continue
+                for rule in rules:
+                    if rule.type == PromotionType.THRESHOLD or not rule.matches(category, brand, sku) or not rule.is_live(now):
+                        continue
+                    discount = rule.line_discount(unit_cents, quantity)
+                    if discount > best:
+                        best = discount
+            line_total += best
+
+        order_total = 0
+        remaining = subtotal - line_total
+        for rules in (self.order_rules, coupon_rules):
+            for rule in rules:
+                if rule.type != PromotionType.THRESHOLD or not rule.is_live(now):
+                    continue
+                discount = rule.order_discount(remaining)
+                if discount > order_total:
+                    order_total = discount
+
+        return min(subtotal, line_total + order_total)
+
+class PromotionService:
+    _index: Optional[PromotionIndex] = None
+    _loaded_at: float = 0.0
+
+    @classmethod
+    async def get_index(cls) -> PromotionIndex:
+        """Get the compiled promotion index, recompiling it when stale"""
+        if cls._index is None or time.monotonic() - cls._loaded_at > PROMOTION_CACHE_SECONDS:
+            await cls.reload()
+        return cls._index
+
+    @classmethod
+    async def reload(cls) -> PromotionIndex:
+        """Compile all active promotions"""
+        docs = await MongoDB.get_collection(PROMOTIONS_COLLECTION).find({"is_active": True}).to_list(None)
+        cls._index = PromotionIndex(docs)
+        cls._loaded_at = time.monotonic()
+        logger.info(f"Compiled {len(docs)} active promotions")
+        return cls._index
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Drop the compiled index so the next evaluation recompiles it"""
+        cls._index = None
+
+    @staticmethod
+    async def cart_discount(lines: Sequence[Tuple[float, int, Dict[str, Any]]], coupon_code: Optional[str] = None) -> int:
+        """Discount in cents for (unit price, quantity, product document) lines"""
+        index = await PromotionService.get_index()
+        return index.evaluate(
+            [
+                (to_cents(price), quantity, product.get("category"), product.get("brand"), product.get("sku"))
+                for price, quantity, product in lines
+            ],
+            coupon_code
+        )
+
+    @staticmethod
+    def _validate(promotion: Dict[str, Any]) -> None:
+        """Check that a promotion has the fields its type needs"""
+        promotion_type = promotion.get("type")
+        if promotion_type == PromotionType.PERCENT_OFF and not promotion.get("percent_off"):
+            raise ValueError("Percent-off promotions require percent_off")
+        if promotion_type == PromotionType.THRESHOLD:
+            if promotion.get("min_subtotal") is None:
+                raise ValueError("Threshold promotions require min_subtotal")
+            if not promotion.get("amount_off") and not promotion.get("percent_off"):
+                raise ValueError("Threshold promotions require amount_off or percent_off")
+        if promotion.get("starts_at") and promotion.get("ends_at") and promotion["ends_at"] <= promotion["starts_at"]:
+            raise ValueError("ends_at must be after starts_at")
+
+    @staticmethod
+    async def create_promotion(promotion_data: PromotionCreate) -> PromotionInDB:
+        """Create a promotion"""
+        promotion_doc = promotion_data.dict()
+        PromotionService._validate(promotion_doc)
+        if promotion_doc.get("coupon_code"):
+            promotion_doc["coupon_code"] = promotion_doc["coupon_code"].strip().upper()
+
+        now = datetime.utcnow()
+        promotion_doc.update({
+            "_id": str(ObjectId()),
+            "created_at": now,
+            "updated_at": now
+        })
+        await MongoDB.get_collection(PROMOTIONS_COLLECTION).insert_one(promotion_doc)
+        PromotionService.invalidate()
+
+        promotion_doc["id"] = promotion_doc["_id"]
+        return PromotionInDB(**promotion_doc)
+
+    @staticmethod
+    async def list_promotions(active_only: bool = False) -> PromotionListResponse:
+        """List promotions, newest first"""
+        query = {"is_active": True} if active_only else {}
+        promotions = []
+        async for promotion_doc in MongoDB.get_collection(PROMOTIONS_COLLECTION).find(query).sort("created_at", -1):
+            promotion_doc["id"] = promotion_doc["_id"]
+            promotions.append(PromotionInDB(**promotion_doc))
+        return PromotionListResponse(promotions=promotions, total=len(promotions))
+
+    @staticmethod
+    async def update_promotion(promotion_id: str, promotion_data: PromotionUpdate) -> Optional[PromotionInDB]:
+        """Update a promotion"""
+        # Only fields the client sent; an explicit null clears optional ones such as ends_at
+        update_data = promotion_data.dict(exclude_unset=True)
+        for field in ("name", "is_active"):
+            if field in update_data and update_data[field] is None:
+                raise ValueError(f"{field} cannot be cleared")
+        if update_data.get("coupon_code"):
+            update_data["coupon_code"] = update_data["coupon_code"].strip().upper()
+
+        collection = MongoDB.get_collection(PROMOTIONS_COLLECTION)
+        existing = await collection.find_one({"_id": promotion_id})
+        if not existing:
+            return None
+        PromotionService._validate({**existing, **update_data})
+
+        update_data["updated_at"] = datetime.utcnow()
+        promotion_doc = await collection.find_one_and_update(
+            {"_id": promotion_id},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
+        PromotionService.invalidate()
+
+        if not promotion_doc:
+            return None
+        promotion_doc["id"] = promotion_doc["_id"]
+        return PromotionInDB(**promotion_doc)
+
+    @staticmethod
+    async def delete_promotion(promotion_id: str) -> bool:
+        """Delete a promotion"""
+        result = await MongoDB.get_collection(PROMOTIONS_COLLECTION).delete_one({"_id": promotion_id})
+        PromotionService.invalidate()
+        return result.deleted_count > 0
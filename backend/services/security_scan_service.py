@@ -0,0 +1,257 @@
+from typing import Optional, List, Dict, Any, Set
+from datetime import datetime, timedelta
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+from database.mongodb import MongoDB, SECURITY_SCANS_COLLECTION, USERS_COLLECTION
+from models.user import UserStatus
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Users are evaluated a keyset page at a time, a few pages in flight at once
+SECURITY_SCAN_BATCH_SIZE = 500
+SECURITY_SCAN_CONCURRENCY = 4
+SECURITY_SCAN_RETENTION_DAYS = 30
+# A running scan renews heartbeat_at this often; one silent for SECURITY_SCAN_STALE_SECONDS
+# belongs to a process that died and is failed so a new scan can start
+SECURITY_SCAN_HEARTBEAT_SECONDS = 15
+SECURITY_SCAN_STALE_SECONDS = 120
+SECURITY_SCAN_START_ATTEMPTS = 3
+
+# Identifies this process as the owner of the scans it starts
+SCAN_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+SCAN_COUNTERS = (
+    "total_users",
+    "users_with_2fa",
+    "users_without_password",
+    "failed_login_attempts",
+    "suspicious_activities",
+    "untrusted_devices",
+    "weak_passwords",  # Would need password strength checking
+    "inactive_accounts"
+)
+
+# Keep references so running scans are not garbage collected mid-flight
+_scan_tasks: Set[asyncio.Task] = set()
+
+class SecurityScanService:
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Create scan indexes; finished scans expire after the retention window"""
+        collection = MongoDB.get_collection(SECURITY_SCANS_COLLECTION)
+        await collection.create_index("created_at", expireAfterSeconds=SECURITY_SCAN_RETENTION_DAYS * 24 * 60 * 60)
+        await collection.create_index("status")
+        # At most one pending or running scan; finished scans drop the flag
+        await collection.create_index("active", unique=True, partialFilterExpression={"active": True})
+
+    @staticmethod
+    async def fail_stale_scans() -> int:
+        """Fail unfinished scans whose owner has stopped sending heartbeats"""
+        cutoff = datetime.utcnow() - timedelta(seconds=SECURITY_SCAN_STALE_SECONDS)
+        result = await MongoDB.get_collection(SECURITY_SCANS_COLLECTION).update_many(
+            {
+                "status": {"$in": ["pending", "running"]},
+                "$or": [{"heartbeat_at": {"$lt": cutoff}}, {"heartbeat_at": {"$exists": False}}]
+            },
+            {
+                "$set": {"status": "failed", "error": "Interrupted: scan owner stopped responding", "completed_at": datetime.utcnow()},
+                "$unset": {"active": ""}
+            }
+        )
+        if result.modified_count:
+            logger.warning(f"Failed {result.modified_count} stale security scans")
+        return result.modified_count
+
+    @staticmethod
+    async def start_scan(requested_by: str) -> Dict[str, Any]:
+        """Start a background scan, or return the one already in progress"""
+        from services.user_service import UserService
+
+        collection = MongoDB.get_collection(SECURITY_SCANS_COLLECTION)
+        await SecurityScanService.fail_stale_scans()
+        user_stats = await UserService.get_user_stats()
+
+        for _ in range(SECURITY_SCAN_START_ATTEMPTS):
+            now = datetime.utcnow()
+            scan_doc = {
+                "_id": uuid.uuid4().hex,
+                "status": "pending",
+                "active": True,
+                "owner": SCAN_OWNER,
+                "heartbeat_at": now,
+                "requested_by": requested_by,
+                "total_users": user_stats.total_users,  # estimate for progress; results count exactly
+                "processed_users": 0,
+                "results": None,
+                "error": None,
+                "created_at": now,
+                "started_at": None,
+                "completed_at": None
+            }
+            try:
+                await collection.insert_one(scan_doc)
+                break
+            except DuplicateKeyError:
+                # Another request won the race; report its scan unless it finished in between
+                active = await collection.find_one({"active": True})
+                if active:
+                    return SecurityScanService._to_response(active)
+        else:
+            raise RuntimeError("Could not start security scan")
+
+        task = asyncio.create_task(SecurityScanService._run(scan_doc["_id"]))
+        _scan_tasks.add(task)
+        task.add_done_callback(_scan_tasks.discard)
+
+        return SecurityScanService._to_response(scan_doc)
+
+    @staticmethod
+    async def get_scan(scan_id: str) -> Optional[Dict[str, Any]]:
+        """Get a scan's status, progress and results"""
+        scan_doc = await MongoDB.get_collection(SECURITY_SCANS_COLLECTION).find_one({"_id": scan_id})
+        return SecurityScanService._to_response(scan_doc) if scan_doc else None
+
+    @staticmethod
+    async def list_scans(limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent scans first"""
+        cursor = MongoDB.get_collection(SECURITY_SCANS_COLLECTION).find().sort("created_at", DESCENDING).limit(limit)
+        return [SecurityScanService._to_response(scan_doc) async for scan_doc in cursor]
+
+    @staticmethod
+    def _to_response(scan_doc: Dict[str, Any]) -> Dict[str, Any]:
+        scan = dict(scan_doc)
+        scan["id"] = scan.pop("_id")
+        return scan
+
+    @staticmethod
+    async def _heartbeat(scan_id: str) -> None:
+        """Keep renewing a running scan's heartbeat so other processes leave it alone"""
+        collection = MongoDB.get_collection(SECURITY_SCANS_COLLECTION)
+        while True:
+            await asyncio.sleep(SECURITY_SCAN_HEARTBEAT_SECONDS)
+            try:
+                await collection.update_one(
+                    {"_id": scan_id, "owner": SCAN_OWNER, "active": True},
+                    {"$set": {"heartbeat_at": datetime.utcnow()}}
+                )
+            except Exception as e:
+                logger.error(f"Security scan {scan_id} heartbeat failed: {e}")
+
+    @staticmethod
+    async def _run(scan_id: str) -> None:
+        """Evaluate every user and store the totals on the scan document"""
+        collection = MongoDB.get_collection(SECURITY_SCANS_COLLECTION)
+        # Writes only land while this process still owns the scan; a stale scan failed elsewhere stays failed
+        claim = {"_id": scan_id, "owner": SCAN_OWNER, "active": True}
+        started_at = datetime.utcnow()
+        await collection.update_one(
+            claim,
+            {"$set": {"status": "running", "started_at": started_at, "heartbeat_at": started_at}}
+        )
+
+        heartbeat = asyncio.create_task(SecurityScanService._heartbeat(scan_id))
+        try:
+            results = await SecurityScanService._evaluate_all(scan_id, started_at)
+            results["scan_timestamp"] = started_at.isoformat()
+            await collection.update_one(
+                claim,
+                {
+                    "$set": {"status": "completed", "results": results, "completed_at": datetime.utcnow()},
+                    "$unset": {"active": ""}
+                }
+            )
+            logger.info(f"Security scan {scan_id} completed for {results['total_users']} users")
+        except Exception as e:
+            logger.error(f"Security scan {scan_id} failed: {e}")
+            await collection.update_one(
+                claim,
+                {
+                    "$set": {"status": "failed", "error": str(e), "completed_at": datetime.utcnow()},
+                    "$unset": {"active": ""}
+                }
+            )
+        finally:
+            heartbeat.cancel()
+
+    @staticmethod
+    async def _evaluate_all(scan_id: str, started_at: datetime) -> Dict[str, int]:
+        """Fan user pages out to batch evaluations with at most SECURITY_SCAN_CONCURRENCY in flight"""
+        from services.user_service import UserService
+        from services.security_service import SecurityService, SUSPICIOUS_ACTIVITY_WINDOW_DAYS
+
+        security_service = SecurityService()
+        suspicious_since = started_at - timedelta(days=SUSPICIOUS_ACTIVITY_WINDOW_DAYS)
+        totals = {counter: 0 for counter in SCAN_COUNTERS}
+        semaphore = asyncio.Semaphore(SECURITY_SCAN_CONCURRENCY)
+        in_flight: Set[asyncio.Task] = set()
+        errors: List[Exception] = []
+
+        async def evaluate(users: List[Dict[str, Any]]) -> None:
+            try:
+                batch_totals = await SecurityScanService._evaluate_batch(security_service, users, suspicious_since)
+                for counter, value in batch_totals.items():
+                    totals[counter] += value
+                await MongoDB.get_collection(SECURITY_SCANS_COLLECTION).update_one(
+                    {"_id": scan_id},
+                    {"$inc": {"processed_users": len(users)}}
+                )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                semaphore.release()
+
+        async for users in UserService.iter_user_batches(SECURITY_SCAN_BATCH_SIZE, projection={"status": 1}):
+            await semaphore.acquire()
+            # Stop feeding pages once any batch has failed; the scan is reported as failed, not partial
+            if errors:
+                semaphore.release()
+                break
+            task = asyncio.create_task(evaluate(users))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        await asyncio.gather(*in_flight)
+        if errors:
+            raise errors[0]
+
+        return totals
+
+    @staticmethod
+    async def _evaluate_batch(security_service, users: List[Dict[str, Any]], suspicious_since: datetime) -> Dict[str, int]:
+        """Read-only, set-based checks for one page of users"""
+        user_ids = [user["id"] for user in users]
+        settings_pipeline = [
+            {"$match": {"user_id": {"$in": user_ids}}},
+            {"$group": {
+                "_id": None,
+                "with_2fa": {"$sum": {"$cond": [{"$eq": ["$two_factor_enabled", True]}, 1, 0]}},
+                "failed_attempts": {"$sum": {"$ifNull": ["$failed_login_attempts", 0]}}
+            }}
+        ]
+
+        settings_rows, without_password, suspicious, untrusted = await asyncio.gather(
+            security_service.settings_collection.aggregate(settings_pipeline).to_list(1),
+            MongoDB.get_collection(USERS_COLLECTION).count_documents({"_id": {"$in": user_ids}, "hashed_password": None}),
+            security_service.security_events_collection.count_documents({
+                "user_id": {"$in": user_ids},
+                "event_type": "suspicious_activity",
+                "timestamp": {"$gte": suspicious_since}
+            }),
+            security_service.devices_collection.count_documents({"user_id": {"$in": user_ids}, "is_trusted": {"$ne": True}})
+        )
+
+        settings_totals = settings_rows[0] if settings_rows else {}
+        return {
+            "total_users": len(users),
+            "users_with_2fa": settings_totals.get("with_2fa", 0),
+            "users_without_password": without_password,
+            "failed_login_attempts": settings_totals.get("failed_attempts", 0),
+            "suspicious_activities": suspicious,
+            "untrusted_devices": untrusted,
+            "inactive_accounts": sum(1 for user in users if user.get("status") == UserStatus.INACTIVE.value)
+        }
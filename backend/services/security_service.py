@@ -1,19 +1,55 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple, Any, Dict, AsyncIterator
 from datetime import datetime, timedelta
 from models.security import (
     SecuritySettings, SecuritySettingsUpdate, LoginHistory, DeviceInfo,
     SecurityEvent, ChangePasswordRequest, EnableTwoFactorRequest,
-    VerifyTwoFactorRequest, DeactivateAccountRequest, SecurityStats
+    VerifyTwoFactorRequest, DeactivateAccountRequest, SecurityStats,
+    LoginAttemptStatus
 )
 from models.user import UserInDB
-from database.mongodb import MongoDB
-from auth.security import get_password_hash, verify_password, create_access_token
+from database.mongodb import MongoDB, REFRESH_TOKENS_COLLECTION
+from auth.security import get_password_hash_async, verify_password_async, create_access_token
+from bson import json_util
+import asyncio
+import base64
 import logging
 import secrets
 import pyotp
 
 logger = logging.getLogger(__name__)
 
+SUSPICIOUS_ACTIVITY_WINDOW_DAYS = 30
+
+# Keyset cursors need a value on every row, so devices missing a sort field are backfilled
+DEVICE_SORT_FIELDS = ("last_used", "created_at")
+DEVICE_MISSING_TIMESTAMP = datetime(1970, 1, 1)
+DEVICE_STREAM_BATCH_SIZE = 500
+
+def encode_cursor(sort_value: Any, doc_id: Any) -> str:
+    """Opaque keyset cursor holding the last row's sort value and _id"""
+    return base64.urlsafe_b64encode(json_util.dumps([sort_value, doc_id]).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """Reverse encode_cursor; raises ValueError on anything malformed"""
+    try:
+        sort_value, doc_id = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, doc_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def keyset_after(sort_field: str, cursor: str, descending: bool = True) -> Dict[str, Any]:
+    """Filter for rows strictly after the cursor in (sort_field, _id) order"""
+    sort_value, doc_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {sort_field: {op: sort_value}},
+        {sort_field: sort_value, "_id": {op: doc_id}}
+    ]}
+
+def _live_refresh_token_query(now: datetime) -> dict:
+    """A session is alive while its current refresh token is unused, unrevoked and unexpired"""
+    return {"used_at": None, "revoked": False, "expires_at": {"$gt": now}}
+
 class SecurityService:
     def __init__(self):
         try:
@@ -26,6 +62,33 @@ class SecurityService:
             logger.error(f"Failed to initialize SecurityService: {e}")
             raise RuntimeError("Database connection failed") from e
 
+    async def ensure_indexes(self) -> None:
+        """Create indexes used by security lookups and admin statistics"""
+        await self.settings_collection.create_index("user_id")
+        await self.security_events_collection.create_index([("event_type", 1), ("timestamp", -1)])
+        await self.security_events_collection.create_index([("user_id", 1), ("event_type", 1), ("timestamp", -1)])
+        await self.login_history_collection.create_index([("timestamp", -1), ("_id", -1)])
+        await self.login_history_collection.create_index([("user_id", 1), ("timestamp", -1), ("_id", -1)])
+        await self.login_history_collection.create_index([("status", 1), ("timestamp", -1), ("_id", -1)])
+        await self.login_history_collection.create_index([("ip_address", 1), ("timestamp", -1), ("_id", -1)])
+        await self.devices_collection.create_index([("user_id", 1), ("is_trusted", 1)])
+        await self.devices_collection.create_index([("user_id", 1), ("last_used", -1), ("_id", -1)])
+        for sort_field in DEVICE_SORT_FIELDS:
+            await self.devices_collection.create_index([(sort_field, -1), ("_id", -1)])
+            await self.devices_collection.create_index([("is_trusted", 1), (sort_field, -1), ("_id", -1)])
+
+    async def backfill_device_timestamps(self) -> int:
+        """Fill missing last_used/created_at from each other, or the epoch, so every device has both sort keys"""
+        missing = [{field: None} for field in DEVICE_SORT_FIELDS]
+        result = await self.devices_collection.update_many(
+            {"$or": missing},
+            [{"$set": {
+                "last_used": {"$ifNull": ["$last_used", {"$ifNull": ["$created_at", DEVICE_MISSING_TIMESTAMP]}]},
+                "created_at": {"$ifNull": ["$created_at", {"$ifNull": ["$last_used", DEVICE_MISSING_TIMESTAMP]}]}
+            }}]
+        )
+        return result.modified_count
+
     async def get_security_settings(self, user_id: str) -> SecuritySettings:
         """Get security settings for a user"""
         try:
@@ -85,12 +148,12 @@ class SecurityService:
                 return False
 
             # Verify current password
-            if not verify_password(request.current_password, user.hashed_password):
+            if not await verify_password_async(request.current_password, user.hashed_password):
                 logger.error("Current password verification failed")
                 return False
 
             # Update password
-            hashed_password = get_password_hash(request.new_password)
+            hashed_password = await get_password_hash_async(request.new_password)
 
             # Use the update_user method properly
             update_result = await user_service.update_user(user_id, {"hashed_password": hashed_password})
@@ -257,6 +320,42 @@ class SecurityService:
             logger.error(f"Get login history error: {e}")
             raise ValueError(f"Failed to get login history: {str(e)}")
 
+    async def query_login_history(
+        self,
+        limit: int = 100,
+        user_id: Optional[str] = None,
+        status: Optional[LoginAttemptStatus] = None,
+        ip_address: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[LoginHistory], Optional[str]]:
+        """Newest-first login history across users; returns the page and the cursor for the next one"""
+        query: Dict[str, Any] = {}
+        if user_id:
+            query["user_id"] = user_id
+        if status:
+            query["status"] = status.value if hasattr(status, 'value') else status
+        if ip_address:
+            query["ip_address"] = ip_address
+        if cursor:
+            query.update(keyset_after("timestamp", cursor))
+
+        # Bad cursors surface as ValueError above; anything failing from here on is a server error
+        try:
+            docs = await self.login_history_collection.find(query).sort(
+                [("timestamp", -1), ("_id", -1)]
+            ).limit(limit).to_list(limit)
+
+            next_cursor = encode_cursor(docs[-1]["timestamp"], docs[-1]["_id"]) if len(docs) == limit else None
+
+            history = []
+            for item in docs:
+                item["id"] = str(item["_id"])
+                history.append(LoginHistory(**item))
+            return history, next_cursor
+        except Exception as e:
+            logger.error(f"Query login history error: {e}")
+            raise RuntimeError(f"Failed to query login history: {str(e)}")
+
     async def get_connected_devices(self, user_id: str) -> List[DeviceInfo]:
         """Get connected devices for a user"""
         try:
@@ -272,6 +371,90 @@ class SecurityService:
             logger.error(f"Get connected devices error: {e}")
             raise ValueError(f"Failed to get connected devices: {str(e)}")
 
+    def _device_query(
+        self,
+        user_id: Optional[str],
+        trusted: Optional[bool],
+        last_used_from: Optional[datetime],
+        last_used_to: Optional[datetime],
+        sort_by: str,
+        sort_order: str
+    ) -> Tuple[Dict[str, Any], List[Tuple[str, int]]]:
+        """Build the filter and (sort_by, _id) sort for device inventory queries"""
+        if sort_by not in DEVICE_SORT_FIELDS:
+            raise ValueError(f"Cannot sort devices by {sort_by}")
+
+        query: Dict[str, Any] = {}
+        if user_id:
+            query["user_id"] = user_id
+        if trusted is not None:
+            query["is_trusted"] = trusted
+        if last_used_from or last_used_to:
+            query["last_used"] = {}
+            if last_used_from:
+                query["last_used"]["$gte"] = last_used_from
+            if last_used_to:
+                query["last_used"]["$lte"] = last_used_to
+
+        # Rows without a date to sort on cannot be placed by a keyset cursor; the startup backfill
+        # leaves none, and any written since are excluded rather than skipped or repeated
+        query.setdefault(sort_by, {})["$type"] = "date"
+
+        direction = -1 if sort_order == "-1" else 1
+        return query, [(sort_by, direction), ("_id", direction)]
+
+    async def query_devices(
+        self,
+        limit: int = 100,
+        user_id: Optional[str] = None,
+        trusted: Optional[bool] = None,
+        last_used_from: Optional[datetime] = None,
+        last_used_to: Optional[datetime] = None,
+        sort_by: str = "last_used",
+        sort_order: str = "-1",
+        cursor: Optional[str] = None
+    ) -> Tuple[List[DeviceInfo], Optional[str]]:
+        """One page of devices across users; returns the page and the cursor for the next one"""
+        query, sort = self._device_query(user_id, trusted, last_used_from, last_used_to, sort_by, sort_order)
+        if cursor:
+            keyset = keyset_after(sort_by, cursor, descending=sort[0][1] == -1)
+            query = {"$and": [query, keyset]} if query else keyset
+
+        try:
+            docs = await self.devices_collection.find(query).sort(sort).limit(limit).to_list(limit)
+
+            next_cursor = encode_cursor(docs[-1].get(sort_by), docs[-1]["_id"]) if len(docs) == limit else None
+
+            devices = []
+            for device in docs:
+                device["id"] = str(device["_id"])
+                devices.append(DeviceInfo(**device))
+            return devices, next_cursor
+        except Exception as e:
+            logger.error(f"Query devices error: {e}")
+            raise RuntimeError(f"Failed to query devices: {str(e)}")
+
+    def stream_devices(
+        self,
+        user_id: Optional[str] = None,
+        trusted: Optional[bool] = None,
+        last_used_from: Optional[datetime] = None,
+        last_used_to: Optional[datetime] = None,
+        sort_by: str = "last_used",
+        sort_order: str = "-1"
+    ) -> AsyncIterator[DeviceInfo]:
+        """Iterate over every matching device from a single server-side cursor"""
+        # Built eagerly so bad parameters fail before a streaming response starts
+        query, sort = self._device_query(user_id, trusted, last_used_from, last_used_to, sort_by, sort_order)
+
+        async def iterate() -> AsyncIterator[DeviceInfo]:
+            cursor = self.devices_collection.find(query).sort(sort).batch_size(DEVICE_STREAM_BATCH_SIZE)
+            async for device in cursor:
+                device["id"] = str(device["_id"])
+                yield DeviceInfo(**device)
+
+        return iterate()
+
     async def log_security_event(self, user_id: str, event_type: str, ip_address: str = "", user_agent: str = "", details: Optional[dict] = None):
         """Log a security event"""
         try:
@@ -300,8 +483,10 @@ class SecurityService:
             })
             failed_logins = total_attempts - successful_logins
 
-            # Active sessions (simplified - in real app would check active tokens)
-            active_sessions = 1  # Placeholder
+            active_sessions = await MongoDB.get_collection(REFRESH_TOKENS_COLLECTION).count_documents({
+                "user_id": user_id,
+                **_live_refresh_token_query(datetime.utcnow())
+            })
 
             # Trusted devices
             trusted_devices = await self.devices_collection.count_documents({
@@ -310,7 +495,7 @@ class SecurityService:
             })
 
             # Suspicious activities (events in last 30 days)
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+            thirty_days_ago = datetime.utcnow() - timedelta(days=SUSPICIOUS_ACTIVITY_WINDOW_DAYS)
             suspicious_activities = await self.security_events_collection.count_documents({
                 "user_id": user_id,
                 "event_type": "suspicious_activity",
@@ -329,6 +514,44 @@ class SecurityService:
             logger.error(f"Get security stats error: {e}")
             raise ValueError(f"Failed to get security statistics: {str(e)}")
 
+    async def get_global_security_stats(self) -> SecurityStats:
+        """Get security statistics across all users, one aggregation per collection run concurrently"""
+        try:
+            now = datetime.utcnow()
+            login_pipeline = [
+                {"$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "successful": {"$sum": {"$cond": [{"$eq": ["$status", "success"]}, 1, 0]}}
+                }}
+            ]
+
+            login_totals, trusted_devices, suspicious_activities, active_sessions = await asyncio.gather(
+                self.login_history_collection.aggregate(login_pipeline).to_list(1),
+                self.devices_collection.count_documents({"is_trusted": True}),
+                self.security_events_collection.count_documents({
+                    "event_type": "suspicious_activity",
+                    "timestamp": {"$gte": now - timedelta(days=SUSPICIOUS_ACTIVITY_WINDOW_DAYS)}
+                }),
+                MongoDB.get_collection(REFRESH_TOKENS_COLLECTION).count_documents(_live_refresh_token_query(now))
+            )
+
+            totals = login_totals[0] if login_totals else {}
+            total_attempts = totals.get("total", 0)
+            successful_logins = totals.get("successful", 0)
+
+            return SecurityStats(
+                total_login_attempts=total_attempts,
+                successful_logins=successful_logins,
+                failed_logins=total_attempts - successful_logins,
+                suspicious_activities=suspicious_activities,
+                active_sessions=active_sessions,
+                trusted_devices=trusted_devices
+            )
+        except Exception as e:
+            logger.error(f"Get global security stats error: {e}")
+            raise ValueError(f"Failed to get security statistics: {str(e)}")
+
     async def deactivate_account(self, user_id: str, request: DeactivateAccountRequest) -> bool:
         """Deactivate user account"""
         try:
@@ -340,7 +563,7 @@ class SecurityService:
                 return False
 
             # Verify password
-            if not verify_password(request.password, user.hashed_password):
+            if not await verify_password_async(request.password, user.hashed_password):
                 return False
 
             # Deactivate account
@@ -0,0 +1,109 @@
+from typing import Optional, Tuple
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+from database.mongodb import MongoDB, REFRESH_TOKENS_COLLECTION
+from auth.revocation import revocation_list
+import hashlib
+import secrets
+import logging
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_DAYS = 30
+
+def _hash_token(token: str) -> str:
+    """Refresh tokens are stored only as hashes"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class TokenService:
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Create refresh token indexes; the TTL index drops expired tokens"""
+        collection = MongoDB.get_collection(REFRESH_TOKENS_COLLECTION)
+        await collection.create_index("expires_at", expireAfterSeconds=0)
+        await collection.create_index([("user_id", ASCENDING), ("revoked", ASCENDING)])
+        await collection.create_index("family_id")
+
+    @staticmethod
+    async def issue_refresh_token(user_id: str, family_id: Optional[str] = None) -> str:
+        """Issue a refresh token, starting a new rotation family unless one is given"""
+        token = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        await MongoDB.get_collection(REFRESH_TOKENS_COLLECTION).insert_one({
+            "_id": _hash_token(token),
+            "user_id": user_id,
+            "family_id": family_id or secrets.token_hex(16),
+            "created_at": now,
+            "expires_at": now + timedelta(days=REFRESH_TOKEN_DAYS),
+            "used_at": None,
+            "revoked": False
+        })
+        return token
+
+    @staticmethod
+    async def rotate_refresh_token(token: str) -> Tuple[str, str]:
+        """Exchange a refresh token for a new one in the same family; returns (user_id, new token)"""
+        collection = MongoDB.get_collection(REFRESH_TOKENS_COLLECTION)
+        token_hash = _hash_token(token)
+        now = datetime.utcnow()
+
+        current = await collection.find_one_and_update(
+            {"_id": token_hash, "used_at": None, "revoked": False, "expires_at": {"$gt": now}},
+            {"$set": {"used_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if current:
+            new_token = await TokenService.issue_refresh_token(current["user_id"], current["family_id"])
+            return current["user_id"], new_token
+
+        existing = await collection.find_one({"_id": token_hash})
+        if existing and existing.get("used_at") and not existing.get("revoked"):
+            # A rotated-out token came back: assume it was stolen and kill the whole family
+            await TokenService.revoke_family(existing["family_id"])
+            logger.warning(f"Refresh token reuse detected for user {existing['user_id']}")
+
+            from services.security_service import SecurityService
+            await SecurityService().log_security_event(
+                user_id=existing["user_id"],
+                event_type="refresh_token_reuse",
+                details={"family_id": existing["family_id"]}
+            )
+
+        raise ValueError("Invalid refresh token")
+
+    @staticmethod
+    async def revoke_family(family_id: str) -> None:
+        """Revoke every refresh token in a rotation family"""
+        await MongoDB.get_collection(REFRESH_TOKENS_COLLECTION).update_many(
+            {"family_id": family_id},
+            {"$set": {"revoked": True}}
+        )
+
+    @staticmethod
+    async def revoke_refresh_token(token: str) -> None:
+        """Revoke the family a refresh token belongs to"""
+        existing = await MongoDB.get_collection(REFRESH_TOKENS_COLLECTION).find_one(
+            {"_id": _hash_token(token)},
+            {"family_id": 1}
+        )
+        if existing:
+            await TokenService.revoke_family(existing["family_id"])
+
+    @staticmethod
+    async def revoke_access_token(payload: dict) -> None:
+        """Revoke a decoded access token until its expiry"""
+        if payload.get("jti"):
+            await revocation_list.revoke_token(
+                payload["jti"],
+                payload.get("sub"),
+                datetime.utcfromtimestamp(payload["exp"])
+            )
+
+    @staticmethod
+    async def revoke_all_for_user(user_id: str) -> None:
+        """Revoke all access and refresh tokens a user holds"""
+        await MongoDB.get_collection(REFRESH_TOKENS_COLLECTION).update_many(
+            {"user_id": user_id, "revoked": False},
+            {"$set": {"revoked": True}}
+        )
+        await revocation_list.revoke_user(user_id)
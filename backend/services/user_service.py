@@ -2,20 +2,84 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from typing import Optional, List, Dict, Any
-from datetime import datetime
-from database.mongodb import MongoDB, USERS_COLLECTION
+from typing import Optional, List, Dict, Any, AsyncIterator
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, UpdateOne, ReturnDocument
+from database.mongodb import MongoDB, USERS_COLLECTION, USER_STATS_COLLECTION
 from models.user import (
     UserCreate, UserUpdate, UserInDB, UserResponse,
     UserLogin, UserStats, UserRole, UserStatus
 )
-from auth.security import get_password_hash, verify_password
+from auth.security import get_password_hash_async, verify_password_async
+from auth.dependencies import invalidate_cached_user
 from utils.config import settings
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# Never ship credentials out of list and batch reads
+USER_LIST_PROJECTION = {"hashed_password": 0}
+USER_BATCH_SIZE = 500
+
+# Dashboard user stats are counters kept in user_stats; a nightly rebuild corrects any drift
+USER_STATS_TOTALS_ID = "totals"
+USER_STATS_RECONCILE_INTERVAL_SECONDS = 24 * 60 * 60
+
+def _daily_stats_id(day: datetime) -> str:
+    return f"daily:{day.strftime('%Y-%m-%d')}"
+
+def normalize_search_name(first_name: Optional[str], last_name: Optional[str]) -> str:
+    """Lowercased, whitespace-collapsed full name used for indexed prefix search"""
+    return " ".join(f"{first_name or ''} {last_name or ''}".split()).lower()
+
+def normalize_search_email(email: Optional[str]) -> str:
+    """Lowercased email used for indexed, case-insensitive prefix search"""
+    return (email or "").strip().lower()
+
+def _enum_value(value) -> str:
+    return str(value.value) if hasattr(value, 'value') else str(value)
+
 class UserService:
+    @staticmethod
+    async def ensure_indexes() -> None:
+        """Create indexes used by user lookups, search and keyset listing"""
+        collection = MongoDB.get_collection(USERS_COLLECTION)
+        await collection.create_index("email")
+        await collection.create_index("search_name")
+        await collection.create_index("search_email")
+        await collection.create_index([("role", ASCENDING), ("_id", ASCENDING)])
+        await collection.create_index([("status", ASCENDING), ("_id", ASCENDING)])
+
+    @staticmethod
+    async def backfill_search_fields() -> int:
+        """Populate search_name and search_email on users created before they existed"""
+        collection = MongoDB.get_collection(USERS_COLLECTION)
+        updated = 0
+        cursor = collection.find(
+            {"$or": [{"search_name": {"$exists": False}}, {"search_email": {"$exists": False}}]},
+            {"email": 1, "first_name": 1, "last_name": 1}
+        ).batch_size(USER_BATCH_SIZE)
+
+        operations = []
+        async for user_doc in cursor:
+            operations.append(UpdateOne(
+                {"_id": user_doc["_id"]},
+                {"$set": {
+                    "search_name": normalize_search_name(user_doc.get("first_name"), user_doc.get("last_name")),
+                    "search_email": normalize_search_email(user_doc.get("email"))
+                }}
+            ))
+            if len(operations) >= USER_BATCH_SIZE:
+                await collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+        return updated
+
     @staticmethod
     async def create_user(user_data: UserCreate) -> UserInDB:
         """Create a new user"""
@@ -33,7 +97,9 @@ class UserService:
             "email": user_data.email,
             "first_name": user_data.first_name or "",
             "last_name": user_data.last_name or "",
-            "hashed_password": get_password_hash(user_data.password) if user_data.password else None,
+            "search_name": normalize_search_name(user_data.first_name, user_data.last_name),
+            "search_email": normalize_search_email(user_data.email),
+            "hashed_password": await get_password_hash_async(user_data.password) if user_data.password else None,
             "google_id": user_data.google_id,
             "role": str(user_data.role.value) if hasattr(user_data, 'role') and user_data.role is not None else str(UserRole.CUSTOMER.value),
             "status": str(user_data.status.value) if hasattr(user_data, 'status') and user_data.status is not None else str(UserStatus.ACTIVE.value),
@@ -56,6 +122,7 @@ class UserService:
 
         # Insert user
         result = await MongoDB.get_collection(USERS_COLLECTION).insert_one(user_doc)
+        await UserService._apply_stats_delta(None, user_doc)
 
         # Return user object
         user_doc["id"] = user_doc["_id"]
@@ -75,7 +142,7 @@ class UserService:
         if not user_doc.get("hashed_password"):
             return None
 
-        if not verify_password(login_data.password, user_doc["hashed_password"]):
+        if not await verify_password_async(login_data.password, user_doc["hashed_password"]):
             return None
 
         # Update last login
@@ -83,6 +150,7 @@ class UserService:
             {"_id": user_doc["_id"]},
             {"$set": {"last_login": datetime.utcnow()}}
         )
+        invalidate_cached_user(user_doc["_id"])
 
         user_doc["id"] = user_doc["_id"]
         return UserInDB(**user_doc)
@@ -183,102 +251,263 @@ class UserService:
         for field, value in data_dict.items():
             if value is not None:
                 update_dict[field] = value
+        if "email" in update_dict:
+            update_dict["search_email"] = normalize_search_email(update_dict["email"])
 
-        result = await MongoDB.get_collection(USERS_COLLECTION).update_one(
+        # updated_at always changes, so a matched document is a modified one
+        before = await MongoDB.get_collection(USERS_COLLECTION).find_one_and_update(
             {"_id": user_id},
-            {"$set": update_dict}
+            {"$set": update_dict},
+            projection={"role": 1, "status": 1, "created_at": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        invalidate_cached_user(user_id)
 
-        if result.modified_count == 0:
+        if not before:
             return None
 
-        return await UserService.get_user_by_id(user_id)
+        if "role" in update_dict or "status" in update_dict:
+            await UserService._apply_stats_delta(before, {**before, **update_dict})
+
+        # Sign the user out everywhere once the account stops being active
+        if update_dict.get("status") and update_dict["status"] != UserStatus.ACTIVE:
+            from services.token_service import TokenService
+            await TokenService.revoke_all_for_user(user_id)
+
+        user = await UserService.get_user_by_id(user_id)
+
+        if user and ("first_name" in update_dict or "last_name" in update_dict):
+            await MongoDB.get_collection(USERS_COLLECTION).update_one(
+                {"_id": user_id},
+                {"$set": {"search_name": normalize_search_name(user.first_name, user.last_name)}}
+            )
+
+        # Keep the customer snapshot denormalized onto orders in sync
+        if user and any(field in update_dict for field in ("first_name", "last_name", "email")):
+            from services.order_service import OrderService
+            await OrderService.refresh_customer_snapshot(user_id, user.dict())
+
+        return user
 
     @staticmethod
     async def delete_user(user_id: str) -> bool:
         """Delete user"""
-        result = await MongoDB.get_collection(USERS_COLLECTION).delete_one(
-            {"_id": user_id}
+        deleted = await MongoDB.get_collection(USERS_COLLECTION).find_one_and_delete(
+            {"_id": user_id},
+            projection={"role": 1, "status": 1, "created_at": 1}
         )
-        return result.deleted_count > 0
+        invalidate_cached_user(user_id)
+        if deleted:
+            await UserService._apply_stats_delta(deleted, None)
+            from services.token_service import TokenService
+            await TokenService.revoke_all_for_user(user_id)
+        return deleted is not None
 
     @staticmethod
     async def list_users(
-        skip: int = 0,
         limit: int = 50,
         role: Optional[UserRole] = None,
-        status: Optional[UserStatus] = None
+        status: Optional[UserStatus] = None,
+        search: Optional[str] = None,
+        after: Optional[str] = None
     ) -> List[UserResponse]:
-        """List users with pagination and filters"""
-        query = {}
-
-        if role:
-            query["role"] = str(role.value) if hasattr(role, 'value') else str(role)
-        if status:
-            query["status"] = str(status.value) if hasattr(status, 'value') else str(status)
+        """List users ordered by id, continuing after the given id"""
+        query = UserService._build_list_query(role, status, search)
+        if after:
+            query["_id"] = {"$gt": after}
 
-        cursor = MongoDB.get_collection(USERS_COLLECTION).find(query).skip(skip).limit(limit)
+        cursor = MongoDB.get_collection(USERS_COLLECTION).find(
+            query, USER_LIST_PROJECTION
+        ).sort("_id", ASCENDING).limit(limit)
 
         users = []
         async for user_doc in cursor:
-            user_doc["id"] = user_doc["_id"]
-            user = UserInDB(**user_doc)
-            users.append(UserResponse(**user.dict()))
+            user_doc["id"] = user_doc.pop("_id")
+            users.append(UserResponse(**user_doc))
 
         return users
 
+    @staticmethod
+    async def iter_user_batches(
+        batch_size: int = USER_BATCH_SIZE,
+        role: Optional[UserRole] = None,
+        status: Optional[UserStatus] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Walk all matching users in id order, one keyset page at a time"""
+        collection = MongoDB.get_collection(USERS_COLLECTION)
+        base_query = UserService._build_list_query(role, status, None)
+        projection = projection if projection is not None else USER_LIST_PROJECTION
+        after = None
+
+        while True:
+            query = dict(base_query)
+            if after is not None:
+                query["_id"] = {"$gt": after}
+
+            batch = await collection.find(query, projection).sort("_id", ASCENDING).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+
+            after = batch[-1]["_id"]
+            for user_doc in batch:
+                user_doc["id"] = user_doc["_id"]
+            yield batch
+
+            if len(batch) < batch_size:
+                break
+
+    @staticmethod
+    async def iter_users(
+        batch_size: int = USER_BATCH_SIZE,
+        role: Optional[UserRole] = None,
+        status: Optional[UserStatus] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over all matching user documents without loading them at once"""
+        async for batch in UserService.iter_user_batches(batch_size, role, status, projection):
+            for user_doc in batch:
+                yield user_doc
+
+    @staticmethod
+    def _build_list_query(
+        role: Optional[UserRole],
+        status: Optional[UserStatus],
+        search: Optional[str]
+    ) -> Dict[str, Any]:
+        """Build the filter for user listings; search is an anchored prefix so it can use the indexes"""
+        query: Dict[str, Any] = {}
+
+        if role:
+            query["role"] = _enum_value(role)
+        if status:
+            query["status"] = _enum_value(status)
+        if search and search.strip():
+            prefix = re.escape(search.strip().lower())
+            query["$or"] = [
+                {"search_email": {"$regex": f"^{prefix}"}},
+                {"search_name": {"$regex": f"^{prefix}"}}
+            ]
+
+        return query
+
     @staticmethod
     async def get_user_stats() -> UserStats:
-        """Get user statistics"""
+        """Get user statistics from the maintained counters"""
+        today_id = _daily_stats_id(datetime.utcnow())
+        docs = {
+            doc["_id"]: doc
+            async for doc in MongoDB.get_collection(USER_STATS_COLLECTION).find(
+                {"_id": {"$in": [USER_STATS_TOTALS_ID, today_id]}}
+            )
+        }
+
+        totals = docs.get(USER_STATS_TOTALS_ID)
+        if not totals:
+            totals = await UserService.rebuild_user_stats()
+
+        return UserStats(
+            total_users=totals.get("total_users", 0),
+            active_users=totals.get("active_users", 0),
+            new_users_today=docs.get(today_id, {}).get("new_users", 0),
+            users_by_role={role: count for role, count in totals.get("users_by_role", {}).items() if count}
+        )
+
+    @staticmethod
+    async def _apply_stats_delta(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        """Move the stats counters from a user's old state to its new one (None for created/deleted)"""
+        increments: Dict[str, int] = {}
+
+        def bump(key: str, amount: int) -> None:
+            increments[key] = increments.get(key, 0) + amount
+
+        for doc, sign in ((before, -1), (after, 1)):
+            if not doc:
+                continue
+            bump("total_users", sign)
+            if _enum_value(doc.get("status")) == UserStatus.ACTIVE.value:
+                bump("active_users", sign)
+            if doc.get("role"):
+                bump(f"users_by_role.{_enum_value(doc['role'])}", sign)
+
+        increments = {key: amount for key, amount in increments.items() if amount}
+        stats = MongoDB.get_collection(USER_STATS_COLLECTION)
+        now = datetime.utcnow()
+
+        try:
+            if increments:
+                await stats.update_one(
+                    {"_id": USER_STATS_TOTALS_ID},
+                    {"$inc": increments, "$set": {"updated_at": now}},
+                    upsert=True
+                )
+
+            # Daily sign-up counts follow the user's creation day
+            if (before is None) != (after is None):
+                created_at = (after or before).get("created_at")
+                if created_at:
+                    await stats.update_one(
+                        {"_id": _daily_stats_id(created_at)},
+                        {"$inc": {"new_users": 1 if after else -1}, "$set": {"updated_at": now}},
+                        upsert=True
+                    )
+        except Exception as e:
+            # Counters are advisory; the nightly rebuild repairs anything missed here
+            logger.error(f"Failed to update user stats counters: {e}")
+
+    @staticmethod
+    async def rebuild_user_stats() -> Dict[str, Any]:
+        """Recompute the user stats counters from the users collection"""
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
         pipeline = [
             {
-                "$group": {
-                    "_id": None,
-                    "total_users": {"$sum": 1},
-                    "active_users": {
-                        "$sum": {"$cond": [{"$eq": ["$status", "active"]}, 1, 0]}
-                    },
-                    "new_users_today": {
-                        "$sum": {
-                            "$cond": [
-                                {"$gte": ["$created_at", datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)]},
-                                1, 0
-                            ]
-                        }
-                    }
-                }
-            },
-            {
-                "$lookup": {
-                    "from": USERS_COLLECTION,
-                    "pipeline": [
+                "$facet": {
+                    "totals": [
+                        {"$group": {
+                            "_id": None,
+                            "total_users": {"$sum": 1},
+                            "active_users": {"$sum": {"$cond": [{"$eq": ["$status", UserStatus.ACTIVE.value]}, 1, 0]}}
+                        }}
+                    ],
+                    "roles": [
                         {"$group": {"_id": "$role", "count": {"$sum": 1}}}
                     ],
-                    "as": "role_counts"
+                    "new_today": [
+                        {"$match": {"created_at": {"$gte": today}}},
+                        {"$count": "count"}
+                    ]
                 }
             }
         ]
 
         result = await MongoDB.get_collection(USERS_COLLECTION).aggregate(pipeline).to_list(1)
+        facets = result[0] if result else {}
+        totals = (facets.get("totals") or [{}])[0]
+        now = datetime.utcnow()
 
-        if not result:
-            return UserStats(
-                total_users=0,
-                active_users=0,
-                new_users_today=0,
-                users_by_role={}
-            )
-
-        stats = result[0]
-        users_by_role = {item["_id"]: item["count"] for item in stats.get("role_counts", [])}
+        stats_doc = {
+            "total_users": totals.get("total_users", 0),
+            "active_users": totals.get("active_users", 0),
+            "users_by_role": {row["_id"]: row["count"] for row in facets.get("roles", []) if row["_id"]},
+            "updated_at": now
+        }
 
-        return UserStats(
-            total_users=stats["total_users"],
-            active_users=stats["active_users"],
-            new_users_today=stats["new_users_today"],
-            users_by_role=users_by_role
+        stats = MongoDB.get_collection(USER_STATS_COLLECTION)
+        await stats.replace_one({"_id": USER_STATS_TOTALS_ID}, stats_doc, upsert=True)
+        await stats.replace_one(
+            {"_id": _daily_stats_id(today)},
+            {"new_users": (facets.get("new_today") or [{}])[0].get("count", 0), "updated_at": now},
+            upsert=True
         )
 
+        # Only today's bucket is ever read; older ones are kept for a month for reference
+        await stats.delete_many({
+            "_id": {"$regex": "^daily:", "$lt": _daily_stats_id(today - timedelta(days=30))}
+        })
+
+        logger.info(f"Rebuilt user stats: {stats_doc['total_users']} users")
+        return stats_doc
+
     @staticmethod
     async def create_admin_user():
         """Create default admin user if not exists"""
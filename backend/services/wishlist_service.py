@@ -1,21 +1,45 @@
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import datetime
 from models.wishlist import (
     WishlistItemCreate, WishlistItemUpdate, WishlistItemInDB,
     WishlistItemResponse, WishlistResponse, WishlistStats
 )
-from models.product import ProductResponse
-from services.product_service import ProductService
-from database.mongodb import MongoDB
+from database.mongodb import MongoDB, PRODUCTS_COLLECTION
+from database.ttl_store import TTLCache
+from pymongo import ASCENDING, DESCENDING
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Product fields shown on wishlist cards
+WISHLIST_PRODUCT_PROJECTION = {
+    "name": 1,
+    "price": 1,
+    "sale_price": 1,
+    "inventory_quantity": 1,
+    "images": {"$slice": 1},
+    "sku": 1,
+    "brand": 1,
+    "category": 1,
+    "status": 1
+}
+
+# Per-user sets of wishlisted product ids; the TTL bounds staleness across processes
+WISHLIST_MEMBERSHIP_TTL_SECONDS = 300
+wishlist_membership_cache = TTLCache(ttl_seconds=WISHLIST_MEMBERSHIP_TTL_SECONDS, max_size=10000)
+
+# Wishlisters handled per preference lookup and insert_many in alert fan-outs
+WISHLIST_FANOUT_CHUNK_SIZE = 1000
+
 class WishlistService:
     def __init__(self):
         self.db = MongoDB.get_database()
         self.collection = self.db.wishlist
-        self.product_service = ProductService()
+
+    async def ensure_indexes(self) -> None:
+        """Create wishlist indexes, including the product -> wishlisters index used by alerts"""
+        await self.collection.create_index([("product_id", ASCENDING), ("user_id", ASCENDING)])
+        await self.collection.create_index([("user_id", ASCENDING), ("added_at", DESCENDING)])
 
     async def add_to_wishlist(self, item_data: WishlistItemCreate) -> WishlistItemResponse:
         """Add an item to user's wishlist"""
@@ -42,6 +66,7 @@ class WishlistService:
                 existing["notes"] = item_data.notes
                 existing["updated_at"] = datetime.utcnow()
                 existing["id"] = str(existing["_id"])
+                wishlist_membership_cache.delete(item_data.user_id)
                 return WishlistItemResponse(**existing)
 
             # Create new item
@@ -53,6 +78,7 @@ class WishlistService:
 
             result = await self.collection.insert_one(item_dict)
             item_dict["id"] = str(result.inserted_id)
+            wishlist_membership_cache.delete(item_data.user_id)
 
             return WishlistItemResponse(**item_dict)
         except Exception as e:
@@ -62,16 +88,13 @@ class WishlistService:
     async def get_user_wishlist(self, user_id: str) -> WishlistResponse:
         """Get user's wishlist with product details"""
         try:
-            items = []
-            cursor = self.collection.find({"user_id": user_id}).sort("added_at", -1)
+            docs = await self.collection.find({"user_id": user_id}).sort("added_at", -1).to_list(None)
+            products = await self._get_products([doc["product_id"] for doc in docs])
 
-            async for item in cursor:
+            items = []
+            for item in docs:
                 item["id"] = str(item["_id"])
-
-                # Get product details
-                product = await self.product_service.get_product_by_id(item["product_id"])
-                item["product"] = product.dict() if product else None
-
+                item["product"] = products.get(item["product_id"])
                 items.append(WishlistItemResponse(**item))
 
             return WishlistResponse(
@@ -85,6 +108,21 @@ class WishlistService:
             logger.error(f"Get user wishlist error: {e}")
             raise
 
+    async def _get_products(self, product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch card fields for many products in one read-only query"""
+        if not product_ids:
+            return {}
+
+        products = {}
+        cursor = self.db[PRODUCTS_COLLECTION].find(
+            {"_id": {"$in": list(set(product_ids))}},
+            WISHLIST_PRODUCT_PROJECTION
+        )
+        async for product in cursor:
+            product["id"] = product.pop("_id")
+            products[product["id"]] = product
+        return products
+
     async def update_wishlist_item(self, item_id: str, user_id: str, update_data: WishlistItemUpdate) -> Optional[WishlistItemResponse]:
         """Update a wishlist item"""
         try:
@@ -99,6 +137,7 @@ class WishlistService:
             )
 
             if result.modified_count:
+                wishlist_membership_cache.delete(user_id)
                 return await self.get_wishlist_item_by_id(item_id, user_id)
             return None
         except Exception as e:
@@ -113,6 +152,7 @@ class WishlistService:
                 "_id": ObjectId(item_id),
                 "user_id": user_id
             })
+            wishlist_membership_cache.delete(user_id)
             return result.deleted_count > 0
         except Exception as e:
             logger.error(f"Remove from wishlist error: {e}")
@@ -129,11 +169,8 @@ class WishlistService:
 
             if item:
                 item["id"] = str(item["_id"])
-
-                # Get product details
-                product = await self.product_service.get_product_by_id(item["product_id"])
-                item["product"] = product.dict() if product else None
-
+                products = await self._get_products([item["product_id"]])
+                item["product"] = products.get(item["product_id"])
                 return WishlistItemResponse(**item)
             return None
         except Exception as e:
@@ -143,6 +180,9 @@ class WishlistService:
     async def check_in_wishlist(self, user_id: str, product_id: str, size: Optional[str] = None, color: Optional[str] = None) -> bool:
         """Check if a product is in user's wishlist"""
         try:
+            if size is None and color is None:
+                return product_id in await self.get_wishlisted_product_ids(user_id)
+
             query = {
                 "user_id": user_id,
                 "product_id": product_id
@@ -159,6 +199,23 @@ class WishlistService:
             logger.error(f"Check in wishlist error: {e}")
             raise
 
+    async def get_wishlisted_product_ids(self, user_id: str) -> frozenset:
+        """Get the set of product ids on a user's wishlist, cached per user"""
+        product_ids = wishlist_membership_cache.get(user_id)
+        if product_ids is None:
+            product_ids = frozenset(await self.collection.distinct("product_id", {"user_id": user_id}))
+            wishlist_membership_cache.set(user_id, product_ids)
+        return product_ids
+
+    async def contains_products(self, user_id: str, product_ids: List[str]) -> Dict[str, bool]:
+        """Check many products against a user's wishlist at once"""
+        try:
+            wishlisted = await self.get_wishlisted_product_ids(user_id)
+            return {product_id: product_id in wishlisted for product_id in product_ids}
+        except Exception as e:
+            logger.error(f"Wishlist contains error: {e}")
+            raise
+
     async def get_wishlist_stats(self, user_id: str) -> WishlistStats:
         """Get wishlist statistics for a user"""
         try:
@@ -197,4 +254,69 @@ class WishlistService:
             return WishlistStats(total_items=0, in_stock_items=0, out_of_stock_items=0, total_value=0)
         except Exception as e:
             logger.error(f"Get wishlist stats error: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def notify_wishlisters(
+        self,
+        product_id: str,
+        event: str,
+        product_name: Optional[str] = None,
+        old_price: Optional[float] = None,
+        new_price: Optional[float] = None,
+        alert_id: Optional[str] = None
+    ) -> int:
+        """Notify everyone who wishlisted a product about a restock or price drop, in bounded chunks"""
+        from services.notification_service import NotificationService
+        from models.notification import NotificationCreate, NotificationType
+
+        notification_service = NotificationService()
+        name = product_name or "An item on your wishlist"
+        if event == "restock":
+            notification_type = NotificationType.PRODUCT_RESTOCK
+            title = "Back in stock"
+            message = f"{name} is back in stock."
+        else:
+            notification_type = NotificationType.PRICE_DROP
+            title = "Price drop"
+            message = f"{name} dropped from ${old_price:.2f} to ${new_price:.2f}."
+        data = {"product_id": product_id, "event": event, "old_price": old_price, "new_price": new_price}
+
+        async def flush(user_ids: List[str]) -> int:
+            opted_out = {
+                doc["user_id"] async for doc in notification_service.preferences_collection.find(
+                    {"user_id": {"$in": user_ids}, "product_alerts": False},
+                    {"user_id": 1}
+                )
+            }
+            recipients = [user_id for user_id in user_ids if user_id not in opted_out]
+            # Keyed per alert and user, so a retried or concurrently re-run fan-out skips users already notified
+            return await notification_service.create_notifications_bulk(
+                [
+                    NotificationCreate(user_id=user_id, type=notification_type, title=title, message=message, data=data)
+                    for user_id in recipients
+                ],
+                dedupe_keys=[f"wishlist:{alert_id}:{user_id}" for user_id in recipients] if alert_id else None
+            )
+
+        # Covered by the (product_id, user_id) index; sorted so a user's duplicate lines are adjacent
+        cursor = self.collection.find(
+            {"product_id": product_id},
+            {"user_id": 1, "_id": 0}
+        ).sort("user_id", ASCENDING)
+
+        notified = 0
+        chunk: List[str] = []
+        last_user_id = None
+        async for doc in cursor:
+            if doc["user_id"] == last_user_id:
+                continue
+            last_user_id = doc["user_id"]
+            chunk.append(last_user_id)
+            if len(chunk) >= WISHLIST_FANOUT_CHUNK_SIZE:
+                notified += await flush(chunk)
+                chunk = []
+        if chunk:
+            notified += await flush(chunk)
+
+        logger.info(f"Sent {notified} {event} alerts for product {product_id}")
+        return notified
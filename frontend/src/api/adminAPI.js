@@ -27,10 +27,17 @@ function debounceApiCall(key, fn, delay = 300) {
 export const adminAPI = {
   // Add admin-specific API calls here
   // Example: getUsers, updateUser, deleteUser, etc.
-  getUsers: async () => {
+  // One page of users; pass the returned nextCursor back as `after` for the next page
+  getUsersPage: async ({ role = null, status = null, search = '', after = null, limit = 50 } = {}) => {
     try {
-      const response = await axiosClient.get('/admin/users');
-      return response.data;
+      const params = new URLSearchParams();
+      if (role) params.append('role', role);
+      if (status) params.append('user_status', status);
+      if (search) params.append('search', search);
+      if (after) params.append('after', after);
+      params.append('limit', limit);
+      const response = await axiosClient.get(`/admin/users?${params}`);
+      return { users: response.data, nextCursor: response.headers['x-next-cursor'] || null };
     } catch (error) {
       console.error('Failed to fetch users via REST API:', error);
       throw error;
@@ -94,8 +101,27 @@ export const adminAPI = {
     return response.data;
   },
 
-  runSecurityScan: async () => {
+  // Scans run in the background; poll until the job finishes and return it with its results,
+  // giving up after timeoutMs (the scan itself keeps running on the server)
+  runSecurityScan: async (pollInterval = 2000, timeoutMs = 10 * 60 * 1000) => {
     const response = await axiosClient.post('/admin/security/scan');
+    const deadline = Date.now() + timeoutMs;
+    let scan = await adminAPI.getSecurityScan(response.data.scan_id);
+    while (scan.status === 'pending' || scan.status === 'running') {
+      if (Date.now() >= deadline) {
+        throw new Error(`Security scan ${scan.id} is still ${scan.status}; check again later`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, pollInterval));
+      scan = await adminAPI.getSecurityScan(scan.id);
+    }
+    if (scan.status === 'failed') {
+      throw new Error(scan.error || 'Security scan failed');
+    }
+    return scan;
+  },
+
+  getSecurityScan: async (scanId) => {
+    const response = await axiosClient.get(`/admin/security/scan/${scanId}`);
     return response.data;
   },
 
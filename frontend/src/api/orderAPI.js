@@ -6,6 +6,11 @@ export const orderAPI = {
     return response.data;
   },
 
+  getOrderSummaries: async (params = {}) => {
+    const response = await axiosClient.get('/orders/summary/', { params });
+    return response.data;
+  },
+
   createOrder: async (orderData) => {
     const response = await axiosClient.post('/orders/', orderData);
     return response.data;
@@ -42,6 +42,12 @@ export const wishlistAPI = {
     return response.data;
   },
 
+  // Check many products at once; returns { contains: { [productId]: bool } }
+  checkManyInWishlist: async (productIds) => {
+    const response = await axiosClient.post('/wishlist/contains', { product_ids: productIds });
+    return response.data;
+  },
+
   // Get wishlist statistics
   getWishlistStats: async () => {
     const response = await axiosClient.get('/wishlist/stats/');
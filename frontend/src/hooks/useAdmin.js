@@ -5,13 +5,16 @@ export const useAdmin = () => {
   const [users, setUsers] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
 
-  const fetchUsers = async () => {
+  // Fetches one page; pass nextCursor to get the page after it
+  const fetchUsers = async (params = {}) => {
     try {
       setLoading(true);
       setError(null);
-      const usersData = await adminAPI.getUsers();
-      setUsers(usersData);
+      const page = await adminAPI.getUsersPage(params);
+      setUsers(page.users);
+      setNextCursor(page.nextCursor);
     } catch (err) {
       setError(err.message);
     } finally {
@@ -52,6 +55,7 @@ export const useAdmin = () => {
 
   return {
     users,
+    nextCursor,
     loading,
     error,
     fetchUsers,
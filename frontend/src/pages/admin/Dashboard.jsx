@@ -195,6 +195,11 @@ const AdminDashboard = () => {
   const [loadingUsers, setLoadingUsers] = useState(true);
   const [customers, setCustomers] = useState([]);
   const [loadingCustomers, setLoadingCustomers] = useState(true);
+  // Users and customers page by the server's cursor; each stack holds the `after` of every page visited
+  const [userPageCursors, setUserPageCursors] = useState([null]);
+  const [userNextCursor, setUserNextCursor] = useState(null);
+  const [customerPageCursors, setCustomerPageCursors] = useState([null]);
+  const [customerNextCursor, setCustomerNextCursor] = useState(null);
 
   const [financeData, setFinanceData] = useState({
     revenue: '...',
@@ -254,8 +259,6 @@ const AdminDashboard = () => {
     }
 
     loadDashboardData();
-    loadUsersData();
-    loadCustomersData();
     loadSecurityData();
     loadInventoryData();
     loadMarketingData();
@@ -270,6 +273,15 @@ const AdminDashboard = () => {
     loadRevenueTrendData();
   }, [user]); // Load data only once on mount
 
+  // Load the current user and customer pages whenever the cursor moves
+  useEffect(() => {
+    loadUsersData();
+  }, [userPageCursors]);
+
+  useEffect(() => {
+    loadCustomersData();
+  }, [customerPageCursors]);
+
   // Load products data when section changes to products
   useEffect(() => {
     if (activeSection === 'products') {
@@ -398,8 +410,10 @@ const AdminDashboard = () => {
 
   const loadUsersData = async () => {
     try {
-      const usersData = await adminAPI.getUsers();
-      setUsers(usersData.map(user => ({
+      setLoadingUsers(true);
+      const page = await adminAPI.getUsersPage({ after: userPageCursors[userPageCursors.length - 1] });
+      setUserNextCursor(page.nextCursor);
+      setUsers(page.users.map(user => ({
         id: user.id,
         name: `${capitalizeName(user.first_name || '')} ${capitalizeName(user.last_name || '')}`.trim() || user.email,
         first_name: user.first_name || '',
@@ -419,8 +433,14 @@ const AdminDashboard = () => {
 
   const loadCustomersData = async () => {
     try {
-      const customersData = await adminAPI.getUsers('customer'); // Filter by customer role
-      setCustomers(customersData.map(customer => ({
+      setLoadingCustomers(true);
+      const page = await adminAPI.getUsersPage({
+        role: 'customer',
+        search: searchQuery.trim(),
+        after: customerPageCursors[customerPageCursors.length - 1]
+      });
+      setCustomerNextCursor(page.nextCursor);
+      setCustomers(page.users.map(customer => ({
         id: customer.id,
         name: `${capitalizeName(customer.first_name || '')} ${capitalizeName(customer.last_name || '')}`.trim() || customer.email,
         first_name: customer.first_name || '',
@@ -896,7 +916,7 @@ const AdminDashboard = () => {
         <body>
           <div class="header">
             <h1>Order ${order.order_number}</h1>
-            <p><strong>Customer:</strong> ${order.user ? `${order.user.first_name} ${order.user.last_name}` : 'N/A'}</p>
+            <p><strong>Customer:</strong> ${order.customer ? `${order.customer.first_name} ${order.customer.last_name}` : 'N/A'}</p>
             <p><strong>Date:</strong> ${new Date(order.created_at).toLocaleString()}</p>
             <p><strong>Status:</strong> ${order.status}</p>
           </div>
@@ -1424,7 +1444,10 @@ const AdminDashboard = () => {
               type="text"
               placeholder="Search..."
               value={searchQuery}
-              onChange={(e) => setSearchQuery(e.target.value)}
+              onChange={(e) => {
+                setSearchQuery(e.target.value);
+                setCustomerPageCursors([null]);
+              }}
             />
             <button>🔍</button>
           </div>
@@ -2814,10 +2837,10 @@ const AdminDashboard = () => {
                                        <strong>{order.order_number}</strong>
                                    </div>
                                     <div className="table-cell">
-                                      {order.user ? (
+                                      {order.customer ? (
                                         <div>
-                                          <div><strong>{order.user.first_name} {order.user.last_name}</strong></div>
-                                          <div style={{fontSize: '12px', color: '#666'}}>{order.user.email}</div>
+                                          <div><strong>{order.customer.first_name} {order.customer.last_name}</strong></div>
+                                          <div style={{fontSize: '12px', color: '#666'}}>{order.customer.email}</div>
                                         </div>
                                       ) : order.customer_email ? (
                                         <div>
@@ -2994,10 +3017,10 @@ const AdminDashboard = () => {
                                    <div className="info-section">
                                        <h4>Customer Information</h4>
                                        <div className="info-grid">
-                                           {selectedOrder.user && (
+                                           {selectedOrder.customer && (
                                                <>
-                                                   <div><strong>Name:</strong> {selectedOrder.user.first_name} {selectedOrder.user.last_name}</div>
-                                                   <div><strong>Email:</strong> {selectedOrder.user.email}</div>
+                                                   <div><strong>Name:</strong> {selectedOrder.customer.first_name} {selectedOrder.customer.last_name}</div>
+                                                   <div><strong>Email:</strong> {selectedOrder.customer.email}</div>
                                                </>
                                            )}
                                            <div><strong>Shipping Address:</strong></div>
@@ -3375,7 +3398,10 @@ const AdminDashboard = () => {
                         type="text"
                         placeholder="Search customers..."
                         value={searchQuery}
-                        onChange={(e) => setSearchQuery(e.target.value)}
+                        onChange={(e) => {
+                          setSearchQuery(e.target.value);
+                          setCustomerPageCursors([null]);
+                        }}
                         className="search-input"
                       />
                     </div>
@@ -3395,41 +3421,54 @@ const AdminDashboard = () => {
                     ) : customers.length === 0 ? (
                       <div className="empty-row">No customers found</div>
                     ) : (
-                      customers
-                        .filter(customer =>
-                          customer.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-                          customer.email.toLowerCase().includes(searchQuery.toLowerCase())
-                        )
-                        .map((customer) => (
-                          <div key={customer.id} className="table-row">
-                            <div className="table-cell">{customer.name}</div>
-                            <div className="table-cell">{customer.email}</div>
-                            <div className="table-cell">
-                              <span className={`status-badge status-${customer.status}`}>
-                                {customer.status.charAt(0).toUpperCase() + customer.status.slice(1)}
-                              </span>
-                            </div>
-                            <div className="table-cell">{customer.lastActive}</div>
-                            <div className="table-cell">{customer.totalOrders}</div>
-                            <div className="table-cell">₹{typeof customer.totalSpent === 'number' ? customer.totalSpent.toLocaleString() : customer.totalSpent}</div>
-                            <div className="table-cell">
-                              <button
-                                className="action-btn edit-btn"
-                                onClick={() => handleEditUser(customer)}
-                              >
-                                Edit
-                              </button>
-                              <button
-                                className="action-btn delete-btn"
-                                onClick={() => handleDeleteUser(customer.id)}
-                              >
-                                Delete
-                              </button>
-                            </div>
+                      customers.map((customer) => (
+                        <div key={customer.id} className="table-row">
+                          <div className="table-cell">{customer.name}</div>
+                          <div className="table-cell">{customer.email}</div>
+                          <div className="table-cell">
+                            <span className={`status-badge status-${customer.status}`}>
+                              {customer.status.charAt(0).toUpperCase() + customer.status.slice(1)}
+                            </span>
+                          </div>
+                          <div className="table-cell">{customer.lastActive}</div>
+                          <div className="table-cell">{customer.totalOrders}</div>
+                          <div className="table-cell">₹{typeof customer.totalSpent === 'number' ? customer.totalSpent.toLocaleString() : customer.totalSpent}</div>
+                          <div className="table-cell">
+                            <button
+                              className="action-btn edit-btn"
+                              onClick={() => handleEditUser(customer)}
+                            >
+                              Edit
+                            </button>
+                            <button
+                              className="action-btn delete-btn"
+                              onClick={() => handleDeleteUser(customer.id)}
+                            >
+                              Delete
+                            </button>
                           </div>
-                        ))
+                        </div>
+                      ))
                     )}
                   </div>
+                  {(customerPageCursors.length > 1 || customerNextCursor) && (
+                    <div className="pagination">
+                      <button
+                        className={`pagination-btn ${customerPageCursors.length <= 1 ? 'disabled' : ''}`}
+                        onClick={() => setCustomerPageCursors(prev => prev.slice(0, -1))}
+                        disabled={customerPageCursors.length <= 1}
+                      >
+                        Previous
+                      </button>
+                      <button
+                        className={`pagination-btn ${!customerNextCursor ? 'disabled' : ''}`}
+                        onClick={() => setCustomerPageCursors(prev => [...prev, customerNextCursor])}
+                        disabled={!customerNextCursor}
+                      >
+                        Next
+                      </button>
+                    </div>
+                  )}
                 </div>
 
                 {/* Customer Modal */}
@@ -3834,6 +3873,25 @@ const AdminDashboard = () => {
             )}
             </div>
 
+            {(userPageCursors.length > 1 || userNextCursor) && (
+                <div className="pagination">
+                    <button
+                        className={`pagination-btn ${userPageCursors.length <= 1 ? 'disabled' : ''}`}
+                        onClick={() => setUserPageCursors(prev => prev.slice(0, -1))}
+                        disabled={userPageCursors.length <= 1}
+                    >
+                        Previous
+                    </button>
+                    <button
+                        className={`pagination-btn ${!userNextCursor ? 'disabled' : ''}`}
+                        onClick={() => setUserPageCursors(prev => [...prev, userNextCursor])}
+                        disabled={!userNextCursor}
+                    >
+                        Next
+                    </button>
+                </div>
+            )}
+
             {/* User Modal */}
             {showUserModal && (
                 <div className="modal-overlay" onClick={() => setShowUserModal(false)}>